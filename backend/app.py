@@ -33,6 +33,7 @@ def create_app():
     from routes.chunked_upload import chunked_upload_bp
     from routes.odoo_logs import odoo_logs_bp
     from routes.users import users_bp
+    from routes.jobs import jobs_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
@@ -45,6 +46,14 @@ def create_app():
     app.register_blueprint(chunked_upload_bp, url_prefix='/api')
     app.register_blueprint(odoo_logs_bp, url_prefix='/api/odoo-logs')
     app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+    
+    # Servicios en segundo plano: wsgi.py los inicia al arrancar cada worker;
+    # en desarrollo, con la primera petición. No se inician al importar, para
+    # no arrancarlos en scripts de migración ni en los jobs
+    @app.before_request
+    def ensure_background_services():
+        start_background_services(app)
     
     # Manejadores de errores JWT
     @jwt.expired_token_loader
@@ -81,6 +90,17 @@ def create_app():
     
     return app
 
+def start_background_services(app):
+    """Muestreo de métricas, índice de logs y job manager (una vez por proceso)"""
+    if app.config.get('METRICS_SAMPLER_ENABLED', True):
+        from services.metrics_sampler import metrics_sampler
+        metrics_sampler.ensure_started(app)
+    if app.config.get('LOG_SEARCH_ENABLED', True):
+        from services.log_search_index import log_search_indexer
+        log_search_indexer.ensure_started(app)
+    from services.job_manager import job_manager
+    job_manager.ensure_started(app)
+
 def init_db(app):
     """Inicializa la base de datos y crea usuario admin por defecto"""
     with app.app_context():
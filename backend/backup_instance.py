@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Ejecuta el backup de una instancia (lo lanza el job manager para los jobs
+'create_backup'). pg_dump y el filestore van en streaming al compresor y
+el resultado es un .tar.gz compatible con Odoo (dump.sql + filestore/).
+En modo incremental crea un snapshot deduplicado; con --export arma el
+.tar.gz de un snapshot existente (jobs 'export_snapshot'). --pitr-base y
+--pitr-restore corren los jobs de PITR (backup base del cluster y
+restauración de una base a un momento dado). --reconcile ajusta el
+catálogo de backups a lo que hay en disco y --collect-blobs libera los
+blobs de snapshots borrados.
+"""
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from services.backup_manager_v2 import BackupManagerV2
+
+def run(args):
+    if len(args) == 3 and args[0] == '--export':
+        return BackupManagerV2().run_export_snapshot(args[1], args[2])
+    if len(args) == 1 and args[0] == '--pitr-base':
+        return BackupManagerV2().run_base_backup()
+    if len(args) == 3 and args[0] == '--pitr-restore':
+        return BackupManagerV2().run_point_in_time_restore(args[1], args[2])
+    if len(args) == 1 and args[0] == '--reconcile':
+        return BackupManagerV2().run_reconcile_catalog()
+    if len(args) == 1 and args[0] == '--collect-blobs':
+        return BackupManagerV2().run_collect_blobs()
+    return BackupManagerV2().run_backup(args[0], args[1] if len(args) == 2 else None)
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if not args or len(args) > 3 or (len(args) == 3 and args[0] not in ('--export', '--pitr-restore')):
+        print("Uso: backup_instance.py <instancia> [nombre_archivo]")
+        print("     backup_instance.py --export <instancia> <snapshot>")
+        print("     backup_instance.py --pitr-base")
+        print("     backup_instance.py --pitr-restore <instancia> 'YYYY-MM-DD HH:MM:SS'")
+        print("     backup_instance.py --reconcile")
+        print("     backup_instance.py --collect-blobs")
+        sys.exit(2)
+
+    # El catálogo de backups está en la base del panel
+    app = create_app()
+    with app.app_context():
+        result = run(args)
+    sys.exit(0 if result['success'] else 1)
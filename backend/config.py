@@ -30,9 +30,75 @@ class Config:
     PUERTOS_FILE = os.getenv('PUERTOS_FILE', f'{DATA_PATH}/puertos_ocupados_odoo.txt')
     DEV_INSTANCES_FILE = os.getenv('DEV_INSTANCES_FILE', f'{DATA_PATH}/dev-instances.txt')
     BACKUPS_PATH = os.getenv('BACKUPS_PATH', '/home/mtg/backups')
+    ODOO_FILESTORE_PATH = os.getenv('ODOO_FILESTORE_PATH', '/home/mtg/.local/share/Odoo/filestore')
     SYSTEM_USER_SYNC_SCRIPT = os.getenv('SYSTEM_USER_SYNC_SCRIPT', f'{SCRIPTS_PATH}/users/sync-instance-access.sh')
     SYSTEM_USER_SSH_KEY_SCRIPT = os.getenv('SYSTEM_USER_SSH_KEY_SCRIPT', f'{SCRIPTS_PATH}/users/set-ssh-public-key.sh')
     
+    # Métricas del sistema - muestreo en segundo plano
+    METRICS_SAMPLER_ENABLED = os.getenv('METRICS_SAMPLER_ENABLED', 'true').lower() == 'true'
+    METRICS_SAMPLE_INTERVAL_SECONDS = int(os.getenv('METRICS_SAMPLE_INTERVAL_SECONDS', '5'))
+    METRICS_STORE_INTERVAL_SECONDS = int(os.getenv('METRICS_STORE_INTERVAL_SECONDS', '15'))
+    METRICS_FLUSH_INTERVAL_SECONDS = int(os.getenv('METRICS_FLUSH_INTERVAL_SECONDS', '60'))
+    METRICS_BUFFER_SIZE = int(os.getenv('METRICS_BUFFER_SIZE', '720'))  # 1 hora a 5s
+    METRICS_RAW_RETENTION_DAYS = int(os.getenv('METRICS_RAW_RETENTION_DAYS', '3'))  # Rollups: ver services/metrics_rollup.py
+    METRICS_PRUNE_INTERVAL_SECONDS = int(os.getenv('METRICS_PRUNE_INTERVAL_SECONDS', '3600'))
+    METRICS_STREAM_MAX_CLIENTS = int(os.getenv('METRICS_STREAM_MAX_CLIENTS', '6'))  # Por worker
+    SSE_MAX_STREAMS_PER_WORKER = int(os.getenv('SSE_MAX_STREAMS_PER_WORKER', '6'))  # Todos los streams: menor que --threads
+    INSTANCE_METRICS_ENABLED = os.getenv('INSTANCE_METRICS_ENABLED', 'true').lower() == 'true'
+    INSTANCE_METRICS_INTERVAL_SECONDS = int(os.getenv('INSTANCE_METRICS_INTERVAL_SECONDS', '30'))
+    INSTANCE_METRICS_DISCOVERY_SECONDS = int(os.getenv('INSTANCE_METRICS_DISCOVERY_SECONDS', '300'))
+    INSTANCE_METRICS_RETENTION_DAYS = int(os.getenv('INSTANCE_METRICS_RETENTION_DAYS', '14'))
+    CGROUP_ROOT = os.getenv('CGROUP_ROOT', '/sys/fs/cgroup')
+    
+    # Inventario de instancias en memoria
+    INSTANCE_INVENTORY_STAT_TTL_SECONDS = int(os.getenv('INSTANCE_INVENTORY_STAT_TTL_SECONDS', '5'))  # Sin inotify
+    INSTANCE_INVENTORY_FULL_CHECK_SECONDS = int(os.getenv('INSTANCE_INVENTORY_FULL_CHECK_SECONDS', '60'))  # Con inotify
+    INSTANCE_DESCRIPTOR_CACHE_DIR = os.getenv('INSTANCE_DESCRIPTOR_CACHE_DIR', f'{DATA_PATH}/instance-descriptors')
+    INSTANCE_STATUS_TTL_SECONDS = int(os.getenv('INSTANCE_STATUS_TTL_SECONDS', '10'))
+    SYSTEMD_PROBE_TIMEOUT_SECONDS = int(os.getenv('SYSTEMD_PROBE_TIMEOUT_SECONDS', '2'))
+    SYSTEMD_STATUS_BUDGET_SECONDS = int(os.getenv('SYSTEMD_STATUS_BUDGET_SECONDS', '3'))
+    SYSTEMD_PROBE_WORKERS = int(os.getenv('SYSTEMD_PROBE_WORKERS', '8'))
+
+    # Logs de Odoo: índices de offsets, seguimiento en vivo e índice de búsqueda
+    LOG_INDEX_DIR = os.getenv('LOG_INDEX_DIR', f'{DATA_PATH}/log-index')
+    LOG_SCAN_BYTE_BUDGET = int(os.getenv('LOG_SCAN_BYTE_BUDGET', str(64 * 1024 * 1024)))  # Lectura con filtros
+    LOG_FOLLOW_MAX_CLIENTS = int(os.getenv('LOG_FOLLOW_MAX_CLIENTS', '6'))  # Por worker
+    LOG_FOLLOW_POLL_SECONDS = float(os.getenv('LOG_FOLLOW_POLL_SECONDS', '1'))  # Sin inotify
+    LOG_JOURNAL_SCAN_MAX_ENTRIES = int(os.getenv('LOG_JOURNAL_SCAN_MAX_ENTRIES', '50000'))  # Lectura del journal con filtros
+    LOG_SEARCH_ENABLED = os.getenv('LOG_SEARCH_ENABLED', 'true').lower() == 'true'
+    LOG_SEARCH_DB = os.getenv('LOG_SEARCH_DB', f'{DATA_PATH}/log-search.sqlite3')
+    LOG_SEARCH_INTERVAL_SECONDS = int(os.getenv('LOG_SEARCH_INTERVAL_SECONDS', '30'))
+    LOG_SEARCH_BATCH_BYTES = int(os.getenv('LOG_SEARCH_BATCH_BYTES', str(8 * 1024 * 1024)))  # Por archivo y pasada
+    LOG_SEARCH_RETENTION_DAYS = int(os.getenv('LOG_SEARCH_RETENTION_DAYS', '30'))
+
+    # Jobs: operaciones largas (clonado, actualizaciones, backups, restores) encoladas
+    JOBS_MAX_CONCURRENT = int(os.getenv('JOBS_MAX_CONCURRENT', '2'))  # Además, uno por instancia
+    JOBS_POLL_SECONDS = float(os.getenv('JOBS_POLL_SECONDS', '1'))
+    JOBS_RETENTION_DAYS = int(os.getenv('JOBS_RETENTION_DAYS', '30'))
+    JOBS_DIR = os.getenv('JOBS_DIR', f'{DATA_PATH}/jobs')
+    # Admisión de jobs pesados (pg_dump, restore, clonado) según el estado del host
+    JOBS_MAX_LOAD_PER_CPU = float(os.getenv('JOBS_MAX_LOAD_PER_CPU', '1.5'))
+    JOBS_MAX_IOWAIT_PERCENT = float(os.getenv('JOBS_MAX_IOWAIT_PERCENT', '20'))
+    JOBS_MIN_FREE_DISK_GB = float(os.getenv('JOBS_MIN_FREE_DISK_GB', '10'))
+    JOBS_ADMISSION_SETTLE_SECONDS = int(os.getenv('JOBS_ADMISSION_SETTLE_SECONDS', '30'))
+    JOBS_ADMISSION_MAX_WAIT_SECONDS = int(os.getenv('JOBS_ADMISSION_MAX_WAIT_SECONDS', '1800'))
+    JOBS_CGROUP_WEIGHTS = os.getenv('JOBS_CGROUP_WEIGHTS', 'true').lower() == 'true'  # systemd-run IOWeight/CPUWeight
+
+    # Backups: pg_dump y filestore en streaming hacia el compresor (pigz si está instalado)
+    BACKUP_COMPRESS_THREADS = int(os.getenv('BACKUP_COMPRESS_THREADS', '0'))  # 0 = todos los CPUs
+    BACKUP_COMPRESS_LEVEL = int(os.getenv('BACKUP_COMPRESS_LEVEL', '6'))
+    BACKUP_PG_DUMP_JOBS = int(os.getenv('BACKUP_PG_DUMP_JOBS', '0'))  # >1: pg_dump -Fd -j N
+    BACKUP_BLOBSTORE_PATH = os.getenv('BACKUP_BLOBSTORE_PATH', f'{BACKUPS_PATH}/blobstore')  # Modo incremental
+    BACKUP_CATALOG_RECONCILE_SCHEDULE = os.getenv('BACKUP_CATALOG_RECONCILE_SCHEDULE', '*/30 * * * *')  # Catálogo vs disco
+    # PITR: backups base (pg_basebackup) + archivo de WAL. El WAL y las restauraciones temporales son de postgres
+    BACKUP_PITR_PATH = os.getenv('BACKUP_PITR_PATH', f'{BACKUPS_PATH}/pitr')
+    BACKUP_WAL_ARCHIVE_PATH = os.getenv('BACKUP_WAL_ARCHIVE_PATH', '/var/lib/postgresql/wal-archive')
+    BACKUP_PITR_RESTORE_DIR = os.getenv('BACKUP_PITR_RESTORE_DIR', '/var/lib/postgresql/pitr-restore')
+    BACKUP_PITR_RESTORE_PORT = int(os.getenv('BACKUP_PITR_RESTORE_PORT', '55432'))
+    BACKUP_PITR_RESTORE_TIMEOUT_SECONDS = int(os.getenv('BACKUP_PITR_RESTORE_TIMEOUT_SECONDS', '3600'))
+    PG_BIN_DIR = os.getenv('PG_BIN_DIR', '')  # pg_ctl, pg_archivecleanup; vacío = /usr/lib/postgresql/<versión>/bin
+    ODOO_DB_OWNER = os.getenv('DB_USER', 'mtg')
+
     # Domain configuration - IMPORTANTE: El dominio raíz está protegido
     DOMAIN_ROOT = os.getenv('DOMAIN_ROOT', 'softrigx.com')
     PUBLIC_IP = os.getenv('PUBLIC_IP', '')
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Migration: Create backup_catalog table and index the existing backup files
+Date: 2026-10-17
+"""
+
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, BackupCatalogEntry
+from services.backup_manager_v2 import BackupManagerV2
+
+def migrate():
+    """Crea la tabla del catálogo, la llena con los backups en disco y programa la reconciliación"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            BackupCatalogEntry.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tabla backup_catalog creada")
+            
+            manager = BackupManagerV2()
+            result = manager.run_reconcile_catalog()
+            if not result['success']:
+                raise Exception(result['error'])
+            manager._update_crontab()
+            print("✅ Reconciliación periódica agregada al crontab")
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
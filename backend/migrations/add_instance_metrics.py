@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Migration: Create instance_metrics_history table (per-instance resource usage)
+Date: 2026-10-17
+"""
+
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, InstanceMetricsHistory
+
+def migrate():
+    """Crea la tabla de métricas por instancia"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            InstanceMetricsHistory.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tabla instance_metrics_history creada")
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Migration: Create jobs table (queued/running long operations)
+Date: 2026-10-17
+"""
+
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Job
+
+def migrate():
+    """Crea la tabla de jobs"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            Job.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tabla jobs creada")
+        except Exception as e:
+            print(f"❌ Error en migración: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
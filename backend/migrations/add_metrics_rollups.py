@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration: Create metrics_rollups table and backfill it from metrics_history
+Date: 2026-10-17
+"""
+
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, MetricsRollup
+from services.metrics_rollup import backfill_rollups
+
+def migrate():
+    """Crea la tabla de rollups y la completa con el historial existente"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            # Crear solo la tabla nueva
+            MetricsRollup.__table__.create(db.engine, checkfirst=True)
+            print("✅ Tabla metrics_rollups creada")
+            
+            backfill_rollups(db.session)
+            
+            total = MetricsRollup.query.count()
+            print(f"✅ Rollups recalculados desde metrics_history: {total} buckets")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error en migración: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import bcrypt
+import json
 
 db = SQLAlchemy()
 
@@ -193,3 +194,180 @@ class MetricsHistory(db.Model):
             'network_sent_mb': self.network_sent_mb,
             'network_recv_mb': self.network_recv_mb
         }
+
+class MetricsRollup(db.Model):
+    """Agregados de MetricsHistory por intervalo (1m, 5m, 1h, 1d).
+    
+    Los porcentajes guardan avg/min/max/last; los GB usados el promedio;
+    los totales y contadores de red (acumulativos) el último valor.
+    """
+    __tablename__ = 'metrics_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(4), nullable=False)  # 1m, 5m, 1h, 1d
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    cpu_percent_avg = db.Column(db.Float)
+    cpu_percent_min = db.Column(db.Float)
+    cpu_percent_max = db.Column(db.Float)
+    cpu_percent_last = db.Column(db.Float)
+    ram_percent_avg = db.Column(db.Float)
+    ram_percent_min = db.Column(db.Float)
+    ram_percent_max = db.Column(db.Float)
+    ram_percent_last = db.Column(db.Float)
+    disk_percent_avg = db.Column(db.Float)
+    disk_percent_min = db.Column(db.Float)
+    disk_percent_max = db.Column(db.Float)
+    disk_percent_last = db.Column(db.Float)
+    ram_used_gb_avg = db.Column(db.Float)
+    disk_used_gb_avg = db.Column(db.Float)
+    ram_total_gb_last = db.Column(db.Float)
+    disk_total_gb_last = db.Column(db.Float)
+    network_sent_mb_last = db.Column(db.Float)
+    network_recv_mb_last = db.Column(db.Float)
+    
+    # El índice único también sirve para las consultas por rango
+    __table_args__ = (db.UniqueConstraint('resolution', 'bucket_start', name='_metrics_rollup_bucket_uc'),)
+    
+    def to_dict(self):
+        """Mismo formato que MetricsHistory.to_dict() más el rango min/max de cada porcentaje"""
+        return {
+            'timestamp': self.bucket_start.isoformat() if self.bucket_start else None,
+            'cpu_percent': self.cpu_percent_avg,
+            'ram_percent': self.ram_percent_avg,
+            'ram_used_gb': self.ram_used_gb_avg,
+            'ram_total_gb': self.ram_total_gb_last,
+            'disk_percent': self.disk_percent_avg,
+            'disk_used_gb': self.disk_used_gb_avg,
+            'disk_total_gb': self.disk_total_gb_last,
+            'network_sent_mb': self.network_sent_mb_last,
+            'network_recv_mb': self.network_recv_mb_last,
+            'cpu_percent_min': self.cpu_percent_min,
+            'cpu_percent_max': self.cpu_percent_max,
+            'ram_percent_min': self.ram_percent_min,
+            'ram_percent_max': self.ram_percent_max,
+            'disk_percent_min': self.disk_percent_min,
+            'disk_percent_max': self.disk_percent_max,
+            'sample_count': self.sample_count
+        }
+
+class InstanceMetricsHistory(db.Model):
+    """Muestras de consumo por instancia Odoo (cgroup del servicio systemd).
+    
+    Tabla compacta: REAL en vez de double y un índice (instancia, timestamp).
+    """
+    __tablename__ = 'instance_metrics_history'
+    
+    id = db.Column(db.BigInteger, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    instance_name = db.Column(db.String(120), nullable=False)
+    cpu_percent = db.Column(db.REAL)  # % de la capacidad total del host
+    rss_mb = db.Column(db.REAL)
+    io_read_mb_s = db.Column(db.REAL)
+    io_write_mb_s = db.Column(db.REAL)
+    open_files = db.Column(db.Integer)
+    tcp_connections = db.Column(db.Integer)
+    
+    __table_args__ = (
+        db.Index('ix_instance_metrics_instance_ts', 'instance_name', 'timestamp'),
+        db.Index('ix_instance_metrics_ts', 'timestamp'),
+    )
+    
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'instance_name': self.instance_name,
+            'cpu_percent': self.cpu_percent,
+            'rss_mb': self.rss_mb,
+            'io_read_mb_s': self.io_read_mb_s,
+            'io_write_mb_s': self.io_write_mb_s,
+            'open_files': self.open_files,
+            'tcp_connections': self.tcp_connections
+        }
+
+class Job(db.Model):
+    """Operación larga (clonado, actualización, backup, restore) ejecutada por el job manager.
+    
+    Sobrevive a reinicios: el proceso corre en su propia sesión y el exit code
+    queda en un archivo, así el próximo líder del job manager lo recupera.
+    """
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # create_dev, create_prod, update_db, create_backup, ...
+    instance_name = db.Column(db.String(120), index=True)
+    resource = db.Column(db.String(120), nullable=False)  # Un job pesado a la vez por recurso
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    priority = db.Column(db.Integer, nullable=False, default=0)  # Mayor primero
+    command = db.Column(db.Text, nullable=False)  # JSON: lista de argumentos
+    cwd = db.Column(db.String(500))
+    stdin_data = db.Column(db.Text)
+    log_file = db.Column(db.String(500))
+    pid = db.Column(db.Integer)
+    exit_code = db.Column(db.Integer)
+    progress = db.Column(db.Integer)  # 0-100, de las líneas "##PROGRESS <n> [mensaje]" del log
+    progress_message = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_jobs_status_priority', 'status', 'priority', 'created_at'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'instance_name': self.instance_name,
+            'resource': self.resource,
+            'status': self.status,
+            'priority': self.priority,
+            'log_file': self.log_file,
+            'pid': self.pid,
+            'exit_code': self.exit_code,
+            'progress': self.progress,
+            'progress_message': self.progress_message,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class BackupCatalogEntry(db.Model):
+    """Archivo de backup (.tar.gz / .zip) de una instancia en BACKUPS_PATH.
+    
+    Lo mantienen las operaciones de BackupManagerV2 (backup, subida, renombre,
+    borrado, retención) y el job de reconciliación corrige lo que cambie por
+    fuera; los listados salen de acá sin recorrer el disco.
+    """
+    __tablename__ = 'backup_catalog'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    instance_name = db.Column(db.String(120), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    mtime = db.Column(db.DateTime, nullable=False)  # Hora local del archivo, como la muestra la UI
+    checksum = db.Column(db.String(64))  # SHA-256 del archivo, si se calculó al crearlo/subirlo
+    manifest = db.Column(db.Text)  # JSON: contenido del archivo (dump, filestore)
+    status = db.Column(db.String(20), nullable=False, default='ok')  # ok, uploaded, discovered
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('instance_name', 'filename', name='uq_backup_catalog_instance_filename'),
+        db.Index('ix_backup_catalog_instance_mtime', 'instance_name', 'mtime'),
+    )
+    
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'size_bytes': self.size_bytes,
+            'mtime': self.mtime.isoformat() if self.mtime else None,
+            'checksum': self.checksum,
+            'manifest': json.loads(self.manifest) if self.manifest else None,
+            'status': self.status
+        }
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Encola un backup programado de una instancia (lo invoca el crontab que
+genera BackupManagerV2), un backup base de PITR o la reconciliación del
+catálogo de backups. El backup no corre acá: lo ejecuta el job manager
+del backend respetando la cola, el límite por instancia y el control de
+admisión por carga del host, igual que los backups manuales.
+"""
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime
+from app import create_app
+from services.backup_manager_v2 import BackupManagerV2
+
+def queue_backup(instance_name):
+    app = create_app()
+    with app.app_context():
+        if instance_name == '--pitr-base':
+            result = BackupManagerV2().create_base_backup()  # Backup base de PITR (todo el cluster)
+        elif instance_name == '--reconcile':
+            result = BackupManagerV2().reconcile_catalog()  # Catálogo de backups vs disco
+        else:
+            result = BackupManagerV2().create_backup(instance_name)
+
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    if result['success']:
+        print(f"[{timestamp}] ✅ {result['message']}")
+    else:
+        print(f"[{timestamp}] ❌ {instance_name}: {result['error']}")
+    return result['success']
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Uso: queue_backup.py <instancia> | --pitr-base | --reconcile")
+        sys.exit(2)
+    sys.exit(0 if queue_backup(sys.argv[1]) else 1)
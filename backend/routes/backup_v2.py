@@ -129,7 +129,8 @@ def update_instance_config(instance_name):
             auto_backup_enabled=data.get('auto_backup_enabled'),
             schedule=data.get('schedule'),
             retention_days=data.get('retention_days'),
-            priority=data.get('priority')
+            priority=data.get('priority'),
+            backup_mode=data.get('backup_mode')
         )
         
         log_action(
@@ -317,6 +318,58 @@ def restore_instance_backup(instance_name):
         log_action(user_id, 'restore_backup', instance_name, str(e), 'error')
         return jsonify({'error': str(e)}), 500
 
+@backup_v2_bp.route('/instances/<instance_name>/snapshots/<name>/export', methods=['POST'])
+@jwt_required()
+def export_instance_snapshot(instance_name, name):
+    """Exporta un snapshot incremental a un .tar.gz compatible con Odoo"""
+    user_id, user = _get_current_user()
+    access_error = _ensure_instance_access(user, instance_name)
+    if access_error:
+        return access_error
+
+    try:
+        result = manager.export_snapshot(instance_name, name)
+
+        log_action(
+            user_id,
+            'export_snapshot',
+            instance_name,
+            result.get('message') or result.get('error'),
+            'success' if result.get('success') else 'error'
+        )
+
+        return jsonify(result), 200 if result.get('success') else 400
+    except Exception as e:
+        logger.error(f"Error exporting snapshot {name} for {instance_name}: {e}")
+        log_action(user_id, 'export_snapshot', instance_name, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
+@backup_v2_bp.route('/instances/<instance_name>/snapshots/<name>', methods=['DELETE'])
+@jwt_required()
+def delete_instance_snapshot(instance_name, name):
+    """Elimina un snapshot incremental"""
+    user_id, user = _get_current_user()
+    access_error = _ensure_instance_access(user, instance_name)
+    if access_error:
+        return access_error
+
+    try:
+        result = manager.delete_snapshot(instance_name, name)
+
+        log_action(
+            user_id,
+            'delete_snapshot',
+            instance_name,
+            f"Deleted: {name}",
+            'success' if result.get('success') else 'error'
+        )
+
+        return jsonify(result), 200 if result.get('success') else 404
+    except Exception as e:
+        logger.error(f"Error deleting snapshot {name} for {instance_name}: {e}")
+        log_action(user_id, 'delete_snapshot', instance_name, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
 # ============================================================================
 # ENDPOINTS DE LOGS
 # ============================================================================
@@ -374,6 +427,126 @@ def get_global_stats():
         logger.error(f"Error getting global stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+@backup_v2_bp.route('/catalog/reconcile', methods=['POST'])
+@jwt_required()
+def reconcile_catalog():
+    """Encola la reconciliación del catálogo de backups con los archivos en disco"""
+    user_id, user = _get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    try:
+        result = manager.reconcile_catalog()
+        log_action(user_id, 'reconcile_backup_catalog', None, result.get('message') or result.get('error'),
+                   'success' if result['success'] else 'error')
+        return jsonify(result), 200 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"Error reconciling backup catalog: {e}")
+        log_action(user_id, 'reconcile_backup_catalog', None, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
+# ============================================================================
+# ENDPOINTS DE PITR (backups base + archivo de WAL del cluster)
+# ============================================================================
+
+@backup_v2_bp.route('/pitr', methods=['GET'])
+@jwt_required()
+def get_pitr_status():
+    """Estado de PITR: archivo de WAL, backups base y ventana de recuperación"""
+    _, user = _get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    try:
+        return jsonify(manager.get_pitr_status()), 200
+    except Exception as e:
+        logger.error(f"Error getting PITR status: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@backup_v2_bp.route('/pitr/config', methods=['PUT'])
+@jwt_required()
+def update_pitr_config():
+    """Activa PITR y configura la frecuencia y retención de los backups base"""
+    user_id, user = _get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    try:
+        data = request.get_json() or {}
+        result = manager.update_pitr_config(
+            enabled=data.get('enabled'),
+            base_schedule=data.get('base_schedule'),
+            retention_days=data.get('retention_days')
+        )
+        log_action(user_id, 'update_pitr_config', None, f"Config updated: {data}",
+                   'success' if result['success'] else 'error')
+        return jsonify(result), 200 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"Error updating PITR config: {e}")
+        log_action(user_id, 'update_pitr_config', None, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
+@backup_v2_bp.route('/pitr/base', methods=['POST'])
+@jwt_required()
+def create_pitr_base_backup():
+    """Encola un backup base del cluster"""
+    user_id, user = _get_current_user()
+    if not user or user.role != 'admin':
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    try:
+        result = manager.create_base_backup()
+        log_action(user_id, 'create_pitr_base', None, result.get('message') or result.get('error'),
+                   'success' if result['success'] else 'error')
+        return jsonify(result), 200 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"Error creating PITR base backup: {e}")
+        log_action(user_id, 'create_pitr_base', None, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
+@backup_v2_bp.route('/instances/<instance_name>/pitr-restore', methods=['POST'])
+@jwt_required()
+def restore_instance_point_in_time(instance_name):
+    """Restaura la base de una instancia a un momento dado en una base nueva (origen para desarrollo)"""
+    user_id, user = _get_current_user()
+    access_error = _ensure_instance_access(user, instance_name)
+    if access_error:
+        return access_error
+
+    try:
+        data = request.get_json() or {}
+        target_time = data.get('target_time')
+        if not target_time:
+            return jsonify({'error': 'Se requiere target_time'}), 400
+
+        result = manager.restore_point_in_time(instance_name, target_time)
+        log_action(user_id, 'pitr_restore', instance_name, result.get('message') or result.get('error'),
+                   'success' if result['success'] else 'error')
+        return jsonify(result), 200 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"Error restoring {instance_name} to a point in time: {e}")
+        log_action(user_id, 'pitr_restore', instance_name, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
+@backup_v2_bp.route('/instances/<instance_name>/pitr/databases/<name>', methods=['DELETE'])
+@jwt_required()
+def delete_instance_pitr_database(instance_name, name):
+    """Elimina una base restaurada a un momento dado"""
+    user_id, user = _get_current_user()
+    access_error = _ensure_instance_access(user, instance_name)
+    if access_error:
+        return access_error
+
+    try:
+        result = manager.drop_pitr_database(instance_name, name)
+        log_action(user_id, 'delete_pitr_database', instance_name, f"Deleted: {name}",
+                   'success' if result['success'] else 'error')
+        return jsonify(result), 200 if result['success'] else 400
+    except Exception as e:
+        logger.error(f"Error deleting PITR database {name}: {e}")
+        log_action(user_id, 'delete_pitr_database', instance_name, str(e), 'error')
+        return jsonify({'error': str(e)}), 500
+
 # ============================================================================
 # ENDPOINT DE UPLOAD
 # ============================================================================
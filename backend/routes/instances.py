@@ -1,13 +1,38 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.instance_manager import InstanceManager
 from models import db, ActionLog, User
+from config import Config
 from services.access_control import can_user_access_instance, filter_instances_for_user, grant_user_instance_access
 from services.system_user_access import get_system_username
+from services.log_follower import log_follower
+from services.stream_slots import stream_slots, event_stream
+from services.operation_log import (
+    CREATION_LOG_TAIL_BYTES,
+    FINAL_STATUSES,
+    creation_log_path,
+    update_log_path,
+    read_increment,
+    read_tail,
+    read_operation_status,
+)
+from services.job_manager import latest_job
+from services.backup_pitr import PitrManager, is_restored_db_name
+import os
+import json
+import time
 
 instances_bp = Blueprint('instances', __name__)
 manager = InstanceManager()
 
+OPERATION_LOG_KEEPALIVE_SECONDS = 15
+OPERATION_LOG_MAX_SECONDS = 3600  # El cliente reconecta con su offset
+OPERATION_LOG_RETRY_MS = 3000
+OPERATION_STATUS_CHECK_SECONDS = 2
+CREATION_JOB_KINDS = ('create_dev', 'create_prod')
+# Estado del job -> estado que esperan los logs de operaciones
+JOB_OPERATION_STATUS = {'queued': 'queued', 'running': 'running', 'succeeded': 'success', 'failed': 'error', 'cancelled': 'error'}
+
 def log_action(user_id, action, instance_name=None, details=None, status='success'):
     """Registra una acción en el log"""
     try:
@@ -98,6 +123,17 @@ def create_instance():
     source_instance = data.get('sourceInstance')
     if source_instance and not can_user_access_instance(user, source_instance):
         return jsonify({'error': 'No tienes acceso a la instancia de origen seleccionada'}), 403
+
+    # Base de origen restaurada a un momento dado (opcional, ver /api/backup/v2/instances/<instancia>/pitr-restore)
+    source_database = (data.get('sourceDatabase') or '').strip()
+    if source_database and (not source_instance or not is_restored_db_name(source_instance, source_database)):
+        return jsonify({'error': 'La base de origen debe ser una restauración PITR de la instancia de origen'}), 400
+    if source_database:
+        try:
+            if not PitrManager().database_exists(source_database):
+                return jsonify({'error': f'La base de origen {source_database} no existe'}), 400
+        except Exception as e:
+            return jsonify({'error': f'No se pudo verificar la base de origen: {e}'}), 500
     
     # Obtener opción de neutralización (por defecto True)
     neutralize = data.get('neutralize', True)
@@ -120,10 +156,13 @@ def create_instance():
             git_branch,
             system_username,
             system_accesses,
+            source_database,
         )
         
         # Log
         source_msg = f" desde {source_instance}" if source_instance else ""
+        if source_database:
+            source_msg += f" (base {source_database})"
         neutralize_msg = " (neutralizada)" if neutralize else " (sin neutralizar)"
         log_action(
             user_id,
@@ -421,12 +460,96 @@ def restart_instance(instance_name):
         log_action(user_id, 'restart_instance', instance_name, str(e), 'error')
         return jsonify({'error': str(e)}), 500
 
+def _read_operation_log(log_file, tail_bytes=None):
+    """Sin `offset`: lectura completa (o últimos `tail_bytes`); con `offset`: sólo los bytes nuevos"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return read_tail(log_file, tail_bytes) if tail_bytes else read_increment(log_file, 0, max_bytes=None)
+    return read_increment(log_file, max(offset, 0))
+
+
+def _operation_status(instance_name, kinds):
+    """Estado de la última operación de `kinds` según su job (o los archivos de /tmp si no hay job)"""
+    job = latest_job(instance_name, kinds)
+    if job is None:
+        return read_operation_status(instance_name) if set(kinds) & set(CREATION_JOB_KINDS) else None
+
+    status = JOB_OPERATION_STATUS.get(job.status, job.status)
+    return {
+        'pid': str(job.pid) if job.pid else None,
+        'status': status,
+        'finished': status == 'success',
+        'error': status == 'error',
+        'job_id': job.id,
+        'progress': job.progress,
+        'progress_message': job.progress_message
+    }
+
+
+def _operation_log_stream(log_file, instance_name=None, kinds=()):
+    """
+    Stream SSE de un log de operación desde `offset`: eventos `log` con los
+    bytes nuevos y `status` cuando cambia el estado del job de la instancia
+    (el stream termina al llegar a success/error).
+    """
+    app = current_app._get_current_object()
+
+    def read_status():
+        with app.app_context():
+            return _operation_status(instance_name, kinds)
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    if not stream_slots.acquire(Config.SSE_MAX_STREAMS_PER_WORKER):
+        return jsonify({'error': 'Demasiados streams abiertos en este worker'}), 503
+    followed = log_follower.subscribe(log_file, Config.LOG_FOLLOW_MAX_CLIENTS)
+    if followed is None:
+        stream_slots.release()
+        return jsonify({'error': 'Demasiados clientes siguiendo logs'}), 503
+
+    def generate():
+        try:
+            yield f"retry: {OPERATION_LOG_RETRY_MS}\n\n"
+
+            next_offset = offset
+            last_status = None
+            last_seq = followed.seq
+            last_sent = time.monotonic()
+            deadline = time.monotonic() + OPERATION_LOG_MAX_SECONDS
+            while time.monotonic() < deadline:
+                chunk = read_increment(log_file, next_offset)
+                if chunk['log'] or chunk['reset']:
+                    next_offset = chunk['next_offset']
+                    payload = json.dumps({'log': chunk['log'], 'next_offset': next_offset, 'reset': chunk['reset']})
+                    yield f"id: {next_offset}\nevent: log\ndata: {payload}\n\n"
+                    last_sent = time.monotonic()
+                    if next_offset < chunk['size']:
+                        continue
+
+                status = read_status() if instance_name else None
+                if status:
+                    if status != last_status:
+                        last_status = status
+                        yield f"event: status\ndata: {json.dumps(status)}\n\n"
+                        last_sent = time.monotonic()
+                    if status['status'] in FINAL_STATUSES and next_offset >= chunk['size']:
+                        return
+
+                if time.monotonic() - last_sent >= OPERATION_LOG_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+
+                # El estado del job no se vigila por inotify: se revisa al menos cada pocos segundos
+                last_seq, _changed = log_follower.wait_for_change(followed, last_seq, OPERATION_STATUS_CHECK_SECONDS)
+        finally:
+            log_follower.unsubscribe(followed)
+
+    return event_stream(generate())
+
+
 @instances_bp.route('/creation-log/<instance_name>', methods=['GET'])
 @jwt_required()
 def get_creation_log(instance_name):
-    """Obtiene log incremental + estado + pid de creación"""
-    import os
-
+    """Obtiene log incremental (desde `offset`) + estado + pid de creación"""
     user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
     if not user:
@@ -435,69 +558,51 @@ def get_creation_log(instance_name):
     if not can_user_access_instance(user, instance_name):
         return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
 
-    # Paths
-    log_file = f'/tmp/odoo-create-{instance_name}.log'
-    pid_file = f'/tmp/{instance_name}.pid'
-    status_file = f'/tmp/{instance_name}.status'
-
     # Si el log aún no existe
+    log_file = creation_log_path(instance_name)
     if not os.path.exists(log_file):
         return jsonify({
             'exists': False,
             'log': 'Log no disponible aún...',
+            'next_offset': 0,
             'pid': None,
             'status': 'pending',
             'finished': False,
             'error': False
         }), 200
 
-    # Leer últimas 5000 bytes estilo tail
     try:
-        with open(log_file, 'rb') as f:
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            offset = max(size - 5000, 0)
-            f.seek(offset)
-            log_content = f.read().decode(errors="replace")
+        chunk = _read_operation_log(log_file, tail_bytes=CREATION_LOG_TAIL_BYTES)
     except Exception as e:
         return jsonify({'error': f'Error leyendo log: {e}'}), 500
 
-    # Leer PID
-    pid = None
-    if os.path.exists(pid_file):
-        try:
-            with open(pid_file, 'r') as f:
-                pid = f.read().strip()
-        except:
-            pid = None
-
-    # Leer estado
-    status = "running"
-    if os.path.exists(status_file):
-        try:
-            with open(status_file, 'r') as f:
-                status = f.read().strip()
-        except:
-            status = "unknown"
-
-    finished = (status == "success")
-    error = (status == "error")
-
     return jsonify({
         'exists': True,
-        'log': log_content,
-        'pid': pid,
-        'status': status,
-        'finished': finished,
-        'error': error
+        'log': chunk['log'],
+        'offset': chunk['offset'],
+        'next_offset': chunk['next_offset'],
+        'reset': chunk['reset'],
+        **(_operation_status(instance_name, CREATION_JOB_KINDS))
     }), 200
 
+@instances_bp.route('/creation-log/<instance_name>/stream', methods=['GET'])
+@jwt_required()
+def stream_creation_log(instance_name):
+    """Log de creación en vivo (SSE) desde `offset`, con cambios de estado"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+
+    if not can_user_access_instance(user, instance_name):
+        return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+
+    return _operation_log_stream(creation_log_path(instance_name), instance_name, CREATION_JOB_KINDS)
+
 @instances_bp.route('/update-log/<instance_name>/<action>', methods=['GET'])
 @jwt_required()
 def get_update_log(instance_name, action):
-    """Obtiene el log de actualización de una instancia"""
-    import os
-
+    """Obtiene el log de actualización de una instancia (desde `offset` si se indica)"""
     user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
     if not user:
@@ -506,27 +611,43 @@ def get_update_log(instance_name, action):
     if not can_user_access_instance(user, instance_name):
         return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
     
-    log_files = {
-        'update-db': f'/tmp/odoo-update-db-{instance_name}.log',
-        'update-files': f'/tmp/odoo-update-files-{instance_name}.log',
-        'sync-filestore': f'/tmp/odoo-sync-filestore-{instance_name}.log',
-        'regenerate-assets': f'/tmp/odoo-regenerate-assets-{instance_name}.log'
-    }
-    
-    log_file = log_files.get(action)
+    log_file = update_log_path(instance_name, action)
     if not log_file:
         return jsonify({'error': 'Acción no válida'}), 400
     
     if not os.path.exists(log_file):
-        return jsonify({'log': 'Log no disponible aún...', 'exists': False}), 200
+        return jsonify({'log': 'Log no disponible aún...', 'exists': False, 'next_offset': 0}), 200
     
     try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-        return jsonify({'log': content, 'exists': True}), 200
+        chunk = _read_operation_log(log_file)
+        return jsonify({
+            'log': chunk['log'],
+            'exists': True,
+            'offset': chunk['offset'],
+            'next_offset': chunk['next_offset'],
+            'reset': chunk['reset']
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@instances_bp.route('/update-log/<instance_name>/<action>/stream', methods=['GET'])
+@jwt_required()
+def stream_update_log(instance_name, action):
+    """Log de actualización en vivo (SSE) desde `offset`"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+
+    if not can_user_access_instance(user, instance_name):
+        return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+
+    log_file = update_log_path(instance_name, action)
+    if not log_file:
+        return jsonify({'error': 'Acción no válida'}), 400
+
+    return _operation_log_stream(log_file, instance_name, (action.replace('-', '_'),))
+
 @instances_bp.route('/<instance_name>/sync-filestore', methods=['POST'])
 @jwt_required()
 def sync_instance_filestore(instance_name):
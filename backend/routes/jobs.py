@@ -0,0 +1,82 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import Job, User
+from services.access_control import can_user_access_instance, get_user_allowed_instances
+from services.job_manager import cancel_job, ACTIVE_STATUSES
+
+jobs_bp = Blueprint('jobs', __name__)
+
+JOBS_MAX_LIMIT = 200
+
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    """Lista los jobs (en cola, en curso y recientes) de las instancias visibles para el usuario"""
+    user = User.query.get(int(get_jwt_identity()))
+    if not user or user.role not in ['admin', 'developer', 'viewer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    try:
+        instance = request.args.get('instance')
+        status = request.args.get('status')  # queued, running, succeeded, failed, cancelled o "active"
+        limit = max(1, min(request.args.get('limit', default=50, type=int), JOBS_MAX_LIMIT))
+
+        query = Job.query
+        allowed = get_user_allowed_instances(user)
+        if allowed is not None:
+            query = query.filter(Job.instance_name.in_(allowed))
+        if instance:
+            query = query.filter(Job.instance_name == instance)
+        if status == 'active':
+            query = query.filter(Job.status.in_(ACTIVE_STATUSES))
+        elif status:
+            query = query.filter(Job.status == status)
+
+        jobs = query.order_by(Job.id.desc()).limit(limit).all()
+        return jsonify({
+            'jobs': [job.to_dict() for job in jobs],
+            'count': len(jobs)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Estado y avance de un job"""
+    user = User.query.get(int(get_jwt_identity()))
+    if not user or user.role not in ['admin', 'developer', 'viewer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job no encontrado'}), 404
+    if not can_user_access_instance(user, job.instance_name) and user.role != 'admin':
+        return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel(job_id):
+    """Cancela un job en cola o en curso"""
+    user = User.query.get(int(get_jwt_identity()))
+    if not user or user.role not in ['admin', 'developer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job no encontrado'}), 404
+    if not can_user_access_instance(user, job.instance_name) and user.role != 'admin':
+        return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+    if job.status not in ACTIVE_STATUSES:
+        return jsonify({'error': f'El job ya terminó ({job.status})'}), 409
+
+    try:
+        job = cancel_job(job_id)
+        return jsonify({'success': True, 'job': job.to_dict()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
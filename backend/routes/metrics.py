@@ -1,8 +1,22 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, jsonify, request, Response, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
+import time
 from services.system_monitor import SystemMonitor
-from models import db, MetricsHistory
+from services.metrics_sampler import metrics_sampler, build_history_entry
+from services.stream_slots import stream_slots, event_stream
+from services.metrics_rollup import store_history_entries
+from services.metrics_query import (
+    query_history,
+    points_to_rows,
+    points_to_columnar,
+    points_to_binary,
+    HISTORY_MODES,
+    HISTORY_FORMATS,
+)
+from services.instance_metrics import query_instance_history, top_instances, INSTANCE_METRIC_FIELDS
+from services.access_control import can_user_access_instance, get_user_allowed_instances
+from models import db, User
 
 metrics_bp = Blueprint('metrics', __name__)
 monitor = SystemMonitor()
@@ -10,75 +24,67 @@ monitor = SystemMonitor()
 MAX_RANGE_MINUTES = 60 * 24 * 30  # 30 días
 DEFAULT_POINTS = 240
 MAX_POINTS = 1000
-AUTO_SAVE_INTERVAL_SECONDS = 15
-
-
-def _build_history_entry(metrics):
-    return MetricsHistory(
-        cpu_percent=metrics['cpu']['percent'],
-        ram_percent=metrics['memory']['percent'],
-        ram_used_gb=metrics['memory']['used_gb'],
-        ram_total_gb=metrics['memory']['total_gb'],
-        disk_percent=metrics['disk'][0]['percent'] if metrics['disk'] else None,
-        disk_used_gb=metrics['disk'][0]['used_gb'] if metrics['disk'] else None,
-        disk_total_gb=metrics['disk'][0]['total_gb'] if metrics['disk'] else None,
-        network_sent_mb=metrics['network']['mb_sent'],
-        network_recv_mb=metrics['network']['mb_recv']
-    )
-
-
-def _downsample_metrics(rows, max_points):
-    total_rows = len(rows)
-    if total_rows <= max_points:
-        return rows
-
-    if max_points <= 1:
-        return [rows[-1]]
-
-    step = (total_rows - 1) / (max_points - 1)
-    sampled = []
-    seen_indexes = set()
-
-    for i in range(max_points):
-        index = int(round(i * step))
-        if index >= total_rows:
-            index = total_rows - 1
-        if index in seen_indexes:
-            continue
-        sampled.append(rows[index])
-        seen_indexes.add(index)
-
-    if sampled and sampled[-1] != rows[-1]:
-        sampled.append(rows[-1])
+FIRST_SAMPLE_TIMEOUT_SECONDS = 3
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_SECONDS = 600  # El cliente reconecta al cortar; evita streams eternos
+STREAM_RETRY_MS = 3000
+TOP_INSTANCES_DEFAULT_MINUTES = 5
+TOP_INSTANCES_MAX_LIMIT = 50
+
+
+def _get_latest_metrics():
+    """Última muestra del sampler; si aún no hay ninguna, mide en el momento"""
+    metrics = metrics_sampler.latest(wait_timeout=FIRST_SAMPLE_TIMEOUT_SECONDS)
+    if metrics is None:
+        metrics = monitor.get_all_metrics()
+    return metrics
 
-    return sampled
 
 @metrics_bp.route('/current', methods=['GET'])
 @jwt_required()
 def get_current_metrics():
-    """Obtiene las métricas actuales del sistema"""
+    """Obtiene las métricas actuales del sistema (última muestra en memoria)"""
     try:
-        metrics = monitor.get_all_metrics()
-
-        # Guardado oportunista para asegurar historial aunque el cron falle
-        latest = MetricsHistory.query.order_by(MetricsHistory.timestamp.desc()).first()
-        now = datetime.utcnow()
-        should_store = (
-            latest is None
-            or latest.timestamp is None
-            or (now - latest.timestamp).total_seconds() >= AUTO_SAVE_INTERVAL_SECONDS
-        )
-
-        if should_store:
-            history = _build_history_entry(metrics)
-            db.session.add(history)
-            db.session.commit()
-
-        return jsonify(metrics), 200
+        # El historial lo persiste el sampler en lotes, no este endpoint
+        return jsonify(_get_latest_metrics()), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@metrics_bp.route('/stream', methods=['GET'])
+@jwt_required()
+def stream_metrics():
+    """Stream SSE de métricas: una sola muestra compartida por todos los clientes"""
+    if not stream_slots.acquire(current_app.config.get('SSE_MAX_STREAMS_PER_WORKER', 6)):
+        return jsonify({'error': 'Demasiados streams abiertos en este worker'}), 503
+
+    max_clients = current_app.config.get('METRICS_STREAM_MAX_CLIENTS', 6)
+    if not metrics_sampler.subscribe(max_clients):
+        stream_slots.release()
+        return jsonify({'error': 'Demasiados clientes conectados al stream de métricas'}), 503
+
+    def generate():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+
+            last_seq = 0
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                seq, payload = metrics_sampler.wait_for_sample(last_seq, STREAM_KEEPALIVE_SECONDS)
+                if payload is None:
+                    yield ": keepalive\n\n"
+                    continue
+
+                # Ticks perdidos mientras el cliente estaba ocupado (se envía sólo el último)
+                missed = max(0, seq - last_seq - 1) if last_seq else 0
+                last_seq = seq
+                yield f"id: {seq}\nevent: metrics\ndata: {payload}\n\n"
+                if missed:
+                    yield f"event: coalesced\ndata: {missed}\n\n"
+        finally:
+            metrics_sampler.unsubscribe()
+
+    return event_stream(generate())
+
 @metrics_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_metrics_history():
@@ -91,28 +97,121 @@ def get_metrics_history():
         requested_points = request.args.get('points', default=DEFAULT_POINTS, type=int) or DEFAULT_POINTS
         max_points = max(1, min(requested_points, MAX_POINTS))
         
+        mode = request.args.get('mode', 'avg')
+        if mode not in HISTORY_MODES:
+            return jsonify({'error': f"Modo inválido. Opciones: {', '.join(HISTORY_MODES)}"}), 400
+
+        output_format = request.args.get('format', 'rows')
+        if output_format not in HISTORY_FORMATS:
+            return jsonify({'error': f"Formato inválido. Opciones: {', '.join(HISTORY_FORMATS)}"}), 400
+
         # Calcular timestamp de inicio
-        start_time = datetime.utcnow() - timedelta(minutes=minutes)
-        
-        # Consultar historial
-        metrics = MetricsHistory.query.filter(
-            MetricsHistory.timestamp >= start_time
-        ).order_by(MetricsHistory.timestamp.asc()).all()
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(minutes=minutes)
+
+        # La reducción a `points` se hace en PostgreSQL (rollup o crudo)
+        metrics, total, resolution = query_history(
+            db.session, start_time, end_time, max_points, mode=mode, range_minutes=minutes
+        )
 
         # Asegurar al menos un dato para que el dashboard nunca quede vacío
         if not metrics:
-            live_metrics = monitor.get_all_metrics()
-            history = _build_history_entry(live_metrics)
-            db.session.add(history)
+            store_history_entries(db.session, [build_history_entry(_get_latest_metrics())])
             db.session.commit()
-            metrics = [history]
+            metrics, total, resolution = query_history(
+                db.session, start_time, datetime.utcnow(), max_points, mode=mode, range_minutes=minutes
+            )
+
+        summary = {
+            'count': len(metrics),
+            'total': total,
+            'range_minutes': minutes,
+            'resolution': resolution,
+            'mode': mode
+        }
+
+        if output_format == 'binary':
+            # Metadatos en headers; el cuerpo son los arrays empaquetados
+            return Response(
+                points_to_binary(metrics),
+                mimetype='application/octet-stream',
+                headers={f'X-Metrics-{key.replace("_", "-").title()}': str(value) for key, value in summary.items()}
+            )
+
+        if output_format == 'columnar':
+            return jsonify({**summary, 'format': 'columnar', **points_to_columnar(metrics)}), 200
+
+        return jsonify({**summary, 'metrics': points_to_rows(metrics)}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/instances/<instance_name>/history', methods=['GET'])
+@jwt_required()
+def get_instance_metrics_history(instance_name):
+    """Historial de consumo (CPU, RSS, IO, archivos, conexiones) de una instancia"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user:
+            return jsonify({'error': 'Usuario no encontrado'}), 404
+
+        if not can_user_access_instance(user, instance_name):
+            return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+
+        minutes = request.args.get('minutes', default=60, type=int) or 60
+        minutes = max(1, min(minutes, MAX_RANGE_MINUTES))
+
+        requested_points = request.args.get('points', default=DEFAULT_POINTS, type=int) or DEFAULT_POINTS
+        max_points = max(1, min(requested_points, MAX_POINTS))
+
+        output_format = request.args.get('format', 'rows')
+        if output_format not in ('rows', 'columnar'):
+            return jsonify({'error': 'Formato inválido. Opciones: rows, columnar'}), 400
+
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(minutes=minutes)
+        points = query_instance_history(db.session, instance_name, start_time, end_time, max_points)
+
+        summary = {
+            'instance': instance_name,
+            'count': len(points),
+            'range_minutes': minutes
+        }
+
+        if output_format == 'columnar':
+            return jsonify({**summary, 'format': 'columnar', **points_to_columnar(points)}), 200
+
+        return jsonify({**summary, 'metrics': points_to_rows(points)}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/instances/top', methods=['GET'])
+@jwt_required()
+def get_top_instances():
+    """Instancias que más consumen en los últimos minutos"""
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user:
+            return jsonify({'error': 'Usuario no encontrado'}), 404
+
+        metric = request.args.get('metric', 'cpu_percent')
+        if metric not in INSTANCE_METRIC_FIELDS:
+            return jsonify({'error': f"Métrica inválida. Opciones: {', '.join(INSTANCE_METRIC_FIELDS)}"}), 400
+
+        minutes = request.args.get('minutes', default=TOP_INSTANCES_DEFAULT_MINUTES, type=int) or TOP_INSTANCES_DEFAULT_MINUTES
+        minutes = max(1, min(minutes, MAX_RANGE_MINUTES))
+
+        limit = request.args.get('limit', default=10, type=int) or 10
+        limit = max(1, min(limit, TOP_INSTANCES_MAX_LIMIT))
+
+        allowed = get_user_allowed_instances(user)
+        since = datetime.utcnow() - timedelta(minutes=minutes)
+        instances = top_instances(db.session, metric, since, limit, allowed_instances=allowed)
 
-        sampled_metrics = _downsample_metrics(metrics, max_points)
-        
         return jsonify({
-            'metrics': [m.to_dict() for m in sampled_metrics],
-            'count': len(sampled_metrics),
-            'total': len(metrics),
+            'instances': instances,
+            'metric': metric,
             'range_minutes': minutes
         }), 200
     except Exception as e:
@@ -123,12 +222,12 @@ def get_metrics_history():
 def save_current_metrics():
     """Guarda las métricas actuales en el historial (llamado por cron)"""
     try:
-        metrics = monitor.get_all_metrics()
+        metrics = _get_latest_metrics()
         
         # Crear registro
-        history = _build_history_entry(metrics)
+        history = build_history_entry(metrics)
         
-        db.session.add(history)
+        store_history_entries(db.session, [history])
         db.session.commit()
         
         return jsonify({'message': 'Métricas guardadas', 'id': history.id}), 201
@@ -2,135 +2,55 @@ from flask import Blueprint, jsonify, request, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User
 from config import Config
-from services.access_control import can_user_access_instance
+from services.access_control import can_user_access_instance, get_user_allowed_instances
+from services.systemd_status import systemd_status
+from services.instance_descriptor import get_descriptor, list_descriptors
+from services.odoo_log_reader import odoo_log_reader, parse_log_line, scan_reverse, new_stats, count_line
+from services.log_follower import log_follower, LogTail
+from services.log_search_index import search_logs, index_status, top_errors, error_group_detail
+from services import journal_reader
+from services.stream_slots import StreamSlots, stream_slots, event_stream
 import os
-import re
-from collections import deque
+import json
+import time
+from datetime import datetime, timedelta
 
 odoo_logs_bp = Blueprint('odoo_logs', __name__)
 
-# Regex para parsear líneas de log de Odoo
-# Formato: 2026-02-08 15:03:42,089 1200 WARNING dev-mtg-production odoo.http: mensaje
-LOG_LINE_REGEX = re.compile(
-    r'^(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2},\d+)\s+'  # timestamp
-    r'(\d+)\s+'                                              # pid
-    r'(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s+'                # level
-    r'(\S+)\s+'                                              # database
-    r'(\S+):\s*'                                             # logger
-    r'(.*)'                                                  # message
-)
+FOLLOW_KEEPALIVE_SECONDS = 15
+FOLLOW_MAX_SECONDS = 3600  # El cliente reconecta con su cursor
+FOLLOW_RETRY_MS = 3000
+SEARCH_MAX_LIMIT = 500
+ERRORS_DEFAULT_DAYS = 7
+ERRORS_MAX_LIMIT = 100
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Seguimientos del journal abiertos (mismo límite que los de archivos de log)
+journal_follows = StreamSlots()
 
 
 def _get_instance_log_path(instance_name):
     """Obtiene la ruta base de logs para una instancia dinámicamente"""
-    # Verificar en producción
-    prod_path = os.path.join(Config.PROD_ROOT, instance_name)
-    if os.path.isdir(prod_path):
-        return prod_path
-    
-    # Verificar en desarrollo
-    dev_path = os.path.join(Config.DEV_ROOT, instance_name)
-    if os.path.isdir(dev_path):
-        return dev_path
-    
-    return None
+    # Producción primero, luego desarrollo (descriptor compartido con instance_manager)
+    descriptor = get_descriptor(instance_name)
+    return descriptor['path'] if descriptor else None
 
 
 def _get_service_name(instance_name):
     """Obtiene el nombre del servicio systemd para una instancia"""
-    # Intentar detectar el servicio automáticamente
-    import subprocess
-    try:
-        result = subprocess.run(
-            ['systemctl', 'list-units', '--type=service', '--no-pager', '-q'],
-            capture_output=True, text=True, timeout=5
-        )
-        for line in result.stdout.split('\n'):
-            if instance_name in line and 'odoo' in line.lower():
-                return line.strip().split()[0].replace('.service', '')
-    except:
-        pass
+    # Detectar el servicio entre los units odoo* (una sola consulta compartida)
+    states = systemd_status.get_states()
+    for unit in states:
+        if instance_name in unit and 'odoo' in unit.lower():
+            return unit
     
-    # Fallback: intentar nombres comunes
+    # Fallback: nombres comunes (el primero si systemd no conoce ninguno)
     candidates = [
         f'odoo19e-{instance_name}',
         f'odoo-{instance_name}',
         f'odoo19-{instance_name}',
     ]
-    for candidate in candidates:
-        try:
-            result = subprocess.run(
-                ['systemctl', 'is-active', candidate],
-                capture_output=True, text=True, timeout=3
-            )
-            if result.stdout.strip() in ('active', 'inactive', 'failed'):
-                return candidate
-        except:
-            continue
-    
-    return None
-
-
-def tail_file(filepath, lines=500):
-    """Lee las últimas N líneas de un archivo de forma eficiente"""
-    try:
-        with open(filepath, 'rb') as f:
-            # Ir al final del archivo
-            f.seek(0, 2)
-            file_size = f.tell()
-            
-            if file_size == 0:
-                return []
-            
-            # Buffer para leer bloques
-            block_size = 8192
-            blocks = []
-            remaining = file_size
-            found_lines = 0
-            
-            while remaining > 0 and found_lines < lines + 1:
-                read_size = min(block_size, remaining)
-                remaining -= read_size
-                f.seek(remaining)
-                block = f.read(read_size)
-                blocks.insert(0, block)
-                found_lines += block.count(b'\n')
-            
-            content = b''.join(blocks).decode('utf-8', errors='replace')
-            all_lines = content.split('\n')
-            
-            # Devolver las últimas N líneas (sin línea vacía final)
-            if all_lines and all_lines[-1] == '':
-                all_lines = all_lines[:-1]
-            
-            return all_lines[-lines:]
-    except Exception as e:
-        return [f"Error leyendo archivo: {str(e)}"]
-
-
-def parse_log_line(line):
-    """Parsea una línea de log de Odoo y extrae sus componentes"""
-    match = LOG_LINE_REGEX.match(line)
-    if match:
-        return {
-            'timestamp': match.group(1),
-            'pid': match.group(2),
-            'level': match.group(3),
-            'database': match.group(4),
-            'logger': match.group(5),
-            'message': match.group(6),
-            'raw': line
-        }
-    # Línea de continuación (traceback, etc.)
-    return {
-        'timestamp': '',
-        'pid': '',
-        'level': 'CONTINUATION',
-        'database': '',
-        'logger': '',
-        'message': line,
-        'raw': line
-    }
+    return next((candidate for candidate in candidates if candidate in states), candidates[0])
 
 
 @odoo_logs_bp.route('/available/<instance_name>', methods=['GET'])
@@ -204,13 +124,17 @@ def view_log(instance_name):
     lines_count = request.args.get('lines', 500, type=int)
     level_filter = request.args.get('level', '')  # INFO, WARNING, ERROR, CRITICAL
     search = request.args.get('search', '')
-    
+    logger_name = request.args.get('logger', '')  # Incluye loggers hijos
+    before = request.args.get('before', '')  # Cursor "cargar anteriores" (devuelto en `cursor.before`)
+    since = request.args.get('since', '').replace('T', ' ')[:19]  # 'YYYY-MM-DD HH:MM:SS'
+    until = request.args.get('until', '').replace('T', ' ')[:19]
+
     # Limitar líneas
     lines_count = min(lines_count, 5000)
     
     # Determinar archivo
     if log_type == 'systemd':
-        return _read_systemd_log(instance_name, lines_count, level_filter, search)
+        return _read_systemd_log(instance_name, lines_count, level_filter, search, before, since, until)
     
     log_filename = f'{log_type}.log'
     log_path = os.path.join(base_path, log_filename)
@@ -221,39 +145,48 @@ def view_log(instance_name):
             'path': log_path
         }), 404
     
-    # Leer últimas líneas
-    raw_lines = tail_file(log_path, lines_count * 2 if level_filter else lines_count)
-    
-    # Parsear líneas
-    parsed_lines = []
-    for line in raw_lines:
-        if not line.strip():
-            continue
-        parsed = parse_log_line(line)
-        
-        # Filtrar por nivel
-        if level_filter and parsed['level'] not in ('CONTINUATION', level_filter):
-            continue
-        
-        # Filtrar por búsqueda
-        if search and search.lower() not in line.lower():
-            continue
-        
-        parsed_lines.append(parsed)
-    
-    # Limitar resultado final
-    parsed_lines = parsed_lines[-lines_count:]
-    
-    # Estadísticas
-    stats = {
-        'total': len(parsed_lines),
-        'info': sum(1 for l in parsed_lines if l['level'] == 'INFO'),
-        'warning': sum(1 for l in parsed_lines if l['level'] == 'WARNING'),
-        'error': sum(1 for l in parsed_lines if l['level'] == 'ERROR'),
-        'critical': sum(1 for l in parsed_lines if l['level'] == 'CRITICAL'),
-        'debug': sum(1 for l in parsed_lines if l['level'] == 'DEBUG'),
-    }
-    
+    if not level_filter and not search and not logger_name and not until:
+        # Sin filtros: página exacta vía índice de offsets (cursor para cargar anteriores)
+        page = odoo_log_reader.read_page(log_path, lines_count, before=before or None, since=since or None)
+        parsed_lines = []
+        stats = new_stats()
+        for line_no, line in page['lines']:
+            if not line.strip():
+                continue
+            parsed = parse_log_line(line)
+            parsed['line_no'] = line_no + 1
+            parsed_lines.append(parsed)
+            count_line(stats, parsed)
+
+        cursor = {
+            'before': page['before'],
+            'after': page['after'],
+            'start_line': page['start'],
+            'end_line': page['end'],
+            'follow': page['follow'],
+            'total_lines': page['total_lines'],
+        }
+    else:
+        # Con filtros: lectura inversa que filtra mientras lee y corta al llegar a `lines_count`
+        scan = scan_reverse(
+            log_path,
+            lines_count,
+            level=level_filter or None,
+            search=search or None,
+            logger_name=logger_name or None,
+            since=since or None,
+            until=until or None,
+            before=before or None,
+            byte_budget=Config.LOG_SCAN_BYTE_BUDGET,
+        )
+        parsed_lines = scan['lines']
+        stats = scan['stats']
+        cursor = {
+            'before': scan['before'],
+            'scanned_bytes': scan['scanned_bytes'],
+            'budget_exhausted': scan['budget_exhausted'],
+        }
+
     # Info del archivo
     file_size = os.path.getsize(log_path)
     
@@ -263,6 +196,7 @@ def view_log(instance_name):
         'log_type': log_type,
         'lines': parsed_lines,
         'stats': stats,
+        'cursor': cursor,
         'file_info': {
             'path': log_path,
             'size': file_size,
@@ -271,64 +205,312 @@ def view_log(instance_name):
     }), 200
 
 
-def _read_systemd_log(instance_name, lines_count, level_filter, search):
-    """Lee logs desde journalctl para una instancia"""
-    import subprocess
-    
+@odoo_logs_bp.route('/follow/<instance_name>', methods=['GET'])
+@jwt_required()
+def follow_log(instance_name):
+    """Stream SSE con las líneas agregadas al log desde el cursor del cliente"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+
+    if not user or user.role not in ['admin', 'developer', 'viewer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    if not can_user_access_instance(user, instance_name):
+        return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+
+    base_path = _get_instance_log_path(instance_name)
+    if not base_path:
+        return jsonify({'error': f'Instancia no encontrada: {instance_name}'}), 404
+
+    log_type = request.args.get('type', 'odoo')
+    level_filter = request.args.get('level', '')
+    search = request.args.get('search', '').lower()
+    # Cursor '<inode>:<offset>' o cursor del journal (de /view o del último evento recibido)
+    cursor = request.args.get('cursor') or request.headers.get('Last-Event-ID')
+
+    if log_type == 'systemd':
+        service_name = _get_service_name(instance_name)
+        if not service_name:
+            return jsonify({'error': 'Servicio systemd no encontrado'}), 404
+        if not stream_slots.acquire(Config.SSE_MAX_STREAMS_PER_WORKER):
+            return jsonify({'error': 'Demasiados streams abiertos en este worker'}), 503
+        return _follow_systemd_log(service_name, cursor, level_filter, search)
+
+    log_filename = f'{log_type}.log'
+    log_path = os.path.join(base_path, log_filename)
+    if not os.path.exists(log_path):
+        return jsonify({'error': f'Archivo de log no encontrado: {log_filename}'}), 404
+
+    if not stream_slots.acquire(Config.SSE_MAX_STREAMS_PER_WORKER):
+        return jsonify({'error': 'Demasiados streams abiertos en este worker'}), 503
+
+    max_clients = Config.LOG_FOLLOW_MAX_CLIENTS
+    followed = log_follower.subscribe(log_path, max_clients)
+    if followed is None:
+        stream_slots.release()
+        return jsonify({'error': 'Demasiados clientes siguiendo logs'}), 503
+
+    tail = LogTail(followed.path, cursor)
+
+    def generate():
+        try:
+            yield f"retry: {FOLLOW_RETRY_MS}\n\n"
+
+            last_seq = followed.seq
+            last_sent = time.monotonic()
+            more = True
+            deadline = time.monotonic() + FOLLOW_MAX_SECONDS
+            while time.monotonic() < deadline:
+                if not more:
+                    # Al vencer el timeout igual se verifica por stat (eventos perdidos)
+                    last_seq, _changed = log_follower.wait_for_change(followed, last_seq, FOLLOW_KEEPALIVE_SECONDS)
+
+                lines, reset, more = tail.poll()
+                if reset:
+                    yield f"id: {tail.cursor}\nevent: reset\ndata: {json.dumps({'reason': reset, 'cursor': tail.cursor})}\n\n"
+
+                lines = [
+                    line for line in lines
+                    if (not level_filter or line['level'] in ('CONTINUATION', level_filter))
+                    and (not search or search in line['raw'].lower())
+                ]
+                if lines:
+                    payload = json.dumps({'lines': lines, 'cursor': tail.cursor})
+                    yield f"id: {tail.cursor}\nevent: lines\ndata: {payload}\n\n"
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= FOLLOW_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            tail.close()
+            log_follower.unsubscribe(followed)
+
+    return event_stream(generate())
+
+
+@odoo_logs_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_indexed_logs():
+    """
+    Búsqueda sobre el índice de logs (odoo.log + rotados) de las instancias.
+    Ej: ?level=ERROR&logger=odoo.addons.stock&days=3 — paginado con `cursor`.
+    """
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+
+    if not user or user.role not in ['admin', 'developer', 'viewer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    instance_name = request.args.get('instance', '')
+    if instance_name:
+        if not can_user_access_instance(user, instance_name):
+            return jsonify({'error': 'No tienes acceso a esta instancia'}), 403
+        instances = {instance_name}
+    else:
+        instances = get_user_allowed_instances(user)  # None = todas (admin)
+
+    levels = [level.strip().upper() for level in request.args.get('level', '').split(',') if level.strip()]
+    invalid = [level for level in levels if level not in LOG_LEVELS]
+    if invalid:
+        return jsonify({'error': f"Nivel inválido: {', '.join(invalid)}. Opciones: {', '.join(LOG_LEVELS)}"}), 400
+
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        return jsonify({'error': 'Fecha inválida (usar formato ISO, ej: 2026-01-31T10:00)'}), 400
+
+    days = request.args.get('days', type=float)
+    hours = request.args.get('hours', type=float)
+    if since is None and (days or hours):
+        since = datetime.now() - timedelta(days=days or 0, hours=hours or 0)
+
+    limit = max(1, min(request.args.get('limit', 100, type=int), SEARCH_MAX_LIMIT))
+
+    try:
+        started = time.monotonic()
+        entries, next_cursor = search_logs(
+            instances=instances,
+            query=request.args.get('q', '').strip() or None,
+            levels=levels or None,
+            logger_name=request.args.get('logger', '').strip() or None,
+            database=request.args.get('database', '').strip() or None,
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=request.args.get('cursor') or None,
+        )
+
+        took_ms = round((time.monotonic() - started) * 1000, 1)
+
+        status = index_status()
+        if instances is not None and 'instances' in status:
+            status['instances'] = {name: info for name, info in status['instances'].items() if name in instances}
+
+        return jsonify({
+            'success': True,
+            'results': entries,
+            'count': len(entries),
+            'next_cursor': next_cursor,
+            'took_ms': took_ms,
+            'index': status,
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Error buscando en el índice de logs: {str(e)}'}), 500
+
+
+def _error_scope(user):
+    """Instancias sobre las que se agregan errores: acceso del usuario ∩ ?instance= ∩ ?env="""
+    instances = get_user_allowed_instances(user)  # None = todas (admin)
+
+    instance_name = request.args.get('instance', '')
+    if instance_name:
+        if not can_user_access_instance(user, instance_name):
+            return None, (jsonify({'error': 'No tienes acceso a esta instancia'}), 403)
+        instances = {instance_name}
+
+    env_type = request.args.get('env', '')
+    if env_type:
+        if env_type not in ('production', 'development'):
+            return None, (jsonify({'error': 'env inválido (production o development)'}), 400)
+        names = {descriptor['name'] for descriptor in list_descriptors(env_type)}
+        instances = names if instances is None else instances & names
+
+    return instances, None
+
+
+@odoo_logs_bp.route('/errors/top', methods=['GET'])
+@jwt_required()
+def get_top_errors():
+    """Errores más frecuentes (agrupados por fingerprint) en los últimos `days` días"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+
+    if not user or user.role not in ['admin', 'developer', 'viewer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    instances, error = _error_scope(user)
+    if error:
+        return error
+
+    days = max(1, min(request.args.get('days', ERRORS_DEFAULT_DAYS, type=int), Config.LOG_SEARCH_RETENTION_DAYS))
+    limit = max(1, min(request.args.get('limit', 20, type=int), ERRORS_MAX_LIMIT))
+
+    try:
+        since = datetime.now() - timedelta(days=days)
+        return jsonify({
+            'success': True,
+            'days': days,
+            'errors': top_errors(instances, since, limit),
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Error consultando errores agrupados: {str(e)}'}), 500
+
+
+@odoo_logs_bp.route('/errors/<fingerprint>', methods=['GET'])
+@jwt_required()
+def get_error_group(fingerprint):
+    """Detalle de un grupo de errores: traceback de ejemplo, instancias afectadas y serie diaria"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+
+    if not user or user.role not in ['admin', 'developer', 'viewer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+
+    instances, error = _error_scope(user)
+    if error:
+        return error
+
+    days = max(1, min(request.args.get('days', ERRORS_DEFAULT_DAYS, type=int), Config.LOG_SEARCH_RETENTION_DAYS))
+
+    try:
+        detail = error_group_detail(fingerprint, instances, datetime.now() - timedelta(days=days))
+        if detail is None:
+            return jsonify({'error': 'Grupo de errores no encontrado'}), 404
+        return jsonify({'success': True, 'days': days, 'error': detail}), 200
+    except Exception as e:
+        return jsonify({'error': f'Error consultando el grupo de errores: {str(e)}'}), 500
+
+
+def _parse_journal_time(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+
+
+def _read_systemd_log(instance_name, lines_count, level_filter, search, before='', since='', until=''):
+    """Lee el journal de la unidad de la instancia (PRIORITY y timestamps reales, paginado por cursor)"""
     service_name = _get_service_name(instance_name)
     if not service_name:
         return jsonify({'error': 'Servicio systemd no encontrado'}), 404
-    
+
     try:
-        cmd = ['journalctl', '-u', service_name, '--no-pager', '-n', str(lines_count)]
-        
-        if level_filter:
-            priority_map = {
-                'ERROR': '3',
-                'CRITICAL': '2',
-                'WARNING': '4',
-                'INFO': '6',
-                'DEBUG': '7'
-            }
-            if level_filter in priority_map:
-                cmd.extend(['-p', priority_map[level_filter]])
-        
-        if search:
-            cmd.extend(['-g', search])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        
-        lines = []
-        for line in result.stdout.split('\n'):
-            if not line.strip():
-                continue
-            lines.append({
-                'timestamp': '',
-                'pid': '',
-                'level': 'INFO',
-                'database': '',
-                'logger': 'systemd',
-                'message': line,
-                'raw': line
-            })
-        
+        page = journal_reader.read_page(
+            service_name,
+            lines_count,
+            before=before or None,
+            since=_parse_journal_time(since),
+            until=_parse_journal_time(until),
+            level=level_filter or None,
+            search=search or None,
+            max_scan=Config.LOG_JOURNAL_SCAN_MAX_ENTRIES,
+        )
+
+        stats = new_stats()
+        for line in page['lines']:
+            count_line(stats, line)
+
         return jsonify({
             'success': True,
             'instance': instance_name,
             'log_type': 'systemd',
-            'lines': lines,
-            'stats': {'total': len(lines)},
+            'lines': page['lines'],
+            'stats': stats,
+            'cursor': {
+                'before': page['before'],
+                'follow': page['follow'],
+                'scanned_entries': page['scanned'],
+            },
             'file_info': {
-                'path': f'journalctl -u {service_name}',
+                'path': f'journal _SYSTEMD_UNIT={journal_reader.unit_name(service_name)}',
                 'size': 0,
                 'size_human': 'systemd'
             }
         }), 200
-        
+
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido (YYYY-MM-DD HH:MM:SS)'}), 400
     except Exception as e:
         return jsonify({'error': f'Error leyendo logs de systemd: {str(e)}'}), 500
 
 
+def _follow_systemd_log(service_name, cursor, level_filter, search):
+    """Stream SSE del journal de la unidad desde un cursor del journal"""
+    if not journal_follows.acquire(Config.LOG_FOLLOW_MAX_CLIENTS):
+        stream_slots.release()
+        return jsonify({'error': 'Demasiados clientes siguiendo logs'}), 503
+
+    def generate():
+        # Se abre al empezar el stream: una respuesta descartada no deja un journalctl corriendo
+        journal = journal_reader.follow_journal(service_name, cursor)
+        try:
+            yield f"retry: {FOLLOW_RETRY_MS}\n\n"
+
+            last_sent = time.monotonic()
+            deadline = time.monotonic() + FOLLOW_MAX_SECONDS
+            while time.monotonic() < deadline and not journal.ended:
+                lines = journal.poll(Config.LOG_FOLLOW_POLL_SECONDS, level=level_filter or None, search=search or None)
+                if lines:
+                    payload = json.dumps({'lines': lines, 'cursor': journal.cursor})
+                    yield f"id: {journal.cursor}\nevent: lines\ndata: {payload}\n\n"
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= FOLLOW_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            journal.close()
+
+    return event_stream(generate(), on_close=journal_follows.release)
+
+
 def _human_size(size_bytes):
     """Convierte bytes a formato legible"""
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from models import db, User, UserProfile
-from services.instance_manager import InstanceManager
+from services.instance_descriptor import list_descriptors
 from services.access_control import normalize_instance_names, sync_user_instance_access
 from services.system_user_access import (
     get_system_user_status,
@@ -12,7 +12,6 @@ from services.system_user_access import (
 )
 
 users_bp = Blueprint('users', __name__)
-manager = InstanceManager()
 
 VALID_ROLES = {'admin', 'developer', 'viewer'}
 
@@ -54,7 +53,8 @@ def list_available_instances():
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Permisos insuficientes'}), 403
 
-    instances = manager.list_instances()
+    # Sólo nombres/tipo/dominio: no hace falta consultar systemd
+    instances = list_descriptors()
     instances = sorted(instances, key=lambda instance: instance.get('name', ''))
 
     return jsonify({
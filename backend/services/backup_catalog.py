@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import db, BackupCatalogEntry
+from services.backup_manifest import MANIFEST_SUFFIX, read_manifest, remove_manifest, summary
+
+logger = logging.getLogger(__name__)
+
+# Archivos de backup de una instancia (los parciales empiezan con '.')
+BACKUP_EXTENSIONS = ('.tar.gz', '.zip')
+
+
+def is_backup_file(filename):
+    return filename.endswith(BACKUP_EXTENSIONS) and not filename.startswith('.')
+
+
+def _file_mtime(st):
+    return datetime.fromtimestamp(int(st.st_mtime))
+
+
+def _commit():
+    """Un error del catálogo no hace fallar la operación sobre el archivo: lo corrige la reconciliación"""
+    try:
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error updating backup catalog: {e}")
+        return False
+
+
+def _apply_manifest(entry, manifest):
+    """Checksum y resumen del manifiesto (sin la lista de miembros, que queda en el sidecar)"""
+    entry.checksum = manifest['sha256'] if manifest else None
+    entry.manifest = json.dumps(summary(manifest)) if manifest else None
+
+
+def record_backup(instance_name, path, status='ok', manifest=None):
+    """Alta (o actualización) de un archivo con su tamaño, mtime y manifiesto (por defecto, el sidecar)"""
+    st = os.stat(path)
+    filename = os.path.basename(path)
+    entry = BackupCatalogEntry.query.filter_by(instance_name=instance_name, filename=filename).first()
+    if not entry:
+        entry = BackupCatalogEntry(instance_name=instance_name, filename=filename)
+        db.session.add(entry)
+    entry.size_bytes = st.st_size
+    entry.mtime = _file_mtime(st)
+    entry.status = status
+    _apply_manifest(entry, manifest or read_manifest(path))
+    return _commit()
+
+
+def forget_backups(instance_name, filenames):
+    if not filenames:
+        return True
+    BackupCatalogEntry.query.filter(
+        BackupCatalogEntry.instance_name == instance_name,
+        BackupCatalogEntry.filename.in_(filenames),
+    ).delete(synchronize_session=False)
+    return _commit()
+
+
+def rename_backup(instance_name, old_filename, new_path):
+    entry = BackupCatalogEntry.query.filter_by(instance_name=instance_name, filename=old_filename).first()
+    if not entry:
+        return record_backup(instance_name, new_path, status='discovered')
+    entry.filename = os.path.basename(new_path)
+    return _commit()
+
+
+def list_entries(instance_name):
+    """Backups de la instancia, del más nuevo al más viejo (índice instancia + mtime)"""
+    return (BackupCatalogEntry.query
+            .filter_by(instance_name=instance_name)
+            .order_by(BackupCatalogEntry.mtime.desc())
+            .all())
+
+
+def instance_totals(instance_name=None):
+    """{instancia: (cantidad, bytes)} en una sola consulta agrupada"""
+    query = db.session.query(BackupCatalogEntry.instance_name,
+                             func.count(BackupCatalogEntry.id),
+                             func.coalesce(func.sum(BackupCatalogEntry.size_bytes), 0))
+    if instance_name:
+        query = query.filter(BackupCatalogEntry.instance_name == instance_name)
+    rows = query.group_by(BackupCatalogEntry.instance_name).all()
+    return {name: (count, int(size)) for name, count, size in rows}
+
+
+def reconcile(instances_dir):
+    """
+    Ajusta el catálogo a lo que hay en disco: agrega los archivos copiados por
+    fuera, actualiza los que cambiaron (su contenido ya no es el registrado),
+    borra los que ya no existen y los manifiestos que quedaron sin archivo.
+    Los archivos nuevos o cambiados toman el manifiesto de su sidecar si
+    todavía corresponde.
+    """
+    on_disk = {}
+    sidecars = []
+    if os.path.isdir(instances_dir):
+        for instance_name in os.listdir(instances_dir):
+            instance_dir = os.path.join(instances_dir, instance_name)
+            if not os.path.isdir(instance_dir):
+                continue
+            with os.scandir(instance_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(MANIFEST_SUFFIX):
+                        sidecars.append(entry.path)
+                    elif is_backup_file(entry.name) and entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        on_disk[(instance_name, entry.name)] = (st.st_size, _file_mtime(st))
+
+    for sidecar in sidecars:
+        archive_path = sidecar[:-len(MANIFEST_SUFFIX)]
+        if not os.path.exists(archive_path):
+            remove_manifest(archive_path)
+
+    stats = {'added': 0, 'updated': 0, 'removed': 0, 'total': len(on_disk)}
+    for entry in BackupCatalogEntry.query.all():
+        current = on_disk.pop((entry.instance_name, entry.filename), None)
+        if current is None:
+            db.session.delete(entry)
+            stats['removed'] += 1
+        elif (entry.size_bytes, entry.mtime) != current:
+            entry.size_bytes, entry.mtime = current
+            _apply_manifest(entry, read_manifest(os.path.join(instances_dir, entry.instance_name, entry.filename)))
+            entry.status = 'discovered'
+            stats['updated'] += 1
+
+    for (instance_name, filename), (size, mtime) in on_disk.items():
+        entry = BackupCatalogEntry(instance_name=instance_name, filename=filename,
+                                   size_bytes=size, mtime=mtime, status='discovered')
+        _apply_manifest(entry, read_manifest(os.path.join(instances_dir, instance_name, filename)))
+        db.session.add(entry)
+        stats['added'] += 1
+
+    db.session.commit()
+    return stats
@@ -1,17 +1,37 @@
 import os
+import sys
 import json
 import subprocess
 from datetime import datetime
-import glob
 import logging
 import re
+import shutil
+import time
 
 from config import Config
+from services.instance_descriptor import list_descriptors
+from services.backup_pipeline import (
+    BackupPipelineError, DatabaseDump, StreamingArchive, compressor_command, scan_tree, transcode_zip, FILESTORE_MEMBER
+)
+from services.backup_snapshots import (
+    BlobStore, SNAPSHOTS_DIR, SNAPSHOT_NAME_RE, count_references, create_snapshot, export_snapshot,
+    list_snapshot_dirs, read_summary, remove_partial_snapshots
+)
+from services.backup_pitr import PitrManager, MAX_DB_NAME_LENGTH, is_restored_db_name, restored_db_name
+from services.job_manager import submit_job, job_summary
+from services import backup_catalog
+from services.backup_manifest import (
+    ManifestBuilder, HashingReader, scan_tar_stream, read_manifest, write_manifest,
+    rename_manifest, remove_manifest
+)
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# full: un .tar.gz completo por backup; incremental: snapshot con el filestore deduplicado
+BACKUP_MODES = ('full', 'incremental')
+
 class BackupManagerV2:
     """
     Sistema de backups multi-instancia
@@ -23,6 +43,8 @@ class BackupManagerV2:
         self.scripts_path = scripts_path or Config.SCRIPTS_PATH
         self.instances_dir = os.path.join(self.backup_dir, 'instances')
         self.global_config_file = os.path.join(self.backup_dir, 'backup_config.json')
+        self.blob_store = BlobStore(Config.BACKUP_BLOBSTORE_PATH)
+        self.pitr = PitrManager()
         self._ensure_directories()
         self._load_global_config()
     
@@ -121,6 +143,7 @@ class BackupManagerV2:
                 'schedule': '0 3 * * *',  # 3 AM diario
                 'retention_days': 7,
                 'priority': 'medium',
+                'backup_mode': 'full',
                 'last_backup': None,
                 'last_backup_status': None,
                 'last_backup_size': 0,
@@ -145,16 +168,12 @@ class BackupManagerV2:
             json.dump(config, f, indent=2)
     
     def _get_all_production_instances(self):
-        """Obtiene todas las instancias de producción del sistema usando el mismo método que instance_manager"""
+        """Obtiene todas las instancias de producción del sistema (descriptores compartidos con instance_manager)"""
         prod_instances = []
         
-        # Importar instance_manager para usar su método de listado
         try:
-            from services.instance_manager import InstanceManager
-            manager = InstanceManager()
-            instances = manager.list_production_instances()
-            
-            # Extraer solo los nombres de las instancias
+            # Sin consultar systemd: sólo hacen falta los nombres
+            instances = list_descriptors('production', require_conf=True)
             prod_instances = [inst['name'] for inst in instances]
             logger.info(f"Found {len(prod_instances)} production instances: {prod_instances}")
         except Exception as e:
@@ -183,19 +202,15 @@ class BackupManagerV2:
         if os.path.exists(self.instances_dir):
             configured_instances = set(os.listdir(self.instances_dir))
         
+        # Cantidad y tamaño de backups de todas las instancias en una consulta al catálogo
+        totals = backup_catalog.instance_totals()
+        
         # Procesar todas las instancias de producción
         for instance_name in all_prod_instances:
             # Cargar o crear configuración (esto crea la carpeta si no existe)
             config = self._load_instance_config(instance_name)
             instance_dir = self._get_instance_dir(instance_name)
-            
-            # Contar backups
-            pattern = os.path.join(instance_dir, '*.tar.gz')
-            backup_files = glob.glob(pattern)
-            backup_count = len(backup_files)
-            
-            # Calcular tamaño total
-            total_size = sum(os.path.getsize(f) for f in backup_files if os.path.exists(f))
+            backup_count, total_size = totals.get(instance_name, (0, 0))
             
             instances.append({
                 'name': instance_name,
@@ -203,9 +218,11 @@ class BackupManagerV2:
                 'schedule': config.get('schedule', '0 3 * * *'),
                 'retention_days': config.get('retention_days', 7),
                 'priority': config.get('priority', 'medium'),
+                'backup_mode': config.get('backup_mode', 'full'),
                 'last_backup': config.get('last_backup'),
                 'last_backup_status': config.get('last_backup_status'),
                 'backup_count': backup_count,
+                'snapshot_count': len(list_snapshot_dirs(instance_dir)),
                 'total_size_bytes': total_size,
                 'total_size_mb': round(total_size / (1024 * 1024), 2),
                 'total_size_human': self._human_readable_size(total_size),
@@ -225,10 +242,7 @@ class BackupManagerV2:
         config = self._load_instance_config(instance_name)
         
         # Agregar estadísticas actuales
-        pattern = os.path.join(self._get_instance_dir(instance_name), '*.tar.gz')
-        backup_files = glob.glob(pattern)
-        backup_count = len(backup_files)
-        total_size = sum(os.path.getsize(f) for f in backup_files if os.path.exists(f))
+        backup_count, total_size = backup_catalog.instance_totals(instance_name).get(instance_name, (0, 0))
         
         config['backup_count'] = backup_count
         config['total_size'] = total_size
@@ -242,7 +256,9 @@ class BackupManagerV2:
         config = self._load_instance_config(instance_name)
         
         # Actualizar campos permitidos
-        allowed_fields = ['auto_backup_enabled', 'schedule', 'retention_days', 'priority']
+        allowed_fields = ['auto_backup_enabled', 'schedule', 'retention_days', 'priority', 'backup_mode']
+        if kwargs.get('backup_mode') is not None and kwargs['backup_mode'] not in BACKUP_MODES:
+            return {'success': False, 'error': 'Modo de backup inválido'}
         for field in allowed_fields:
             if field in kwargs and kwargs[field] is not None:
                 config[field] = kwargs[field]
@@ -264,7 +280,8 @@ class BackupManagerV2:
     
     def create_backup(self, instance_name, custom_filename=None):
         """Crea un backup manual de una instancia"""
-        script_path = os.path.join(self.scripts_path, 'odoo/backup-instance.sh')
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        script_path = os.path.join(backend_dir, 'backup_instance.py')
         
         if not os.path.exists(script_path):
             return {'success': False, 'error': 'Script de backup no encontrado'}
@@ -279,75 +296,430 @@ class BackupManagerV2:
         try:
             safe_custom = self._normalize_backup_filename(custom_filename) if custom_filename else None
 
-            # Ejecutar script en background
+            # Encolar en el job manager (uno a la vez por instancia)
             log_file = f'/tmp/odoo-backup-{instance_name}-latest.log'
+            command = [sys.executable, script_path, instance_name]
             if safe_custom:
-                cmd = f"/bin/bash {script_path} {instance_name} {safe_custom} > {log_file} 2>&1 &"
-            else:
-                cmd = f"/bin/bash {script_path} {instance_name} > {log_file} 2>&1 &"
-            subprocess.Popen(
-                cmd,
-                shell=True,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                start_new_session=True
+                command.append(safe_custom)
+            job, created = submit_job(
+                'create_backup',
+                command,
+                instance_name=instance_name,
+                log_file=log_file,
+                cwd=backend_dir,
+                priority_class=config.get('priority')
             )
+            if not created:
+                return {'success': False, 'error': f'Ya hay un backup de {instance_name} en curso (job #{job.id})', **job_summary(job)}
             
             return {
                 'success': True,
-                'message': f'Backup de {instance_name} iniciado',
-                'log_file': log_file
+                'message': f'Backup de {instance_name} encolado (job #{job.id})',
+                'log_file': log_file,
+                **job_summary(job)
             }
         except Exception as e:
             logger.error(f"Error creating backup for {instance_name}: {e}")
             return {'success': False, 'error': str(e)}
     
+    def run_backup(self, instance_name, custom_filename=None):
+        """
+        Ejecuta el backup (cuerpo del job 'create_backup', ver backup_instance.py).
+        pg_dump corre mientras el filestore se empaqueta en streaming hacia pigz,
+        leyendo los archivos en su lugar; al final se agrega dump.sql. Genera el
+        mismo formato que Odoo: dump.sql + filestore/ en un .tar.gz.
+        """
+        instance_dir = self._get_instance_dir(instance_name)
+        os.makedirs(instance_dir, exist_ok=True)
+        config = self._load_instance_config(instance_name)
+
+        # Modo incremental: snapshot deduplicado (un nombre personalizado pide un .tar.gz completo)
+        if config.get('backup_mode') == 'incremental' and not custom_filename:
+            return self._run_snapshot(instance_name, config)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"backup_{timestamp}.tar.gz"
+        if custom_filename:
+            filename = self._normalize_backup_filename(custom_filename)
+            if not filename or not filename.endswith('.tar.gz'):
+                return {'success': False, 'error': 'Nombre de archivo inválido'}
+        backup_path = os.path.join(instance_dir, filename)
+
+        db_name = instance_name
+        filestore_path = os.path.join(Config.ODOO_FILESTORE_PATH, db_name)
+        spool_dir = os.path.join(instance_dir, f'.spool-{timestamp}')
+        os.makedirs(spool_dir, exist_ok=True)
+
+        dump = DatabaseDump(db_name, spool_dir, jobs=Config.BACKUP_PG_DUMP_JOBS)
+        archive = None
+        started = time.monotonic()
+
+        print(f"💾 Iniciando backup de {instance_name}...", flush=True)
+        print(f"   Base de datos: {db_name}", flush=True)
+        print(f"   Timestamp: {timestamp}", flush=True)
+        try:
+            mode = f"directorio, {dump.jobs} procesos" if dump.jobs else "SQL plano"
+            print(f"🗄️  Creando dump de base de datos ({mode})...", flush=True)
+            dump.start()
+
+            compressor = compressor_command(Config.BACKUP_COMPRESS_THREADS, Config.BACKUP_COMPRESS_LEVEL)
+            archive = StreamingArchive(backup_path, compressor)
+            print(f"📦 Comprimiendo en streaming con {compressor[0]}...", flush=True)
+
+            if os.path.isdir(filestore_path):
+                file_count, fs_bytes = scan_tree(filestore_path)
+                print(f"📁 Filestore: {self._human_readable_size(fs_bytes)} ({file_count} archivos)", flush=True)
+                reported = [0]
+
+                def progress(done):
+                    # Filestore: 0-70% del avance; el dump completa el resto
+                    percent = int(done * 70 / fs_bytes) if fs_bytes else 70
+                    if percent >= reported[0] + 2:
+                        reported[0] = percent
+                        print(f"##PROGRESS {percent} Filestore", flush=True)
+
+                archive.add_tree(filestore_path, FILESTORE_MEMBER, progress=progress)
+            else:
+                print(f"⚠️  No se encontró filestore en {filestore_path}", flush=True)
+                archive.add_directory(FILESTORE_MEMBER)
+                file_count = 0
+            print("✅ Filestore empaquetado", flush=True)
+
+            print("##PROGRESS 70 Esperando pg_dump", flush=True)
+            dump.wait()
+            print("##PROGRESS 80 Agregando dump.sql", flush=True)
+            db_size = dump.write_to(archive, time.time())
+            print(f"✅ Base de datos: {self._human_readable_size(db_size)}", flush=True)
+
+            manifest = archive.close()
+        except Exception as e:  # Cualquier falla: matar los procesos, borrar el parcial y marcar el error
+            dump.abort()
+            if archive:
+                archive.abort()
+            print(f"❌ Error en el backup: {e}", flush=True)
+            config['last_backup_status'] = 'error'
+            self._save_instance_config(instance_name, config)
+            return {'success': False, 'error': str(e)}
+        finally:
+            dump.cleanup()
+
+        total_size = os.path.getsize(backup_path)
+        backup_catalog.record_backup(instance_name, backup_path, manifest=manifest)
+        elapsed = time.monotonic() - started
+        print(f"✅ Backup completado: {filename} ({self._human_readable_size(total_size)}) en {elapsed:.0f}s", flush=True)
+
+        retention_days = config.get('retention_days', 7)
+        print(f"🧹 Limpiando backups antiguos (retención: {retention_days} días)...", flush=True)
+        self._apply_retention(instance_name, retention_days)
+
+        entries = backup_catalog.list_entries(instance_name)
+        config['last_backup'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        config['last_backup_status'] = 'success'
+        config['last_backup_size'] = total_size
+        config['backup_count'] = len(entries)
+        config['total_size'] = sum(entry.size_bytes for entry in entries)
+        self._save_instance_config(instance_name, config)
+        print(f"✅ Backups restantes: {len(entries)}", flush=True)
+
+        with open(os.path.join(instance_dir, 'backup.log'), 'a') as log:
+            log.write(f"{config['last_backup']} - Backup: {filename} - Size: {self._human_readable_size(total_size)}"
+                      f" - Files: {file_count} - Status: OK\n")
+
+        print(f"\n✅ Backup de {instance_name} completado exitosamente", flush=True)
+        return {'success': True, 'filename': filename, 'size': total_size}
+
+    def _apply_retention(self, instance_name, retention_days):
+        """Elimina los .tar.gz con más de `retention_days` días (como `find -mtime +N`)"""
+        instance_dir = self._get_instance_dir(instance_name)
+        now = time.time()
+        removed = []
+        for entry in backup_catalog.list_entries(instance_name):
+            if not entry.filename.endswith('.tar.gz'):
+                continue
+            if int((now - entry.mtime.timestamp()) // 86400) <= retention_days:
+                continue
+            backup_path = os.path.join(instance_dir, entry.filename)
+            try:
+                os.remove(backup_path)
+            except FileNotFoundError:
+                pass  # Borrado por fuera: sólo falta sacarlo del catálogo
+            except OSError as e:
+                logger.error(f"Error applying retention to {entry.filename}: {e}")
+                continue
+            remove_manifest(backup_path)
+            removed.append(entry.filename)
+        backup_catalog.forget_backups(instance_name, removed)
+        return removed
+
+    def _run_snapshot(self, instance_name, config):
+        """Backup incremental: sólo los archivos nuevos del filestore van al blob store"""
+        instance_dir = self._get_instance_dir(instance_name)
+        filestore_path = os.path.join(Config.ODOO_FILESTORE_PATH, instance_name)
+        compressor = compressor_command(Config.BACKUP_COMPRESS_THREADS, Config.BACKUP_COMPRESS_LEVEL)
+        started = time.monotonic()
+
+        print(f"💾 Iniciando backup incremental de {instance_name}...", flush=True)
+        if not os.path.isdir(filestore_path):
+            print(f"⚠️  No se encontró filestore en {filestore_path}", flush=True)
+        reported = [0]
+
+        def progress(summary):
+            if summary['file_count'] - reported[0] >= 1000:
+                reported[0] = summary['file_count']
+                print(f"##PROGRESS 0 Filestore: {summary['file_count']} archivos, {summary['new_files']} nuevos",
+                      flush=True)
+
+        try:
+            summary = create_snapshot(self.blob_store, instance_dir, instance_name, filestore_path, compressor,
+                                      progress=progress)
+        except Exception as e:  # Como en run_backup: cualquier falla queda registrada en la config
+            print(f"❌ Error en el backup: {e}", flush=True)
+            config['last_backup_status'] = 'error'
+            self._save_instance_config(instance_name, config)
+            return {'success': False, 'error': str(e)}
+
+        elapsed = time.monotonic() - started
+        print(f"✅ Filestore: {summary['file_count']} archivos ({self._human_readable_size(summary['filestore_size'])}), "
+              f"{summary['new_files']} nuevos ({self._human_readable_size(summary['new_bytes'])})", flush=True)
+        print(f"✅ Base de datos: {self._human_readable_size(summary['dump_size'])} "
+              f"({self._human_readable_size(summary['dump_compressed_size'])} comprimido)", flush=True)
+        print(f"✅ Snapshot completado: {summary['name']} en {elapsed:.0f}s", flush=True)
+
+        retention_days = config.get('retention_days', 7)
+        print(f"🧹 Limpiando snapshots antiguos (retención: {retention_days} días)...", flush=True)
+        removed = self._apply_snapshot_retention(instance_name, retention_days)
+        if removed:
+            gc = self.collect_blobs()
+            if gc:
+                print(f"🧹 Blob store: {gc['removed']} archivos sin referencias eliminados "
+                      f"({self._human_readable_size(gc['freed_bytes'])})", flush=True)
+
+        config['last_backup'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        config['last_backup_status'] = 'success'
+        config['last_backup_size'] = summary['new_bytes'] + summary['dump_compressed_size']
+        self._save_instance_config(instance_name, config)
+
+        with open(os.path.join(instance_dir, 'backup.log'), 'a') as log:
+            log.write(f"{config['last_backup']} - Snapshot: {summary['name']} - New: "
+                      f"{self._human_readable_size(summary['new_bytes'])} - Files: {summary['file_count']} - Status: OK\n")
+
+        print(f"\n✅ Backup de {instance_name} completado exitosamente", flush=True)
+        return {'success': True, 'snapshot': summary['name'], 'size': config['last_backup_size']}
+
+    def _apply_snapshot_retention(self, instance_name, retention_days):
+        """Elimina los snapshots con más de `retention_days` días; el más reciente se conserva siempre"""
+        removed = []
+        cutoff = time.time() - retention_days * 86400
+        for snapshot_dir in list_snapshot_dirs(self._get_instance_dir(instance_name))[1:]:
+            name = os.path.basename(snapshot_dir)
+            created = datetime.strptime(name, 'snapshot_%Y%m%d_%H%M%S').timestamp()
+            if created < cutoff:
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+                removed.append(name)
+        return removed
+
+    def collect_blobs(self):
+        """
+        Borra del blob store los archivos que ya no referencia ningún snapshot.
+        Las referencias se cuentan desde los manifiestos vigentes, así que un
+        backup interrumpido no deja contadores desfasados. Si hay un snapshot
+        en curso no hace nada (lo hará el próximo backup) y devuelve None.
+        """
+        with self.blob_store.lock(exclusive=True, blocking=False) as acquired:
+            if not acquired:
+                logger.info("Blob store en uso, se omite la recolección")
+                return None
+            remove_partial_snapshots(self.instances_dir)
+            return self.blob_store.collect(count_references(self.instances_dir))
+
+    def _get_snapshot_dir(self, instance_name, name):
+        if not name or not SNAPSHOT_NAME_RE.fullmatch(name):
+            return None
+        path = os.path.join(self._get_instance_dir(instance_name), SNAPSHOTS_DIR, name)
+        return path if os.path.isdir(path) else None
+
+    def list_snapshots(self, instance_name):
+        """Snapshots incrementales de una instancia"""
+        snapshots = []
+        for snapshot_dir in list_snapshot_dirs(self._get_instance_dir(instance_name)):
+            try:
+                summary = read_summary(snapshot_dir)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading snapshot {snapshot_dir}: {e}")
+                continue
+            stored = summary.get('new_bytes', 0) + summary.get('dump_compressed_size', 0)
+            snapshots.append({
+                **summary,
+                'date': summary.get('created_at'),
+                'filestore_size_human': self._human_readable_size(summary.get('filestore_size', 0)),
+                'dump_size_human': self._human_readable_size(summary.get('dump_size', 0)),
+                'stored_size_bytes': stored,
+                'stored_size_human': self._human_readable_size(stored),
+            })
+        return snapshots
+
+    def delete_snapshot(self, instance_name, name):
+        """Elimina un snapshot; sus blobs los libera un job de recolección (no se recorre el store en la petición)"""
+        snapshot_dir = self._get_snapshot_dir(instance_name, name)
+        if not snapshot_dir:
+            return {'success': False, 'error': 'Snapshot no encontrado'}
+        try:
+            shutil.rmtree(snapshot_dir)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+        gc = self.queue_collect_blobs()
+        if not gc['success']:
+            logger.warning(f"No se pudo encolar la recolección de blobs: {gc['error']}")
+        return {'success': True, 'message': f'Snapshot {name} eliminado'}
+
+    def queue_collect_blobs(self):
+        """Encola la recolección del blob store (si ya hay una pendiente, alcanza con esa)"""
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            job, created = submit_job(
+                'collect_blobs',
+                [sys.executable, os.path.join(backend_dir, 'backup_instance.py'), '--collect-blobs'],
+                resource='blob-store',
+                cwd=backend_dir
+            )
+            if not created:
+                return {'success': True, 'message': f'Recolección ya encolada (job #{job.id})', **job_summary(job)}
+            return {'success': True, 'message': f'Recolección encolada (job #{job.id})', **job_summary(job)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def run_collect_blobs(self):
+        """Cuerpo del job 'collect_blobs'"""
+        try:
+            gc = self.collect_blobs()
+        except Exception as e:
+            print(f"❌ Error en la recolección del blob store: {e}", flush=True)
+            return {'success': False, 'error': str(e)}
+        if gc is None:
+            # Hay un snapshot en curso: los blobs quedan para la próxima recolección
+            print("⚠️  Blob store en uso, se omite la recolección", flush=True)
+            return {'success': True, 'removed': 0, 'freed_bytes': 0}
+        print(f"🧹 Blob store: {gc['removed']} archivos sin referencias eliminados "
+              f"({self._human_readable_size(gc['freed_bytes'])})", flush=True)
+        return {'success': True, **gc}
+
+    def export_snapshot(self, instance_name, name):
+        """Encola la exportación de un snapshot a un .tar.gz compatible con Odoo"""
+        if not self._get_snapshot_dir(instance_name, name):
+            return {'success': False, 'error': 'Snapshot no encontrado'}
+
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        log_file = f'/tmp/odoo-backup-{instance_name}-latest.log'
+        try:
+            job, created = submit_job(
+                'export_snapshot',
+                [sys.executable, os.path.join(backend_dir, 'backup_instance.py'), '--export', instance_name, name],
+                instance_name=instance_name,
+                log_file=log_file,
+                cwd=backend_dir
+            )
+            if not created:
+                return {'success': False, 'error': f'Ya hay una exportación de {instance_name} en curso (job #{job.id})', **job_summary(job)}
+            return {
+                'success': True,
+                'message': f'Exportación de {name} encolada (job #{job.id})',
+                'filename': f'{name}.tar.gz',
+                'log_file': log_file,
+                **job_summary(job)
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def run_export_snapshot(self, instance_name, name):
+        """Cuerpo del job 'export_snapshot': arma <snapshot>.tar.gz en el directorio de la instancia"""
+        snapshot_dir = self._get_snapshot_dir(instance_name, name)
+        if not snapshot_dir:
+            print(f"❌ Snapshot no encontrado: {name}", flush=True)
+            return {'success': False, 'error': 'Snapshot no encontrado'}
+
+        filename = f'{name}.tar.gz'
+        archive_path = os.path.join(self._get_instance_dir(instance_name), filename)
+        compressor = compressor_command(Config.BACKUP_COMPRESS_THREADS, Config.BACKUP_COMPRESS_LEVEL)
+        reported = [0]
+
+        def progress(done, total):
+            percent = int(done * 90 / total) if total else 90
+            if percent >= reported[0] + 2:
+                reported[0] = percent
+                print(f"##PROGRESS {percent} Filestore", flush=True)
+
+        print(f"📦 Exportando {name} de {instance_name}...", flush=True)
+        try:
+            # Lock compartido: la recolección no puede borrar blobs mientras se leen
+            with self.blob_store.lock():
+                export_snapshot(self.blob_store, snapshot_dir, archive_path, compressor, progress=progress)
+        except (BackupPipelineError, OSError, ValueError) as e:
+            print(f"❌ Error al exportar: {e}", flush=True)
+            return {'success': False, 'error': str(e)}
+
+        size = os.path.getsize(archive_path)
+        backup_catalog.record_backup(instance_name, archive_path)  # Manifiesto: el sidecar que dejó el export
+        print(f"✅ Exportado: {filename} ({self._human_readable_size(size)})", flush=True)
+        return {'success': True, 'filename': filename, 'size': size}
+
+    def reconcile_catalog(self):
+        """Encola la reconciliación del catálogo de backups con el disco"""
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            job, created = submit_job(
+                'reconcile_backups',
+                [sys.executable, os.path.join(backend_dir, 'backup_instance.py'), '--reconcile'],
+                resource='backup-catalog',
+                cwd=backend_dir
+            )
+            if not created:
+                return {'success': False, 'error': f'Ya hay una reconciliación en curso (job #{job.id})', **job_summary(job)}
+            return {'success': True, 'message': f'Reconciliación encolada (job #{job.id})', **job_summary(job)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def run_reconcile_catalog(self):
+        """Cuerpo del job 'reconcile_backups': corrige los cambios hechos en disco por fuera del panel"""
+        try:
+            stats = backup_catalog.reconcile(self.instances_dir)
+        except Exception as e:
+            print(f"❌ Error al reconciliar el catálogo: {e}", flush=True)
+            return {'success': False, 'error': str(e)}
+        print(f"✅ Catálogo: {stats['total']} backups, {stats['added']} agregados, "
+              f"{stats['updated']} actualizados, {stats['removed']} eliminados", flush=True)
+        return {'success': True, **stats}
+
     def list_backups(self, instance_name):
         """Lista todos los backups de una instancia"""
         instance_dir = self._get_instance_dir(instance_name)
         backups = []
 
-        patterns = [os.path.join(instance_dir, '*.tar.gz'), os.path.join(instance_dir, '*.zip')]
-        backup_files = []
-        for pattern in patterns:
-            backup_files.extend(glob.glob(pattern))
-        backup_files.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0, reverse=True)
+        # Una consulta al catálogo (ya ordenada por fecha); el disco no se recorre
+        for entry in backup_catalog.list_entries(instance_name):
+            basename = entry.filename
 
-        for backup_file in backup_files:
-            try:
-                basename = os.path.basename(backup_file)
-
-                # Extraer timestamp si aplica al formato default: backup_YYYYMMDD_HHMMSS.tar.gz
-                timestamp = 'unknown'
-                base_no_ext = basename
-                if base_no_ext.endswith('.tar.gz'):
-                    base_no_ext = base_no_ext[:-len('.tar.gz')]
-                elif base_no_ext.endswith('.zip'):
-                    base_no_ext = base_no_ext[:-len('.zip')]
-
-                parts = base_no_ext.split('_')
-                if len(parts) >= 3 and parts[0] == 'backup' and parts[1].isdigit() and parts[2].isdigit():
-                    date_str = parts[1]
-                    time_str = parts[2]
-                    timestamp = f"{date_str}_{time_str}"
-                
-                # Información del archivo
-                stat = os.stat(backup_file)
-                size_bytes = stat.st_size
-                
-                backups.append({
-                    'filename': basename,
-                    'path': backup_file,
-                    'timestamp': timestamp,
-                    'date': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                    'size_bytes': size_bytes,
-                    'size_mb': round(size_bytes / (1024 * 1024), 2),
-                    'size_human': self._human_readable_size(size_bytes)
-                })
-            except Exception as e:
-                logger.error(f"Error reading backup {backup_file}: {e}")
-                continue
+            # Extraer timestamp si aplica al formato default: backup_YYYYMMDD_HHMMSS.tar.gz
+            timestamp = 'unknown'
+            base_no_ext = basename
+            if base_no_ext.endswith('.tar.gz'):
+                base_no_ext = base_no_ext[:-len('.tar.gz')]
+            elif base_no_ext.endswith('.zip'):
+                base_no_ext = base_no_ext[:-len('.zip')]
+
+            parts = base_no_ext.split('_')
+            if len(parts) >= 3 and parts[0] == 'backup' and parts[1].isdigit() and parts[2].isdigit():
+                date_str = parts[1]
+                time_str = parts[2]
+                timestamp = f"{date_str}_{time_str}"
+            
+            backups.append({
+                **entry.to_dict(),
+                'path': os.path.join(instance_dir, basename),
+                'timestamp': timestamp,
+                'date': entry.mtime.strftime('%Y-%m-%d %H:%M:%S'),
+                'size_mb': round(entry.size_bytes / (1024 * 1024), 2),
+                'size_human': self._human_readable_size(entry.size_bytes)
+            })
         
         # Calcular estadísticas
         total_size = sum(b['size_bytes'] for b in backups)
@@ -359,7 +731,10 @@ class BackupManagerV2:
             'count': len(backups),
             'total_size_bytes': total_size,
             'total_size_human': self._human_readable_size(total_size),
-            'retention_days': config.get('retention_days', 7)
+            'retention_days': config.get('retention_days', 7),
+            'backup_mode': config.get('backup_mode', 'full'),
+            'snapshots': self.list_snapshots(instance_name),
+            'pitr': self._pitr_listing(instance_name)
         }
     
     def delete_backup(self, instance_name, filename):
@@ -375,6 +750,8 @@ class BackupManagerV2:
         
         try:
             os.remove(backup_path)
+            remove_manifest(backup_path)
+            backup_catalog.forget_backups(instance_name, [filename])
             return {'success': True, 'message': f'Backup {filename} eliminado'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -414,61 +791,68 @@ class BackupManagerV2:
 
             # Si es ZIP (Odoo.sh), convertir a TAR.GZ (formato esperado por restore-instance.sh)
             if filename.endswith('.zip'):
-                import tarfile
-                import zipfile
-                import tempfile
-                import shutil
-
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                temp_extract_dir = os.path.join(tempfile.gettempdir(), f"odoo-zip-restore-{instance_name}-{timestamp}")
-                os.makedirs(temp_extract_dir, exist_ok=True)
-
+                converted_name = f"restore_from_zip_{timestamp}.tar.gz"
+                restore_path = os.path.join(instance_dir, converted_name)
+                compressor = compressor_command(Config.BACKUP_COMPRESS_THREADS, Config.BACKUP_COMPRESS_LEVEL)
                 try:
-                    with zipfile.ZipFile(backup_path, 'r') as zip_ref:
-                        zip_ref.extractall(temp_extract_dir)
-
-                    # Validar estructura básica
-                    has_dump = False
-                    for root, _dirs, files in os.walk(temp_extract_dir):
-                        if 'dump.sql' in files:
-                            has_dump = True
-                            break
-                    if not has_dump:
-                        shutil.rmtree(temp_extract_dir)
-                        return {'success': False, 'error': 'El backup .zip no contiene dump.sql'}
-
-                    converted_name = f"restore_from_zip_{timestamp}.tar.gz"
-                    restore_path = os.path.join(instance_dir, converted_name)
-
-                    with tarfile.open(restore_path, 'w:gz') as tar:
-                        for item in os.listdir(temp_extract_dir):
-                            tar.add(os.path.join(temp_extract_dir, item), arcname=item)
+                    # Conversión en streaming (sin extraer); valida dump.sql con el directorio central
+                    manifest = transcode_zip(backup_path, restore_path, compressor)
+                except BackupPipelineError as e:
+                    return {'success': False, 'error': str(e)}
+                backup_catalog.record_backup(instance_name, restore_path, manifest=manifest)
 
-                finally:
-                    if os.path.exists(temp_extract_dir):
-                        shutil.rmtree(temp_extract_dir)
+            # Con manifiesto se valida la estructura y el espacio sin leer el archivo
+            manifest = read_manifest(restore_path)
+            if manifest:
+                if manifest.get('dump_member') != 'dump.sql':
+                    return {'success': False, 'error': 'El backup no contiene dump.sql en la raíz'}
+                space_error = self._check_restore_space(manifest)
+                if space_error:
+                    return {'success': False, 'error': space_error}
 
-            # Ejecutar script de restauración en background
+            # Encolar la restauración en el job manager
             log_file = f'/tmp/odoo-restore-{instance_name}-latest.log'
-            cmd = f"/bin/bash {script_path} {instance_name} {restore_path} > {log_file} 2>&1 &"
-            subprocess.Popen(
-                cmd,
-                shell=True,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                start_new_session=True
+            job, created = submit_job(
+                'restore_backup',
+                ['/bin/bash', script_path, instance_name, restore_path],
+                instance_name=instance_name,
+                log_file=log_file
             )
+            if not created:
+                return {'success': False, 'error': f'Ya hay una restauración de {instance_name} en curso (job #{job.id})', **job_summary(job)}
             
             return {
                 'success': True,
-                'message': f'Restauración de {instance_name} iniciada',
+                'message': f'Restauración de {instance_name} encolada (job #{job.id})',
                 'log_file': log_file,
-                'backup_file': filename
+                'backup_file': filename,
+                **job_summary(job)
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def _check_restore_space(self, manifest):
+        """
+        restore-instance.sh extrae el archivo completo en /tmp y copia el
+        filestore a ODOO_FILESTORE_PATH (el actual se mueve, no ocupa más).
+        Devuelve un mensaje de error si algún disco no alcanza.
+        """
+        needed = {}
+        for path, size in (('/tmp', manifest.get('uncompressed_size') or 0),
+                           (Config.ODOO_FILESTORE_PATH, manifest.get('filestore_size') or 0)):
+            try:
+                device = os.stat(path).st_dev
+            except OSError:
+                continue
+            needed.setdefault(device, [path, 0])[1] += size
+        for path, size in needed.values():
+            free = shutil.disk_usage(path).free
+            if size > free:
+                return (f'Espacio insuficiente en {path}: la restauración necesita '
+                        f'{self._human_readable_size(size)} y hay {self._human_readable_size(free)} libres')
+        return None
+
     def rename_backup(self, instance_name, old_filename, new_filename):
         """Renombra un backup dentro del directorio de la instancia"""
         if not self._is_safe_backup_filename(old_filename):
@@ -491,6 +875,8 @@ class BackupManagerV2:
 
         try:
             os.rename(old_path, new_path)
+            rename_manifest(old_path, new_path)
+            backup_catalog.rename_backup(instance_name, old_filename, new_path)
             return {
                 'success': True,
                 'message': 'Backup renombrado',
@@ -514,6 +900,189 @@ class BackupManagerV2:
         except Exception as e:
             return {'log': f'Error al leer log: {str(e)}', 'exists': False}
     
+    # ------------------------------------------------------------------
+    # PITR: backups base + archivo de WAL del cluster (común a todas las instancias)
+    # ------------------------------------------------------------------
+
+    def _get_pitr_config(self):
+        return {
+            'enabled': False,
+            'base_schedule': '0 1 * * 0',  # Backup base semanal
+            'retention_days': 14,
+            **self.global_config.get('pitr', {})
+        }
+
+    def _pitr_listing(self, instance_name):
+        """Ventana de recuperación y bases restauradas de la instancia (None si PITR no está activo)"""
+        pitr_config = self._get_pitr_config()
+        if not pitr_config['enabled']:
+            return None
+        try:
+            status = self.pitr.status(instance_name)
+            return {
+                'archiving_enabled': status['archiving']['enabled'],
+                'restart_required': status['archiving']['restart_required'],
+                'last_archived_time': status['archiving']['last_archived_time'],
+                'failed_count': status['archiving']['failed_count'],
+                'base_backup_count': len(status['base_backups']),
+                'recovery_window': status['recovery_window'],
+                'restored_databases': status['restored_databases'],
+            }
+        except Exception as e:
+            logger.error(f"Error reading PITR status: {e}")
+            return {'error': str(e)}
+
+    def get_pitr_status(self):
+        """Estado completo de PITR (configuración, archivo de WAL, backups base)"""
+        try:
+            return {'success': True, 'config': self._get_pitr_config(), **self.pitr.status()}
+        except Exception as e:
+            return {'success': False, 'config': self._get_pitr_config(), 'error': str(e)}
+
+    def update_pitr_config(self, enabled=None, base_schedule=None, retention_days=None):
+        """Activa PITR (configura archive_command) y programa los backups base"""
+        pitr_config = self._get_pitr_config()
+        if base_schedule is not None:
+            pitr_config['base_schedule'] = base_schedule
+        if retention_days is not None:
+            pitr_config['retention_days'] = int(retention_days)
+        archiving = None
+        if enabled is not None:
+            pitr_config['enabled'] = bool(enabled)
+            if enabled:
+                try:
+                    archiving = self.pitr.enable_archiving()
+                except Exception as e:
+                    return {'success': False, 'error': f'No se pudo activar el archivo de WAL: {e}'}
+
+        self.global_config['pitr'] = pitr_config
+        self._save_global_config()
+        self._update_crontab()
+
+        result = {'success': True, 'config': pitr_config}
+        if archiving:
+            result['archiving'] = archiving
+            if archiving['restart_required']:
+                result['message'] = 'Archivo de WAL configurado: reiniciar PostgreSQL para aplicar archive_mode'
+        return result
+
+    def create_base_backup(self):
+        """Encola un backup base del cluster (pg_basebackup)"""
+        if not self._get_pitr_config()['enabled']:
+            return {'success': False, 'error': 'PITR no está activado'}
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        log_file = '/tmp/odoo-pitr-base-latest.log'
+        try:
+            job, created = submit_job(
+                'pitr_base',
+                [sys.executable, os.path.join(backend_dir, 'backup_instance.py'), '--pitr-base'],
+                resource='postgres-cluster',
+                log_file=log_file,
+                cwd=backend_dir
+            )
+            if not created:
+                return {'success': False, 'error': f'Ya hay un backup base en curso (job #{job.id})', **job_summary(job)}
+            return {'success': True, 'message': f'Backup base encolado (job #{job.id})', 'log_file': log_file,
+                    **job_summary(job)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def run_base_backup(self):
+        """Cuerpo del job 'pitr_base': backup base y retención de bases y WAL"""
+        compressor = compressor_command(Config.BACKUP_COMPRESS_THREADS, Config.BACKUP_COMPRESS_LEVEL)
+        print("💾 Iniciando backup base del cluster (pg_basebackup)...", flush=True)
+        try:
+            info = self.pitr.create_base_backup(compressor)
+        except Exception as e:
+            print(f"❌ Error en el backup base: {e}", flush=True)
+            return {'success': False, 'error': str(e)}
+        print(f"✅ Backup base: {info['name']} ({self._human_readable_size(info['size'])})", flush=True)
+
+        retention_days = self._get_pitr_config()['retention_days']
+        print(f"🧹 Limpiando backups base y WAL antiguos (retención: {retention_days} días)...", flush=True)
+        removed = self.pitr.apply_retention(retention_days)
+        if removed:
+            print(f"✅ Eliminados: {', '.join(removed)}", flush=True)
+        return {'success': True, **info}
+
+    def restore_point_in_time(self, instance_name, target_time):
+        """Encola la restauración de la base de una instancia a un momento dado (en una base nueva)"""
+        if not self._get_pitr_config()['enabled']:
+            return {'success': False, 'error': 'PITR no está activado'}
+        target = self._parse_target_time(target_time)
+        if not target:
+            return {'success': False, 'error': 'Fecha inválida (formato: YYYY-MM-DD HH:MM:SS)'}
+        if target > datetime.now():
+            return {'success': False, 'error': 'El momento pedido es futuro'}
+
+        database = restored_db_name(instance_name, target)
+        if len(database) > MAX_DB_NAME_LENGTH:
+            return {'success': False, 'error': f'El nombre de la instancia es demasiado largo para una base PITR ({database})'}
+
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        log_file = f'/tmp/odoo-pitr-restore-{instance_name}-latest.log'
+        try:
+            job, created = submit_job(
+                'pitr_restore',
+                [sys.executable, os.path.join(backend_dir, 'backup_instance.py'), '--pitr-restore', instance_name,
+                 target.strftime('%Y-%m-%d %H:%M:%S')],
+                instance_name=instance_name,
+                log_file=log_file,
+                cwd=backend_dir
+            )
+            if not created:
+                return {'success': False, 'error': f'Ya hay una restauración PITR de {instance_name} en curso (job #{job.id})', **job_summary(job)}
+            return {
+                'success': True,
+                'message': f'Restauración de {instance_name} al {target:%Y-%m-%d %H:%M:%S} encolada (job #{job.id})',
+                'database': database,
+                'log_file': log_file,
+                **job_summary(job)
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def _parse_target_time(self, value):
+        """Fecha local 'YYYY-MM-DD HH:MM[:SS]' (también con 'T', como la envía un input datetime-local)"""
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+            try:
+                return datetime.strptime((value or '').replace('T', ' '), fmt)
+            except ValueError:
+                continue
+        return None
+
+    def run_point_in_time_restore(self, instance_name, target_time):
+        """Cuerpo del job 'pitr_restore'"""
+        target = datetime.strptime(target_time, '%Y-%m-%d %H:%M:%S')
+        database = restored_db_name(instance_name, target)
+        print(f"⏪ Restaurando {instance_name} al {target_time} en la base {database}...", flush=True)
+        try:
+            result = self.pitr.restore_to_database(
+                instance_name, target, database, Config.ODOO_DB_OWNER,
+                port=Config.BACKUP_PITR_RESTORE_PORT,
+                timeout=Config.BACKUP_PITR_RESTORE_TIMEOUT_SECONDS,
+                log=lambda message: print(message, flush=True)
+            )
+        except Exception as e:
+            print(f"❌ Error en la restauración: {e}", flush=True)
+            return {'success': False, 'error': str(e)}
+        print(f"\n✅ Base {database} lista: se puede usar como origen de una instancia de desarrollo", flush=True)
+        return {'success': True, **result}
+
+    def pitr_database_exists(self, instance_name, name):
+        """`name` es una base restaurada de esta instancia (nombre exacto) y existe en el cluster"""
+        return is_restored_db_name(instance_name, name) and self.pitr.database_exists(name)
+
+    def drop_pitr_database(self, instance_name, name):
+        """Elimina una base restaurada a un momento dado de la instancia"""
+        try:
+            if not self.pitr_database_exists(instance_name, name):
+                return {'success': False, 'error': 'Base no encontrada'}
+            self.pitr.drop_restored_database(name)
+            return {'success': True, 'message': f'Base {name} eliminada'}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
     def get_global_stats(self):
         """Obtiene estadísticas globales de todos los backups"""
         instances_data = self.list_instances_with_backups()
@@ -537,7 +1106,9 @@ class BackupManagerV2:
     def _update_crontab(self):
         """Actualiza el crontab con todas las instancias habilitadas"""
         cron_comment = "# Odoo Backups - Managed by API-DEV"
-        script_path = os.path.join(self.scripts_path, 'odoo/backup-instance.sh')
+        script_path = os.path.join(self.scripts_path, 'odoo/backup-instance.sh')  # Entradas viejas (ejecución directa)
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        queue_script = os.path.join(backend_dir, 'queue_backup.py')
         cron_log = os.path.join(self.backup_dir, 'cron.log')
         
         # Leer crontab actual
@@ -555,9 +1126,9 @@ class BackupManagerV2:
             if cron_comment in line:
                 skip_next = True
                 continue
-            if skip_next and script_path in line:
-                skip_next = False
+            if skip_next and (script_path in line or queue_script in line):
                 continue
+            skip_next = False
             if line.strip():
                 lines.append(line)
         
@@ -565,12 +1136,17 @@ class BackupManagerV2:
         instances_data = self.list_instances_with_backups()
         enabled_instances = [i for i in instances_data['instances'] if i['auto_backup_enabled']]
         
-        if enabled_instances:
-            lines.append(cron_comment)
-            for instance in enabled_instances:
-                schedule = instance['schedule']
-                instance_name = instance['name']
-                lines.append(f"{schedule} {script_path} {instance_name} >> {cron_log} 2>&1")
+        # Cron sólo encola: el job manager coordina estos backups con los manuales, clones y restores
+        pitr_config = self._get_pitr_config()
+        lines.append(cron_comment)
+        # Reconciliación del catálogo (archivos copiados o borrados a mano en el directorio de backups)
+        lines.append(f"{Config.BACKUP_CATALOG_RECONCILE_SCHEDULE} cd {backend_dir} && {sys.executable} {queue_script} --reconcile >> {cron_log} 2>&1")
+        for instance in enabled_instances:
+            schedule = instance['schedule']
+            instance_name = instance['name']
+            lines.append(f"{schedule} cd {backend_dir} && {sys.executable} {queue_script} {instance_name} >> {cron_log} 2>&1")
+        if pitr_config['enabled']:
+            lines.append(f"{pitr_config['base_schedule']} cd {backend_dir} && {sys.executable} {queue_script} --pitr-base >> {cron_log} 2>&1")
         
         # Escribir nuevo crontab
         new_cron = '\n'.join(lines) + '\n'
@@ -591,10 +1167,7 @@ class BackupManagerV2:
     
     def upload_backup(self, instance_name, file):
         """Sube un archivo de backup para una instancia específica"""
-        import tarfile
-        import zipfile
         import tempfile
-        import shutil
         import sys
         
         try:
@@ -621,16 +1194,21 @@ class BackupManagerV2:
             logger.info(f"💾 Guardando en: {temp_path}")
             sys.stdout.flush()
             
-            # Guardar el archivo directamente (stream-safe)
+            # Guardar el archivo directamente (stream-safe). Un TAR.GZ se recorre en la
+            # misma pasada: el manifiesto (miembros, tamaños, checksum) sale sin volver a leerlo
             logger.info("📥 Guardando archivo por chunks (stream-safe)...")
             sys.stdout.flush()
+            contents = ManifestBuilder()
+            scan_error = None
             with open(temp_path, "wb") as f:
-                chunk_size = 8192
-                while True:
-                    chunk = file.stream.read(chunk_size)
-                    if not chunk:
-                        break
-                    f.write(chunk)
+                reader = HashingReader(file.stream, target=f)
+                if is_zip:
+                    reader.drain()
+                else:
+                    try:
+                        scan_tar_stream(reader, contents)
+                    except Exception as e:
+                        scan_error = e
             logger.info("✅ Archivo guardado completamente (stream-safe)")
             sys.stdout.flush()
             
@@ -642,90 +1220,53 @@ class BackupManagerV2:
             
             # Si es ZIP, convertir a TAR.GZ
             if is_zip:
-                logger.info("📂 Iniciando conversión de ZIP a TAR.GZ...")
-                
-                # Crear directorio temporal para extraer
-                extract_dir = os.path.join(tempfile.gettempdir(), f"extract_{timestamp}")
-                os.makedirs(extract_dir, exist_ok=True)
-                logger.info(f"📁 Directorio de extracción: {extract_dir}")
+                logger.info("📂 Iniciando conversión de ZIP a TAR.GZ (streaming, sin extraer)...")
+                final_filename = f"backup_{timestamp}.tar.gz"
+                final_filepath = os.path.join(instance_dir, final_filename)
+                compressor = compressor_command(Config.BACKUP_COMPRESS_THREADS, Config.BACKUP_COMPRESS_LEVEL)
                 
                 try:
-                    # Extraer ZIP
-                    logger.info("🔓 Extrayendo archivo ZIP...")
-                    with zipfile.ZipFile(temp_path, 'r') as zip_ref:
-                        zip_ref.extractall(extract_dir)
-                    logger.info("✅ Extracción completada")
+                    manifest = transcode_zip(temp_path, final_filepath, compressor)
                     
-                    # Validar estructura
-                    logger.info("🔍 Validando estructura del backup...")
-                    has_dump = False
-                    has_filestore = False
-                    
-                    for root, dirs, files in os.walk(extract_dir):
-                        if 'dump.sql' in files:
-                            has_dump = True
-                            logger.info(f"✅ dump.sql encontrado en: {root}")
-                        if 'filestore' in dirs:
-                            has_filestore = True
-                            logger.info(f"✅ filestore encontrado en: {root}")
-                    
-                    if not has_dump:
-                        logger.error("❌ El backup no contiene dump.sql")
-                        shutil.rmtree(extract_dir)
-                        os.remove(temp_path)
-                        return {'success': False, 'error': 'El backup no contiene dump.sql'}
-                    
-                    if not has_filestore:
+                    if not manifest['has_filestore']:
                         logger.warning("⚠️ El backup no contiene filestore")
                     
-                    # Crear TAR.GZ desde el contenido extraído
-                    logger.info("📦 Creando archivo TAR.GZ...")
-                    final_filename = f"backup_{timestamp}.tar.gz"
-                    final_filepath = os.path.join(instance_dir, final_filename)
-                    
-                    with tarfile.open(final_filepath, 'w:gz') as tar:
-                        for item in os.listdir(extract_dir):
-                            logger.info(f"➕ Agregando: {item}")
-                            tar.add(os.path.join(extract_dir, item), arcname=item)
-                    
-                    logger.info(f"✅ TAR.GZ creado: {final_filepath}")
-                    
-                    # Limpiar temporales
-                    logger.info("🧹 Limpiando archivos temporales...")
-                    shutil.rmtree(extract_dir)
-                    os.remove(temp_path)
+                    logger.info(f"✅ TAR.GZ creado: {final_filepath} ({manifest['member_count']} miembros)")
                     
+                except BackupPipelineError as e:
+                    logger.error(f"❌ {str(e)}")
+                    return {'success': False, 'error': str(e)}
                 except Exception as e:
                     logger.error(f"❌ Error en conversión ZIP: {str(e)}")
-                    if os.path.exists(extract_dir):
-                        shutil.rmtree(extract_dir)
+                    return {'success': False, 'error': f'Error al procesar ZIP: {str(e)}'}
+                finally:
+                    # Limpiar temporales
                     if os.path.exists(temp_path):
                         os.remove(temp_path)
-                    return {'success': False, 'error': f'Error al procesar ZIP: {str(e)}'}
             
             else:
-                # Es TAR.GZ, validar estructura
+                # Es TAR.GZ, validar estructura con lo leído al guardarlo
                 logger.info("🔍 Validando estructura del TAR.GZ...")
                 try:
-                    with tarfile.open(temp_path, 'r:gz') as tar:
-                        members = tar.getnames()
-                        has_dump = any('dump.sql' in m for m in members)
-                        has_filestore = any('filestore' in m for m in members)
-                        
-                        if not has_dump:
-                            logger.error("❌ El backup no contiene dump.sql")
-                            os.remove(temp_path)
-                            return {'success': False, 'error': 'El backup no contiene dump.sql'}
-                        
-                        if not has_filestore:
-                            logger.warning("⚠️ El backup no contiene filestore")
-                        
-                        logger.info("✅ Estructura válida")
+                    if scan_error:
+                        raise scan_error
+                    manifest = contents.build(temp_path, reader.hexdigest())
+                    
+                    if not manifest['has_dump']:
+                        logger.error("❌ El backup no contiene dump.sql")
+                        os.remove(temp_path)
+                        return {'success': False, 'error': 'El backup no contiene dump.sql'}
+                    
+                    if not manifest['has_filestore']:
+                        logger.warning("⚠️ El backup no contiene filestore")
+                    
+                    logger.info(f"✅ Estructura válida ({manifest['member_count']} miembros)")
                     
                     # Mover a directorio final
                     final_filename = f"backup_{timestamp}.tar.gz"
                     final_filepath = os.path.join(instance_dir, final_filename)
                     shutil.move(temp_path, final_filepath)
+                    write_manifest(final_filepath, manifest)
                     logger.info(f"✅ Archivo movido a: {final_filepath}")
                     
                 except Exception as e:
@@ -734,6 +1275,8 @@ class BackupManagerV2:
                         os.remove(temp_path)
                     return {'success': False, 'error': f'Error al validar TAR.GZ: {str(e)}'}
             
+            backup_catalog.record_backup(instance_name, final_filepath, status='uploaded')
+            
             # Actualizar configuración de la instancia
             final_size = os.path.getsize(final_filepath)
             config = self.get_instance_config(instance_name)
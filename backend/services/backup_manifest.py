@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import tarfile
+from datetime import datetime
+
+# Sidecar `<archivo>.manifest.json` junto a cada backup: contenido, tamaños y
+# checksum calculados al crearlo o subirlo, para no volver a leer el archivo
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+READ_BUFFER_BYTES = 1024 * 1024
+
+
+def manifest_path(archive_path):
+    return archive_path + MANIFEST_SUFFIX
+
+
+class ManifestBuilder:
+    """Acumula los miembros de un archivo a medida que se escriben o se leen"""
+
+    def __init__(self):
+        self.members = []
+        self.dump_member = None
+        self.dump_size = None
+        self.has_filestore = False
+        self.filestore_files = 0
+        self.filestore_size = 0
+        self.uncompressed_size = 0
+
+    def add(self, name, size=0, is_dir=False):
+        if name.startswith('./'):
+            name = name[2:]
+        name = name.rstrip('/')
+        parts = name.split('/')
+        if 'filestore' in parts:
+            self.has_filestore = True
+        if is_dir:
+            self.members.append([name + '/', 0])
+            return
+        self.members.append([name, size])
+        self.uncompressed_size += size
+        if parts[-1] == 'dump.sql':
+            if self.dump_member is None or name.count('/') < self.dump_member.count('/'):
+                self.dump_member = name  # El más cercano a la raíz
+                self.dump_size = size
+        elif 'filestore' in parts[:-1]:
+            self.filestore_files += 1
+            self.filestore_size += size
+
+    def build(self, archive_path, sha256, archive_format='tar.gz'):
+        return {
+            'version': MANIFEST_VERSION,
+            'format': archive_format,
+            'size': os.path.getsize(archive_path),
+            'sha256': sha256,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'has_dump': self.dump_member is not None,
+            'dump_member': self.dump_member,
+            'dump_size': self.dump_size,
+            'has_filestore': self.has_filestore,
+            'filestore_files': self.filestore_files,
+            'filestore_size': self.filestore_size,
+            'uncompressed_size': self.uncompressed_size,
+            'member_count': len(self.members),
+            'members': self.members,
+        }
+
+
+class HashingReader:
+    """Lector que calcula el SHA-256 de lo que pasa y opcionalmente lo copia a `target`"""
+
+    def __init__(self, source, target=None):
+        self.source = source
+        self.target = target
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        if data:
+            self.sha256.update(data)
+            self.bytes_read += len(data)
+            if self.target:
+                self.target.write(data)
+        return data
+
+    def drain(self):
+        while self.read(READ_BUFFER_BYTES):
+            pass
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def scan_tar_stream(reader, builder):
+    """Recorre un .tar.gz en modo stream (sin seek) y lee el resto del archivo para el checksum"""
+    with tarfile.open(fileobj=reader, mode='r|gz') as tar:
+        for member in tar:
+            builder.add(member.name, member.size if member.isreg() else 0, is_dir=member.isdir())
+    reader.drain()
+
+
+def summary(manifest):
+    """El manifiesto sin la lista de miembros (lo que guarda el catálogo y muestra la UI)"""
+    return {key: value for key, value in manifest.items() if key != 'members'}
+
+
+def write_manifest(archive_path, manifest):
+    path = manifest_path(archive_path)
+    tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.partial')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(archive_path):
+    """Sidecar del archivo, o None si no tiene o ya no corresponde (el tamaño cambió)"""
+    try:
+        with open(manifest_path(archive_path), 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('size') != os.path.getsize(archive_path):
+            return None
+        return manifest
+    except (OSError, ValueError):
+        return None
+
+
+def rename_manifest(old_archive_path, new_archive_path):
+    try:
+        os.rename(manifest_path(old_archive_path), manifest_path(new_archive_path))
+    except FileNotFoundError:
+        pass
+
+
+def remove_manifest(archive_path):
+    try:
+        os.remove(manifest_path(archive_path))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,385 @@
+import hashlib
+import os
+import shutil
+import stat
+import subprocess
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
+
+from services.backup_manifest import ManifestBuilder, write_manifest
+
+# Archivo compatible con Odoo: dump.sql (SQL plano) + filestore/ en un .tar.gz
+DUMP_MEMBER = 'dump.sql'
+FILESTORE_MEMBER = 'filestore'
+COPY_BUFFER_BYTES = 1024 * 1024
+
+
+class BackupPipelineError(Exception):
+    pass
+
+
+def compressor_command(threads=0, level=6):
+    """pigz (gzip multihilo) si está instalado, si no gzip en un proceso aparte"""
+    if shutil.which('pigz'):
+        command = ['pigz', f'-{level}']
+        if threads:
+            command += ['-p', str(threads)]
+        return command
+    return ['gzip', f'-{level}']
+
+
+def scan_tree(root):
+    """(archivos, bytes) de un árbol sin seguir symlinks"""
+    files = 0
+    total = 0
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files += 1
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return files, total
+
+
+def _stderr_tail(path, limit=2000):
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(os.fstat(f.fileno()).st_size - limit, 0))
+            return f.read().decode(errors='replace').strip()
+    except OSError:
+        return ''
+
+
+class StreamingArchive:
+    """
+    Escribe un tar en streaming directo al stdin del compresor. La salida
+    comprimida pasa por un hilo que calcula su SHA-256 mientras la escribe en
+    `<destino>.partial`. Los archivos se leen de su ubicación original (sin
+    copia previa); al cerrar el parcial se renombra al destino y se escribe
+    el manifiesto con lo que se fue agregando.
+    """
+
+    def __init__(self, path, compressor):
+        self.path = path
+        self.partial_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.partial')
+        self.contents = ManifestBuilder()
+        self._sha256 = hashlib.sha256()
+        self._output = open(self.partial_path, 'wb')
+        self._output_error = None
+        self._process = subprocess.Popen(compressor, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE)
+        self._pump = threading.Thread(target=self._write_output, daemon=True)
+        self._pump.start()
+        self._tar = tarfile.open(fileobj=self._process.stdin, mode='w|', format=tarfile.GNU_FORMAT,
+                                 copybufsize=COPY_BUFFER_BYTES)
+        self.bytes_in = 0
+
+    def _write_output(self):
+        try:
+            while True:
+                chunk = self._process.stdout.read(COPY_BUFFER_BYTES)
+                if not chunk:
+                    break
+                self._sha256.update(chunk)
+                self._output.write(chunk)
+        except Exception as e:
+            # Sin nadie leyendo su salida el compresor se bloquearía (y el tar con él)
+            self._output_error = e
+            self._process.kill()
+
+    def _check_output(self):
+        if self._output_error is not None:
+            raise BackupPipelineError(f'Error escribiendo {self.partial_path}: {self._output_error}')
+
+    @contextmanager
+    def _writing(self):
+        """Si falló la salida el compresor ya no existe: se informa esa causa y no el pipe roto"""
+        self._check_output()
+        try:
+            yield
+        except BrokenPipeError:
+            self._check_output()
+            raise
+
+    def add_directory(self, arcname, source=None):
+        info = tarfile.TarInfo(arcname)
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        if source:
+            st = os.stat(source)
+            info.mode = stat.S_IMODE(st.st_mode)
+            info.mtime = st.st_mtime
+        with self._writing():
+            self._tar.addfile(info)
+        self.contents.add(arcname, is_dir=True)
+
+    def add_file(self, path, arcname, mtime=None):
+        info = self._tar.gettarinfo(path, arcname)
+        if mtime is not None:
+            info.mtime = mtime
+        if info.isreg():
+            with open(path, 'rb') as f, self._writing():
+                self._tar.addfile(info, f)
+            self.bytes_in += info.size
+            self.contents.add(arcname, info.size)
+        else:
+            with self._writing():
+                self._tar.addfile(info)
+            self.contents.add(arcname, is_dir=info.isdir())
+
+    def add_stream(self, arcname, size, stream, mtime):
+        """Miembro de tamaño conocido leído de un pipe; falla si el stream no mide exactamente `size`"""
+        info = tarfile.TarInfo(arcname)
+        info.size = size
+        info.mode = 0o644
+        info.mtime = mtime
+        try:
+            with self._writing():
+                self._tar.addfile(info, stream)  # OSError si el stream termina antes
+        except (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError) as e:  # Origen corrupto (p. ej. CRC del ZIP)
+            raise BackupPipelineError(f'{arcname}: {e}') from e
+        if stream.read(1):
+            raise BackupPipelineError(f'{arcname}: el contenido es más largo que lo previsto ({size} bytes)')
+        self.bytes_in += size
+        self.contents.add(arcname, size)
+
+    def add_tree(self, root, arcname, progress=None):
+        """Agrega un árbol recorriéndolo en profundidad; `progress(bytes)` cada archivo"""
+        self.add_directory(arcname, root)
+        stack = [(root, arcname)]
+        while stack:
+            directory, prefix = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    name = f'{prefix}/{entry.name}'
+                    if entry.is_dir(follow_symlinks=False):
+                        self.add_directory(name, entry.path)
+                        stack.append((entry.path, name))
+                    else:
+                        self.add_file(entry.path, name)
+                        if progress:
+                            progress(self.bytes_in)
+
+    def close(self):
+        """Cierra el archivo y escribe su manifiesto; devuelve el manifiesto"""
+        with self._writing():
+            self._tar.close()
+            self._process.stdin.close()
+        stderr = self._process.stderr.read().decode(errors='replace').strip()
+        returncode = self._process.wait()
+        self._pump.join()
+        try:
+            self._output.close()
+        except OSError as e:  # p. ej. disco lleno al volcar el buffer
+            self._output_error = self._output_error or e
+        if self._output_error is not None or returncode != 0:
+            self.abort()
+            self._check_output()
+            raise BackupPipelineError(f'El compresor terminó con código {returncode}: {stderr}')
+        os.replace(self.partial_path, self.path)
+        manifest = self.contents.build(self.path, self._sha256.hexdigest())
+        write_manifest(self.path, manifest)
+        return manifest
+
+    def abort(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        try:
+            self._tar.close()  # Queda marcado como cerrado aunque el pipe ya no exista
+        except (OSError, ValueError):
+            pass
+        self._pump.join()
+        if not self._output.closed:
+            try:
+                self._output.close()
+            except OSError:
+                pass
+        try:
+            os.remove(self.partial_path)
+        except OSError:
+            pass
+
+
+def transcode_zip(zip_path, archive_path, compressor, progress=None):
+    """
+    Convierte un .zip (p. ej. de Odoo.sh) a .tar.gz sin extraerlo: cada
+    miembro se descomprime y pasa directo al tar, con memoria acotada. La
+    estructura se valida antes con el directorio central del ZIP. Devuelve
+    el manifiesto del .tar.gz; `progress(bytes, total)` cada miembro.
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        members = zf.infolist()
+        for info in members:
+            if info.filename.startswith('/') or '..' in info.filename.split('/'):
+                raise BackupPipelineError(f'Ruta inválida en el ZIP: {info.filename}')
+        if not any(not info.is_dir() and info.filename.split('/')[-1] == DUMP_MEMBER for info in members):
+            raise BackupPipelineError(f'El backup no contiene {DUMP_MEMBER}')
+
+        total = sum(info.file_size for info in members)
+        archive = StreamingArchive(archive_path, compressor)
+        try:
+            for info in members:
+                if info.is_dir():
+                    archive.add_directory(info.filename.rstrip('/'))
+                    continue
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                with zf.open(info) as stream:
+                    archive.add_stream(info.filename, info.file_size, stream, mtime)
+                if progress:
+                    progress(archive.bytes_in, total)
+            return archive.close()
+        except Exception:
+            archive.abort()
+            raise
+
+
+def dump_compressed(db_name, path, compressor, sudo_user='postgres'):
+    """`pg_dump | compresor > path` contando los bytes del SQL; devuelve el tamaño sin comprimir"""
+    prefix = ['sudo', '-u', sudo_user] if sudo_user else []
+    stderr_path = f'{path}.err'
+    with open(path, 'wb') as output, open(stderr_path, 'wb') as stderr:
+        dump = subprocess.Popen(prefix + ['pg_dump', db_name], stdout=subprocess.PIPE, stderr=stderr)
+        compress = subprocess.Popen(compressor, stdin=subprocess.PIPE, stdout=output)
+        size = 0
+        broken_pipe = False  # El compresor terminó antes de tiempo: su código de salida dice por qué
+        try:
+            while True:
+                chunk = dump.stdout.read(COPY_BUFFER_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                compress.stdin.write(chunk)
+        except BrokenPipeError:
+            broken_pipe = True
+        finally:
+            try:
+                compress.stdin.close()
+            except BrokenPipeError:
+                broken_pipe = True
+            dump.stdout.close()  # Si pg_dump sigue escribiendo recibe EPIPE y termina
+            dump_code = dump.wait()
+            compress_code = compress.wait()
+    try:
+        # Sin compresor pg_dump muere por el pipe: el error a informar es el del compresor
+        if broken_pipe or compress_code != 0:
+            raise BackupPipelineError(f'El compresor terminó con código {compress_code} '
+                                      f'(pg_dump: {dump_code}): {_stderr_tail(stderr_path)}')
+        if dump_code != 0:
+            raise BackupPipelineError(f'pg_dump terminó con código {dump_code}: {_stderr_tail(stderr_path)}')
+    finally:
+        os.remove(stderr_path)
+    return size
+
+
+class DatabaseDump:
+    """
+    pg_dump en paralelo con la compresión del filestore. El tar necesita el
+    tamaño de dump.sql antes de su contenido, así que el dump se escribe una
+    vez en `spool_dir`:
+    - jobs <= 1: SQL plano (`pg_dump > dump.sql`), como el script original.
+    - jobs > 1: formato directorio (`pg_dump -Fd -j N`, sin comprimir). El SQL
+      plano que espera Odoo sale de `pg_restore -f -`, que se recorre una vez
+      para medirlo y otra para volcarlo al tar.
+    """
+
+    def __init__(self, db_name, spool_dir, jobs=0, sudo_user='postgres'):
+        self.db_name = db_name
+        self.spool_dir = spool_dir
+        self.jobs = jobs if jobs and jobs > 1 else 0
+        self.prefix = ['sudo', '-u', sudo_user] if sudo_user else []
+        self.sql_path = os.path.join(spool_dir, DUMP_MEMBER)
+        self.directory_path = os.path.join(spool_dir, 'dump')
+        self.stderr_path = os.path.join(spool_dir, 'pg_dump.err')
+        self.restore_stderr_path = os.path.join(spool_dir, 'pg_restore.err')
+        self._process = None
+        self._output = None
+
+    def start(self):
+        stderr = open(self.stderr_path, 'wb')
+        try:
+            if self.jobs:
+                os.chmod(self.spool_dir, 0o1777)  # pg_dump corre como postgres y crea el directorio
+                command = self.prefix + ['pg_dump', '-Fd', '-j', str(self.jobs), '-Z', '0',
+                                         '-f', self.directory_path, self.db_name]
+                self._process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr)
+            else:
+                self._output = open(self.sql_path, 'wb')
+                self._process = subprocess.Popen(self.prefix + ['pg_dump', self.db_name],
+                                                 stdout=self._output, stderr=stderr)
+        finally:
+            stderr.close()
+
+    def wait(self):
+        returncode = self._process.wait()
+        if self._output:
+            self._output.close()
+        if returncode != 0:
+            raise BackupPipelineError(f'pg_dump terminó con código {returncode}: {_stderr_tail(self.stderr_path)}')
+
+    def _restore_to_stdout(self):
+        with open(self.restore_stderr_path, 'wb') as stderr:
+            return subprocess.Popen(self.prefix + ['pg_restore', '-f', '-', self.directory_path],
+                                    stdout=subprocess.PIPE, stderr=stderr)
+
+    def _finish_restore(self, process):
+        process.stdout.close()
+        if process.wait() != 0:
+            raise BackupPipelineError(
+                f'pg_restore terminó con código {process.returncode}: {_stderr_tail(self.restore_stderr_path)}'
+            )
+
+    def sql_size(self):
+        if not self.jobs:
+            return os.path.getsize(self.sql_path)
+
+        process = self._restore_to_stdout()
+        size = 0
+        while True:
+            chunk = process.stdout.read(COPY_BUFFER_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+        self._finish_restore(process)
+        return size
+
+    def write_to(self, archive, mtime):
+        """Agrega dump.sql al archivo; devuelve su tamaño"""
+        if not self.jobs:
+            archive.add_file(self.sql_path, DUMP_MEMBER)
+            return os.path.getsize(self.sql_path)
+
+        size = self.sql_size()
+        process = self._restore_to_stdout()
+        try:
+            archive.add_stream(DUMP_MEMBER, size, process.stdout, mtime)
+        except Exception:
+            process.kill()
+            process.wait()
+            raise
+        self._finish_restore(process)
+        return size
+
+    def abort(self):
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if self._output and not self._output.closed:
+            self._output.close()
+
+    def cleanup(self):
+        if self.jobs and os.path.exists(self.directory_path):
+            # Los archivos del formato directorio son de postgres
+            subprocess.run(self.prefix + ['rm', '-rf', self.directory_path],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
@@ -0,0 +1,393 @@
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import time
+from datetime import datetime
+
+from config import Config
+from services.backup_pipeline import BackupPipelineError
+
+logger = logging.getLogger(__name__)
+
+# Recuperación a un punto en el tiempo (PITR) del cluster de PostgreSQL:
+# backups base con pg_basebackup más el archivo continuo de WAL. El cluster
+# es uno solo para todas las instancias, así que la ventana es común.
+BASE_NAME_RE = re.compile(r'base_\d{8}_\d{6}')
+BASE_ARCHIVE = 'base.tar.gz'
+BASE_INFO = 'info.json'
+RESTORED_DB_PREFIX = 'pitr-'
+FIELD_SEPARATOR = '\x1f'
+MAX_DB_NAME_LENGTH = 63  # NAMEDATALEN - 1: PostgreSQL trunca los nombres más largos
+
+
+def restored_db_name(instance_name, target_time):
+    return f'{RESTORED_DB_PREFIX}{instance_name}-{target_time:%Y%m%d%H%M%S}'
+
+
+def is_restored_db_name(instance_name, name):
+    """`name` es una restauración de `instance_name` (no de otra instancia cuyo nombre empiece igual)"""
+    return (bool(name) and len(name) <= MAX_DB_NAME_LENGTH
+            and re.fullmatch(rf'{RESTORED_DB_PREFIX}{re.escape(instance_name)}-\d{{14}}', name) is not None)
+
+
+class PitrManager:
+    """
+    Backups base (pg_basebackup como tar a stdout, comprimido con el mismo
+    compresor que los backups), configuración de `archive_command` y
+    restauración de una base a un momento dado. La restauración levanta una
+    copia temporal del cluster en otro puerto, la recupera hasta el momento
+    pedido y copia la base con pg_dump a una base nueva `pitr-<instancia>-<fecha>`
+    del cluster principal, que después puede usarse como origen de una
+    instancia de desarrollo.
+    """
+
+    def __init__(self, base_dir=None, wal_dir=None, restore_dir=None, sudo_user='postgres'):
+        self.base_dir = base_dir or Config.BACKUP_PITR_PATH
+        self.wal_dir = wal_dir or Config.BACKUP_WAL_ARCHIVE_PATH
+        self.restore_dir = restore_dir or Config.BACKUP_PITR_RESTORE_DIR
+        self.prefix = ['sudo', '-u', sudo_user] if sudo_user else []
+        self._bin_dir = None
+
+    # ------------------------------------------------------------------
+    # PostgreSQL
+    # ------------------------------------------------------------------
+
+    def _psql(self, sql, database='postgres', port=None, host=None, variables=None):
+        """
+        Filas de una consulta (psql sin formato, campos separados por \\x1f).
+        Los valores de `variables` van en el SQL como :'nombre' (literal) o
+        :"nombre" (identificador) y los escapa psql.
+        """
+        command = self.prefix + ['psql', '-X', '-q', '-t', '-A', '-v', 'ON_ERROR_STOP=1',
+                                 '-F', FIELD_SEPARATOR, '-d', database]
+        for key, value in (variables or {}).items():
+            command += ['-v', f'{key}={value}']
+        if port:
+            command += ['-p', str(port)]
+        if host:
+            command += ['-h', host]
+        if variables:
+            # psql no interpola variables en -c: la consulta va por stdin
+            result = subprocess.run(command + ['-f', '-'], input=sql, capture_output=True, text=True, timeout=60)
+        else:
+            result = subprocess.run(command + ['-c', sql], capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise BackupPipelineError(result.stderr.strip() or f'psql terminó con código {result.returncode}')
+        return [line.split(FIELD_SEPARATOR) for line in result.stdout.splitlines() if line]
+
+    def _bin(self, program):
+        """Binarios del servidor (pg_ctl, pg_archivecleanup) de la versión del cluster"""
+        if self._bin_dir is None:
+            self._bin_dir = Config.PG_BIN_DIR
+            if not self._bin_dir:
+                try:
+                    version = int(self._psql("SHOW server_version_num")[0][0]) // 10000
+                    candidate = f'/usr/lib/postgresql/{version}/bin'  # Debian/Ubuntu
+                    self._bin_dir = candidate if os.path.isdir(candidate) else ''
+                except (BackupPipelineError, IndexError, ValueError, OSError, subprocess.TimeoutExpired):
+                    self._bin_dir = ''
+        return os.path.join(self._bin_dir, program) if self._bin_dir else program
+
+    def _sudo_write(self, path, content):
+        """Escribe un archivo del usuario de postgres"""
+        subprocess.run(self.prefix + ['tee', path], input=content.encode(), stdout=subprocess.DEVNULL, check=True)
+
+    def _archive_command(self):
+        return f'test ! -f {self.wal_dir}/%f && cp %p {self.wal_dir}/%f'
+
+    # ------------------------------------------------------------------
+    # Estado y configuración
+    # ------------------------------------------------------------------
+
+    def archiving_status(self):
+        """Configuración de archivo de WAL y estadísticas de pg_stat_archiver"""
+        settings = {
+            name: {'value': value, 'pending_restart': pending == 't'}
+            for name, value, pending in self._psql(
+                "SELECT name, setting, pending_restart FROM pg_settings "
+                "WHERE name IN ('archive_mode', 'archive_command', 'wal_level')"
+            )
+        }
+        archiver = self._psql(
+            "SELECT archived_count, last_archived_wal, last_archived_time, failed_count, "
+            "last_failed_wal, last_failed_time FROM pg_stat_archiver"
+        )[0]
+        archive_mode = settings.get('archive_mode', {})
+        archive_command = settings.get('archive_command', {})
+        return {
+            'enabled': archive_mode.get('value') == 'on' and archive_command.get('value') == self._archive_command(),
+            'archive_mode': archive_mode.get('value'),
+            'wal_level': settings.get('wal_level', {}).get('value'),
+            'restart_required': any(setting['pending_restart'] for setting in settings.values()),
+            'archived_count': int(archiver[0] or 0),
+            'last_archived_wal': archiver[1] or None,
+            'last_archived_time': archiver[2] or None,
+            'failed_count': int(archiver[3] or 0),
+            'last_failed_wal': archiver[4] or None,
+            'last_failed_time': archiver[5] or None,
+            'wal_dir': self.wal_dir,
+        }
+
+    def enable_archiving(self):
+        """
+        Activa el archivo de WAL en `wal_dir` (ALTER SYSTEM). `archive_mode`
+        sólo cambia al reiniciar PostgreSQL: no se reinicia desde acá.
+        """
+        subprocess.run(self.prefix + ['mkdir', '-p', '-m', '700', self.wal_dir], check=True)
+        self._psql("ALTER SYSTEM SET wal_level = 'replica'")
+        self._psql("ALTER SYSTEM SET archive_mode = 'on'")
+        self._psql(f"ALTER SYSTEM SET archive_command = '{self._archive_command()}'")
+        self._psql("SELECT pg_reload_conf()")
+        time.sleep(1)  # pending_restart se actualiza después del reload
+        return self.archiving_status()
+
+    def list_base_backups(self):
+        """Backups base, del más nuevo al más viejo"""
+        bases_dir = os.path.join(self.base_dir, 'base')
+        if not os.path.isdir(bases_dir):
+            return []
+        bases = []
+        for name in sorted(os.listdir(bases_dir), reverse=True):
+            if not BASE_NAME_RE.fullmatch(name):
+                continue
+            try:
+                with open(os.path.join(bases_dir, name, BASE_INFO), 'r') as f:
+                    bases.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Incompleto o en curso
+        return bases
+
+    def database_exists(self, name, port=None, host=None):
+        return bool(self._psql("SELECT 1 FROM pg_database WHERE datname = :'name'", port=port, host=host,
+                               variables={'name': name}))
+
+    def list_restored_databases(self, instance_name=None):
+        """Bases restauradas a un momento dado en el cluster principal"""
+        rows = self._psql(
+            "SELECT datname, shobj_description(oid, 'pg_database') FROM pg_database "
+            f"WHERE datname LIKE '{RESTORED_DB_PREFIX}%' ORDER BY datname DESC"
+        )
+        databases = []
+        for name, comment in rows:
+            info = {}
+            try:
+                info = json.loads(comment) if comment else {}
+            except ValueError:
+                pass
+            if instance_name and info.get('instance') != instance_name:
+                continue
+            databases.append({'name': name, **info})
+        return databases
+
+    def status(self, instance_name=None):
+        """Estado para el listado de backups: archivo de WAL, backups base y ventana de recuperación"""
+        archiving = self.archiving_status()
+        bases = self.list_base_backups()
+        window = None
+        if bases and archiving['enabled']:
+            window = {
+                'from': bases[-1]['finished_at'],
+                'to': archiving['last_archived_time'] or bases[0]['finished_at'],
+            }
+        return {
+            'archiving': archiving,
+            'base_backups': bases,
+            'recovery_window': window,
+            'restored_databases': self.list_restored_databases(instance_name),
+        }
+
+    # ------------------------------------------------------------------
+    # Backup base
+    # ------------------------------------------------------------------
+
+    def create_base_backup(self, compressor):
+        """pg_basebackup en formato tar (con los WAL necesarios) hacia el compresor, sin copia intermedia"""
+        name = datetime.now().strftime('base_%Y%m%d_%H%M%S')
+        target_dir = os.path.join(self.base_dir, 'base', name)
+        os.makedirs(target_dir)
+        archive_path = os.path.join(target_dir, BASE_ARCHIVE)
+        started_at = datetime.now()
+
+        try:
+            with open(archive_path, 'wb') as output, open(os.path.join(target_dir, 'pg_basebackup.err'), 'wb') as err:
+                basebackup = subprocess.Popen(
+                    self.prefix + ['pg_basebackup', '-D', '-', '-F', 't', '-X', 'fetch', '-c', 'fast', '-l', name],
+                    stdout=subprocess.PIPE, stderr=err
+                )
+                compress = subprocess.Popen(compressor, stdin=basebackup.stdout, stdout=output)
+                basebackup.stdout.close()
+                compress_code = compress.wait()
+                basebackup_code = basebackup.wait()
+            if basebackup_code != 0:
+                with open(os.path.join(target_dir, 'pg_basebackup.err'), 'r', errors='replace') as f:
+                    raise BackupPipelineError(f'pg_basebackup terminó con código {basebackup_code}: {f.read().strip()}')
+            if compress_code != 0:
+                raise BackupPipelineError(f'El compresor terminó con código {compress_code}')
+
+            label = self._read_backup_label(archive_path)
+            info = {
+                'name': name,
+                'started_at': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'start_wal': label.get('start_wal'),
+                'size': os.path.getsize(archive_path),
+            }
+            with open(os.path.join(target_dir, BASE_INFO), 'w') as f:
+                json.dump(info, f, indent=2)
+            os.remove(os.path.join(target_dir, 'pg_basebackup.err'))
+            return info
+        except Exception:
+            shutil.rmtree(target_dir, ignore_errors=True)
+            raise
+
+    def _read_backup_label(self, archive_path):
+        """backup_label es el primer miembro del tar de pg_basebackup: no hace falta leer el resto"""
+        with tarfile.open(archive_path, 'r|gz') as tar:
+            for member in tar:
+                if member.name in ('backup_label', './backup_label'):
+                    content = tar.extractfile(member).read().decode(errors='replace')
+                    match = re.search(r'START WAL LOCATION: \S+ \(file (\w+)\)', content)
+                    return {'start_wal': match.group(1) if match else None}
+                break
+        return {}
+
+    def apply_retention(self, retention_days):
+        """
+        Borra los backups base vencidos (siempre queda el más reciente) y los
+        WAL anteriores al backup base más viejo que queda.
+        """
+        bases = self.list_base_backups()
+        cutoff = time.time() - retention_days * 86400
+        removed = []
+        kept = bases[:1]
+        for base in bases[1:]:
+            finished = datetime.strptime(base['finished_at'], '%Y-%m-%d %H:%M:%S').timestamp()
+            if finished < cutoff:
+                shutil.rmtree(os.path.join(self.base_dir, 'base', base['name']), ignore_errors=True)
+                removed.append(base['name'])
+            else:
+                kept.append(base)
+        oldest = kept[-1] if kept else None
+        if oldest and oldest.get('start_wal'):
+            subprocess.run(self.prefix + [self._bin('pg_archivecleanup'), self.wal_dir, oldest['start_wal']],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return removed
+
+    # ------------------------------------------------------------------
+    # Restauración a un momento dado
+    # ------------------------------------------------------------------
+
+    def restore_to_database(self, source_db, target_time, target_db, owner, port, timeout, log=print):
+        """
+        Recupera `source_db` al momento `target_time` en la base nueva `target_db`
+        del cluster principal. Usa el backup base más reciente anterior a ese
+        momento y los WAL archivados.
+        """
+        base = next((b for b in self.list_base_backups()
+                     if datetime.strptime(b['finished_at'], '%Y-%m-%d %H:%M:%S') <= target_time), None)
+        if not base:
+            raise BackupPipelineError('No hay un backup base anterior al momento pedido')
+        if self.database_exists(target_db):
+            raise BackupPipelineError(f'La base {target_db} ya existe')
+
+        data_dir = os.path.join(self.restore_dir, target_db)
+        archive_path = os.path.join(self.base_dir, 'base', base['name'], BASE_ARCHIVE)
+        pg_ctl = self._bin('pg_ctl')
+        started = False
+
+        log(f"📦 Backup base: {base['name']} ({base['finished_at']})")
+        try:
+            subprocess.run(self.prefix + ['rm', '-rf', data_dir], check=True)
+            subprocess.run(self.prefix + ['mkdir', '-p', '-m', '700', data_dir], check=True)
+
+            # El tar se descomprime como el usuario actual y se extrae como postgres
+            with open(archive_path, 'rb') as source:
+                decompress = subprocess.Popen(['gzip', '-dc'], stdin=source, stdout=subprocess.PIPE)
+                extract = subprocess.Popen(self.prefix + ['tar', '-xf', '-', '-C', data_dir], stdin=decompress.stdout)
+                decompress.stdout.close()
+                if extract.wait() != 0 or decompress.wait() != 0:
+                    raise BackupPipelineError('No se pudo extraer el backup base')
+            log("✅ Backup base extraído")
+
+            # Configuración propia de la copia temporal: sin archivar WAL (no debe
+            # mezclar su nueva línea de tiempo con el archivo de producción) y sólo por socket
+            self._sudo_write(os.path.join(data_dir, 'postgresql.auto.conf'), '\n'.join([
+                f"port = {port}",
+                "listen_addresses = ''",
+                f"unix_socket_directories = '{data_dir}'",
+                "archive_mode = 'off'",
+                f"restore_command = 'cp {self.wal_dir}/%f \"%p\"'",
+                f"recovery_target_time = '{target_time:%Y-%m-%d %H:%M:%S}'",
+                "recovery_target_action = 'promote'",
+                "max_connections = 20",
+                "shared_buffers = '128MB'",
+                '',
+            ]))
+            subprocess.run(self.prefix + ['touch', os.path.join(data_dir, 'recovery.signal'),
+                                          os.path.join(data_dir, 'postgresql.conf')], check=True)
+            subprocess.run(self.prefix + ['rm', '-f', os.path.join(data_dir, 'standby.signal'),
+                                          os.path.join(data_dir, 'postmaster.pid')], check=True)
+            self._sudo_write(os.path.join(data_dir, 'pg_hba.conf'), 'local all all peer\n')
+
+            log(f"⏪ Recuperando hasta {target_time:%Y-%m-%d %H:%M:%S}...")
+            result = subprocess.run(self.prefix + [pg_ctl, '-D', data_dir, '-l', os.path.join(data_dir, 'restore.log'),
+                                                   '-w', '-t', str(timeout), 'start'],
+                                    capture_output=True, text=True)
+            started = True
+            if result.returncode != 0:
+                raise BackupPipelineError(f'La copia temporal no arrancó: {self._restore_log_tail(data_dir)}')
+
+            deadline = time.monotonic() + timeout
+            while self._psql("SELECT pg_is_in_recovery()", port=port, host=data_dir)[0][0] == 't':
+                if time.monotonic() > deadline:
+                    raise BackupPipelineError('Tiempo de recuperación agotado')
+                time.sleep(2)
+            log("✅ Recuperación completa")
+
+            if not self.database_exists(source_db, port=port, host=data_dir):
+                raise BackupPipelineError(f'La base {source_db} no existía en ese momento')
+
+            log(f"🗄️  Copiando {source_db} a {target_db}...")
+            subprocess.run(self.prefix + ['createdb', target_db, '-O', owner, '--encoding=UTF8'], check=True)
+            with open(os.path.join(self.base_dir, f'{target_db}.err'), 'wb') as err:
+                dump = subprocess.Popen(self.prefix + ['pg_dump', '-h', data_dir, '-p', str(port), source_db],
+                                        stdout=subprocess.PIPE, stderr=err)
+                load = subprocess.Popen(self.prefix + ['psql', '-X', '-q', '-d', target_db],
+                                        stdin=dump.stdout, stdout=subprocess.DEVNULL, stderr=err)
+                dump.stdout.close()
+                load_code = load.wait()
+                dump_code = dump.wait()
+            os.remove(os.path.join(self.base_dir, f'{target_db}.err'))
+            if dump_code != 0 or load_code != 0:
+                subprocess.run(self.prefix + ['dropdb', '--if-exists', target_db], stderr=subprocess.DEVNULL)
+                raise BackupPipelineError(f'No se pudo copiar {source_db} (pg_dump {dump_code}, psql {load_code})')
+
+            comment = json.dumps({
+                'instance': source_db,
+                'target_time': f'{target_time:%Y-%m-%d %H:%M:%S}',
+                'base_backup': base['name'],
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            self._psql("COMMENT ON DATABASE :\"target_db\" IS :'comment'",
+                       variables={'target_db': target_db, 'comment': comment})
+            log(f"✅ Base restaurada: {target_db}")
+            return {'database': target_db, 'base_backup': base['name']}
+        finally:
+            if started:
+                subprocess.run(self.prefix + [pg_ctl, '-D', data_dir, '-m', 'fast', '-w', 'stop'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            subprocess.run(self.prefix + ['rm', '-rf', data_dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _restore_log_tail(self, data_dir, lines=20):
+        result = subprocess.run(self.prefix + ['tail', '-n', str(lines), os.path.join(data_dir, 'restore.log')],
+                                capture_output=True, text=True)
+        return result.stdout.strip()
+
+    def drop_restored_database(self, name):
+        if not name.startswith(RESTORED_DB_PREFIX) or not re.fullmatch(r'[a-z0-9_-]+', name):
+            raise BackupPipelineError('Base inválida')
+        subprocess.run(self.prefix + ['dropdb', '--if-exists', name], check=True, capture_output=True)
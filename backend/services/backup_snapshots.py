@@ -0,0 +1,291 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from services.backup_pipeline import (
+    BackupPipelineError, StreamingArchive, dump_compressed, DUMP_MEMBER, FILESTORE_MEMBER, COPY_BUFFER_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+# Snapshot incremental: el filestore como lista de hashes (los archivos van al
+# blob store compartido, una sola vez) más el dump comprimido de la base.
+SNAPSHOTS_DIR = 'snapshots'
+SNAPSHOT_SUMMARY = 'snapshot.json'
+SNAPSHOT_FILES = 'files.jsonl.gz'
+SNAPSHOT_DUMP = 'dump.sql.gz'
+SNAPSHOT_NAME_RE = re.compile(r'snapshot_\d{8}_\d{6}')
+
+# Odoo guarda los adjuntos como <sha1[:2]>/<sha1>: el nombre ya es el hash
+ODOO_BLOB_RE = re.compile(r'[0-9a-f]{40}')
+
+
+def odoo_digest(relpath):
+    """SHA1 que indica la ruta de un adjunto de Odoo, o None si no sigue el formato"""
+    directory, name = os.path.split(relpath)
+    if ODOO_BLOB_RE.fullmatch(name) and os.path.basename(directory) == name[:2]:
+        return name
+    return None
+
+
+class BlobStore:
+    """
+    Archivos direccionados por SHA1 en `<root>/objects/<sha1[:2]>/<sha1>`.
+    Los snapshots escriben con lock compartido; la recolección de blobs sin
+    referencias toma el lock exclusivo, así nunca borra uno que un snapshot
+    en curso está por referenciar.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.lock_path = os.path.join(root, '.lock')
+
+    def blob_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    @contextmanager
+    def lock(self, exclusive=False, blocking=True):
+        """Lock del store; entrega False si no se pudo tomar sin bloquear"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.lock_path, 'a') as handle:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(handle, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def put_file(self, path, digest=None):
+        """
+        Guarda `path` si su contenido no está en el store. Con `digest` (el
+        hash que indica el nombre del archivo) un blob existente no se vuelve
+        a leer. Devuelve (sha1, bytes agregados).
+        """
+        if digest and os.path.exists(self.blob_path(digest)):
+            return digest, 0
+
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(self.tmp_dir, f'{os.getpid()}-{threading.get_ident()}')
+        sha1 = hashlib.sha1()
+        size = 0
+        with open(path, 'rb') as source, open(tmp_path, 'wb') as target:
+            while True:
+                chunk = source.read(COPY_BUFFER_BYTES)
+                if not chunk:
+                    break
+                sha1.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+
+        actual = sha1.hexdigest()
+        if digest and actual != digest:
+            logger.warning(f"Blob store: {path} no coincide con su nombre (sha1 {actual})")
+        blob_path = self.blob_path(actual)
+        if os.path.exists(blob_path):
+            os.remove(tmp_path)
+            return actual, 0
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, blob_path)
+        return actual, size
+
+    def collect(self, references):
+        """Borra los blobs sin referencias (`references`: Counter sha1 -> snapshots). Requiere el lock exclusivo"""
+        removed = 0
+        freed = 0
+        kept = 0
+        if not os.path.isdir(self.objects_dir):
+            return {'removed': 0, 'freed_bytes': 0, 'kept': 0}
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                if references.get(digest):
+                    kept += 1
+                    continue
+                blob_path = os.path.join(prefix_dir, digest)
+                try:
+                    freed += os.path.getsize(blob_path)
+                    os.remove(blob_path)
+                    removed += 1
+                except OSError as e:
+                    logger.error(f"Blob store: no se pudo borrar {blob_path}: {e}")
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)  # Restos de snapshots interrumpidos
+        return {'removed': removed, 'freed_bytes': freed, 'kept': kept}
+
+
+def read_summary(snapshot_dir):
+    with open(os.path.join(snapshot_dir, SNAPSHOT_SUMMARY), 'r') as f:
+        return json.load(f)
+
+
+def iter_entries(snapshot_dir):
+    """[ruta relativa, sha1, tamaño, mtime] de cada archivo del filestore"""
+    with gzip.open(os.path.join(snapshot_dir, SNAPSHOT_FILES), 'rt') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def list_snapshot_dirs(instance_dir):
+    """Snapshots completos de una instancia, del más nuevo al más viejo"""
+    snapshots_dir = os.path.join(instance_dir, SNAPSHOTS_DIR)
+    if not os.path.isdir(snapshots_dir):
+        return []
+    names = [name for name in os.listdir(snapshots_dir) if SNAPSHOT_NAME_RE.fullmatch(name)]
+    return [os.path.join(snapshots_dir, name) for name in sorted(names, reverse=True)]
+
+
+def create_snapshot(store, instance_dir, db_name, filestore_path, compressor, progress=None):
+    """
+    Crea `snapshots/snapshot_<timestamp>`: pg_dump comprimido (en un hilo,
+    mientras se recorre el filestore) y la lista de hashes del filestore.
+    Sólo se copian los archivos que el store todavía no tiene. Devuelve el
+    resumen del snapshot.
+    """
+    name = datetime.now().strftime('snapshot_%Y%m%d_%H%M%S')
+    snapshots_dir = os.path.join(instance_dir, SNAPSHOTS_DIR)
+    partial_dir = os.path.join(snapshots_dir, f'.{name}.partial')
+    final_dir = os.path.join(snapshots_dir, name)
+    os.makedirs(partial_dir)
+
+    dump_result = {}
+
+    def run_dump():
+        try:
+            dump_result['size'] = dump_compressed(db_name, os.path.join(partial_dir, SNAPSHOT_DUMP), compressor)
+        except Exception as e:
+            dump_result['error'] = e
+
+    summary = {
+        'name': name,
+        'db_name': db_name,
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'file_count': 0,
+        'filestore_size': 0,
+        'new_files': 0,
+        'new_bytes': 0,
+    }
+    try:
+        with store.lock():
+            dump_thread = threading.Thread(target=run_dump, daemon=True)
+            dump_thread.start()
+
+            with gzip.open(os.path.join(partial_dir, SNAPSHOT_FILES), 'wt', compresslevel=6) as manifest:
+                if os.path.isdir(filestore_path):
+                    stack = ['']
+                    while stack:
+                        relative = stack.pop()
+                        with os.scandir(os.path.join(filestore_path, relative)) as entries:
+                            for entry in sorted(entries, key=lambda e: e.name):
+                                relpath = os.path.join(relative, entry.name)
+                                if entry.is_dir(follow_symlinks=False):
+                                    stack.append(relpath)
+                                    continue
+                                if not entry.is_file(follow_symlinks=False):
+                                    continue
+                                st = entry.stat(follow_symlinks=False)
+                                digest, added = store.put_file(entry.path, odoo_digest(relpath))
+                                manifest.write(json.dumps([relpath, digest, st.st_size, int(st.st_mtime)]) + '\n')
+                                summary['file_count'] += 1
+                                summary['filestore_size'] += st.st_size
+                                if added:
+                                    summary['new_files'] += 1
+                                    summary['new_bytes'] += added
+                                if progress:
+                                    progress(summary)
+
+            dump_thread.join()
+            if 'error' in dump_result:
+                raise dump_result['error']
+
+            summary['dump_size'] = dump_result['size']
+            summary['dump_compressed_size'] = os.path.getsize(os.path.join(partial_dir, SNAPSHOT_DUMP))
+            with open(os.path.join(partial_dir, SNAPSHOT_SUMMARY), 'w') as f:
+                json.dump(summary, f, indent=2)
+            os.rename(partial_dir, final_dir)
+    except Exception:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
+    return summary
+
+
+def export_snapshot(store, snapshot_dir, archive_path, compressor, progress=None):
+    """Arma un .tar.gz compatible con Odoo (dump.sql + filestore/) leyendo los blobs del snapshot"""
+    summary = read_summary(snapshot_dir)
+    archive = StreamingArchive(archive_path, compressor)
+    try:
+        archive.add_directory(FILESTORE_MEMBER)
+        directories = set()
+        done = 0
+        for relpath, digest, _size, mtime in iter_entries(snapshot_dir):
+            parent = os.path.dirname(relpath)
+            if parent and parent not in directories:
+                parts = parent.split('/')
+                for depth in range(1, len(parts) + 1):
+                    directory = '/'.join(parts[:depth])
+                    if directory not in directories:
+                        archive.add_directory(f'{FILESTORE_MEMBER}/{directory}')
+                        directories.add(directory)
+            blob_path = store.blob_path(digest)
+            if not os.path.exists(blob_path):
+                raise BackupPipelineError(f'Falta el blob {digest} ({relpath}) en el store')
+            archive.add_file(blob_path, f'{FILESTORE_MEMBER}/{relpath}', mtime=mtime)
+            done += 1
+            if progress:
+                progress(done, summary['file_count'])
+
+        decompress = subprocess.Popen([compressor[0], '-dc', os.path.join(snapshot_dir, SNAPSHOT_DUMP)],
+                                      stdout=subprocess.PIPE)
+        try:
+            archive.add_stream(DUMP_MEMBER, summary['dump_size'], decompress.stdout, time.time())
+        finally:
+            decompress.stdout.close()
+            decompress.wait()
+        if decompress.returncode != 0:
+            raise BackupPipelineError(f'No se pudo descomprimir {SNAPSHOT_DUMP}')
+        archive.close()
+    except Exception:
+        archive.abort()
+        raise
+    return summary
+
+
+def count_references(instances_dir):
+    """Referencias a cada blob desde los snapshots completos de todas las instancias"""
+    references = Counter()
+    for instance in os.listdir(instances_dir):
+        instance_dir = os.path.join(instances_dir, instance)
+        if not os.path.isdir(instance_dir):
+            continue
+        for snapshot_dir in list_snapshot_dirs(instance_dir):
+            references.update(digest for _relpath, digest, _size, _mtime in iter_entries(snapshot_dir))
+    return references
+
+
+def remove_partial_snapshots(instances_dir):
+    """Snapshots interrumpidos (sólo con el lock exclusivo del store: no hay ninguno en curso)"""
+    for instance in os.listdir(instances_dir):
+        snapshots_dir = os.path.join(instances_dir, instance, SNAPSHOTS_DIR)
+        if not os.path.isdir(snapshots_dir):
+            continue
+        for name in os.listdir(snapshots_dir):
+            if name.startswith('.') and name.endswith('.partial'):
+                shutil.rmtree(os.path.join(snapshots_dir, name), ignore_errors=True)
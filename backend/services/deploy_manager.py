@@ -3,6 +3,7 @@ import subprocess
 import logging
 from typing import Dict
 from flask import current_app
+from services.instance_descriptor import get_descriptor
 
 logger = logging.getLogger(__name__)
 
@@ -83,8 +84,13 @@ class DeployManager:
         """Actualiza módulos de Odoo"""
         self._init_paths()
         
-        # Determinar si es producción o desarrollo
-        if instance_name.startswith('dev-'):
+        # Ruta y servicio desde el descriptor de la instancia (info-instancia.txt)
+        descriptor = get_descriptor(instance_name)
+        if descriptor:
+            instance_path = descriptor['path']
+            service_name = descriptor['service'] or f'odoo19e-{instance_name}'
+        # Sin descriptor: determinar si es producción o desarrollo por el nombre
+        elif instance_name.startswith('dev-'):
             instance_path = os.path.join(self.dev_root, instance_name)
             service_name = f'odoo19e-{instance_name}'
         else:
@@ -0,0 +1,85 @@
+import hashlib
+import re
+
+# Cantidad de frames (los más internos) que identifican un error
+TOP_FRAMES = 3
+TITLE_MAX_LENGTH = 200
+
+TRACEBACK_HEADER = 'Traceback (most recent call last):'
+FRAME_REGEX = re.compile(r'^\s*File "(?P<path>[^"]+)", line \d+, in (?P<func>\S+)')
+EXCEPTION_REGEX = re.compile(r'^(?P<type>[A-Za-z_][\w.]*)(?::\s*(?P<message>.*))?$')
+
+# Lo variable de un mensaje (ids, números, hashes, valores entre comillas) se reemplaza
+# para que dos ocurrencias del mismo error den el mismo fingerprint
+NORMALIZE_PATTERNS = (
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.I), '<uuid>'),
+    (re.compile(r'\b0x[0-9a-f]+\b', re.I), '<hex>'),
+    (re.compile(r'\b[0-9a-f]{16,}\b', re.I), '<hex>'),
+    (re.compile(r"'[^']*'"), "'<s>'"),
+    (re.compile(r'"[^"]*"'), '"<s>"'),
+    (re.compile(r'\d+(?:[.,]\d+)*'), '<n>'),
+)
+
+
+def normalize_message(message):
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        message = pattern.sub(replacement, message)
+    return ' '.join(message.split())
+
+
+def _frame_key(path, func):
+    """Ruta del frame sin prefijos de instalación (addons/..., odoo/...) + función"""
+    path = path.replace('\\', '/')
+    for marker in ('/site-packages/', '/addons/', '/odoo/'):
+        if marker in path:
+            path = path.rsplit(marker, 1)[1]
+            break
+    else:
+        path = '/'.join(path.split('/')[-2:])
+    return f'{path}:{func}'
+
+
+def fingerprint_record(record):
+    """
+    Fingerprint de un registro ERROR/CRITICAL (cabecera + traceback).
+    Con traceback: tipo de excepción + los TOP_FRAMES frames más internos
+    (sin números de línea). Sin traceback: logger + mensaje normalizado.
+    Devuelve {'fingerprint', 'exception_type', 'title'}.
+    """
+    lines = record['message'].split('\n')
+    frames = []
+    exception_type = None
+    exception_message = ''
+
+    if TRACEBACK_HEADER in lines:
+        start = lines.index(TRACEBACK_HEADER)
+        for line in lines[start + 1:]:
+            if line == TRACEBACK_HEADER:
+                # Excepción encadenada: cuenta la última
+                frames = []
+                continue
+
+            frame = FRAME_REGEX.match(line)
+            if frame:
+                frames.append(_frame_key(frame.group('path'), frame.group('func')))
+                continue
+
+            # La excepción es la última línea sin sangría después de los frames
+            exception = EXCEPTION_REGEX.match(line.strip()) if line and not line[0].isspace() else None
+            if exception and frames:
+                exception_type = exception.group('type')
+                exception_message = exception.group('message') or ''
+
+    if exception_type:
+        key = '|'.join([exception_type] + frames[-TOP_FRAMES:])
+        title = f'{exception_type}: {normalize_message(exception_message)}'.rstrip(': ')
+    else:
+        first_line = normalize_message(lines[0])
+        key = f"{record['logger']}|{first_line}"
+        title = first_line
+
+    return {
+        'fingerprint': hashlib.sha1(key.encode('utf-8')).hexdigest()[:16],
+        'exception_type': exception_type,
+        'title': title[:TITLE_MAX_LENGTH],
+    }
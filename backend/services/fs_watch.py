@@ -0,0 +1,133 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+DIR_CHANGES = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+FILE_CHANGES = IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    return _libc
+
+
+class InotifyWatcher:
+    """
+    Envoltorio mínimo de inotify (Linux) vía ctypes, sin dependencias.
+    El descriptor es no bloqueante: read_events() devuelve los eventos
+    pendientes o una lista vacía, así se puede drenar en cada consulta
+    o usar fileno() con select/poll desde un hilo.
+    """
+
+    def __init__(self):
+        self._fd = None
+        self._paths = {}
+        self._wds = {}
+
+    @classmethod
+    def create(cls):
+        """Devuelve un watcher o None si inotify no está disponible"""
+        watcher = cls()
+        try:
+            libc = _load_libc()
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify no disponible, se usará verificación por stat: {e}")
+            return None
+
+        watcher._fd = fd
+        return watcher
+
+    def fileno(self):
+        return self._fd
+
+    def add_watch(self, path, mask):
+        """Agrega (o actualiza) un watch; devuelve el wd o None si falla"""
+        if path in self._wds:
+            return self._wds[path]
+
+        wd = _load_libc().inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            logger.debug(f"No se pudo vigilar {path}: {os.strerror(ctypes.get_errno())}")
+            return None
+
+        self._paths[wd] = path
+        self._wds[path] = wd
+        return wd
+
+    def remove_watch(self, path):
+        wd = self._wds.pop(path, None)
+        if wd is None:
+            return
+        self._paths.pop(wd, None)
+        _load_libc().inotify_rm_watch(self._fd, wd)
+
+    def watched(self, path):
+        return path in self._wds
+
+    def read_events(self):
+        """Lista de (ruta_vigilada, máscara, nombre) pendientes, sin bloquear"""
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                logger.warning(f"Error leyendo eventos inotify: {e}")
+                break
+
+            if not data:
+                break
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += length
+
+                path = self._paths.get(wd)
+                if mask & IN_IGNORED:
+                    # El kernel eliminó el watch (directorio borrado o desmontado)
+                    if path is not None:
+                        self._paths.pop(wd, None)
+                        self._wds.pop(path, None)
+                events.append((path, mask, name))
+
+        return events
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._paths.clear()
+            self._wds.clear()
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import re
+import tempfile
+
+from config import Config
+from services.instance_inventory import instance_inventory
+
+logger = logging.getLogger(__name__)
+
+DESCRIPTOR_VERSION = 1
+INFO_FILENAME = 'info-instancia.txt'
+CONF_FILENAME = 'odoo.conf'
+SPECIAL_DIRS = ('temp', 'backups')
+
+# Una sola pasada sobre info-instancia.txt (soporta formato con y sin emojis);
+# de cada campo vale la primera aparición
+INFO_FIELDS_REGEX = re.compile(
+    r'Puerto(?:\s+HTTP)?:\s*(?P<port>\d+)'
+    r'|Dominio:\s*https?://(?P<domain>[^\s]+)'
+    r'|Base de datos:\s*(?P<database>[^\s]+)'
+    r'|(?:Servicio(?:\s+systemd)?|🧩\s+Servicio):\s*(?P<service>[^\s]+)'
+)
+
+CONF_LINE_REGEX = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*?)\s*$')
+
+# Sólo se guardan opciones no sensibles de odoo.conf (nada de passwords)
+CONF_KEYS = ('db_name', 'http_port', 'gevent_port', 'longpolling_port', 'logfile', 'data_dir', 'workers')
+
+
+def parse_info_file(content):
+    fields = {}
+    for match in INFO_FIELDS_REGEX.finditer(content):
+        key = match.lastgroup
+        if key not in fields:
+            fields[key] = match.group(key)
+    if 'port' in fields:
+        fields['port'] = int(fields['port'])
+    return fields
+
+
+def parse_conf_file(content):
+    options = {}
+    for line in content.splitlines():
+        match = CONF_LINE_REGEX.match(line)
+        if match and match.group(1) in CONF_KEYS and match.group(1) not in options:
+            options[match.group(1)] = match.group(2)
+    return options
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _sidecar_dir():
+    return getattr(Config, 'INSTANCE_DESCRIPTOR_CACHE_DIR', None) or os.path.join(Config.DATA_PATH, 'instance-descriptors')
+
+
+def _sidecar_path(env_type, name):
+    return os.path.join(_sidecar_dir(), f'{env_type}-{name}.json')
+
+
+def _load_sidecar(path, mtimes):
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('version') != DESCRIPTOR_VERSION or cached.get('mtimes') != mtimes:
+        return None
+    return cached.get('descriptor')
+
+
+def _write_sidecar(path, mtimes, descriptor):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': DESCRIPTOR_VERSION, 'mtimes': mtimes, 'descriptor': descriptor}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug(f"No se pudo guardar el descriptor {path}: {e}")
+
+
+def build_descriptor(name, path, env_type):
+    """Parsea info-instancia.txt y odoo.conf (una pasada cada uno)"""
+    descriptor = {
+        'name': name,
+        'type': env_type,
+        'path': path,
+        'port': None,
+        'domain': None,
+        'database': None,
+        'service': None,
+        'has_conf': False,
+        'conf': {},
+    }
+
+    info_file = os.path.join(path, INFO_FILENAME)
+    if os.path.exists(info_file):
+        try:
+            descriptor.update(parse_info_file(_read_text(info_file)))
+        except Exception as e:
+            logger.warning(f"Error leyendo info de {name}: {e}")
+
+    conf_file = os.path.join(path, CONF_FILENAME)
+    if os.path.exists(conf_file):
+        descriptor['has_conf'] = True
+        try:
+            descriptor['conf'] = parse_conf_file(_read_text(conf_file))
+        except Exception as e:
+            logger.warning(f"Error leyendo odoo.conf de {name}: {e}")
+
+    logfile = descriptor['conf'].get('logfile')
+    descriptor['log_file'] = logfile if logfile and logfile not in ('False', 'None') else os.path.join(path, 'odoo.log')
+    return descriptor
+
+
+def load_descriptor(name, path, env_type):
+    """
+    Descriptor de una instancia reutilizando el sidecar JSON si los mtimes de
+    info-instancia.txt y odoo.conf coinciden con los que se usaron para generarlo.
+    """
+    mtimes = [_mtime(os.path.join(path, INFO_FILENAME)), _mtime(os.path.join(path, CONF_FILENAME))]
+    sidecar = _sidecar_path(env_type, name)
+
+    descriptor = _load_sidecar(sidecar, mtimes)
+    if descriptor is not None:
+        return descriptor
+
+    descriptor = build_descriptor(name, path, env_type)
+    _write_sidecar(sidecar, mtimes, descriptor)
+    return descriptor
+
+
+def _roots(env_type=None):
+    roots = [(Config.PROD_ROOT, 'production'), (Config.DEV_ROOT, 'development')]
+    return [root for root in roots if env_type is None or root[1] == env_type]
+
+
+def list_descriptors(env_type=None, require_conf=False):
+    """Descriptores de todas las instancias (desde el inventario en memoria, sin systemd)"""
+    descriptors = instance_inventory.list_instances(_roots(env_type), load_descriptor, require_conf=require_conf)
+    if require_conf:
+        descriptors = [d for d in descriptors if d['name'] not in SPECIAL_DIRS]
+    return descriptors
+
+
+def get_descriptor(name):
+    """Descriptor de una instancia por nombre (producción primero) o None"""
+    if not name or os.sep in name or name.startswith('.'):
+        return None
+
+    for root, env_type in _roots():
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            return load_descriptor(name, path, env_type)
+    return None
@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+import time
+
+from services.fs_watch import InotifyWatcher, DIR_CHANGES, FILE_CHANGES, IN_Q_OVERFLOW
+
+logger = logging.getLogger(__name__)
+
+# Archivos de una instancia que determinan su descriptor
+DESCRIPTOR_FILES = ('info-instancia.txt', 'odoo.conf')
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class InstanceInventory:
+    """
+    Inventario de instancias en memoria (uno por proceso).
+    Cada entrada guarda el descriptor parseado junto con los mtimes de los
+    archivos de los que salió; sólo se vuelve a parsear si alguno cambió.
+    Con inotify los cambios marcan entradas puntuales y se revalida todo cada
+    `full_check_interval`; sin inotify se revalida por stat cada `stat_ttl`.
+    El estado de los servicios no se guarda acá (ver services/systemd_status.py).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._roots = {}
+        self._entries = {}
+        self._dirty = set()
+        self._watcher = None
+        self._watcher_checked = False
+        self._validated_at = 0.0
+        self.stat_ttl = 5
+        self.full_check_interval = 60
+
+    def configure(self, config):
+        self.stat_ttl = config.get('INSTANCE_INVENTORY_STAT_TTL_SECONDS', 5)
+        self.full_check_interval = config.get('INSTANCE_INVENTORY_FULL_CHECK_SECONDS', 60)
+
+    def invalidate(self, path=None):
+        """Fuerza a revalidar una instancia (o todo el inventario)"""
+        with self._lock:
+            if path is None:
+                self._validated_at = 0.0
+                self._roots.clear()
+            else:
+                self._dirty.add(path)
+
+    def list_instances(self, roots, parse, require_conf=False):
+        """
+        Devuelve copias de los descriptores de todas las instancias bajo `roots`
+        (lista de (directorio, tipo)). `parse(name, path, env_type)` sólo se
+        llama para entradas nuevas o cuyos archivos cambiaron.
+        """
+        with self._lock:
+            self._refresh(roots, parse)
+
+            instances = []
+            for root, _env_type in roots:
+                for path in self._roots.get(root, {}).get('paths', []):
+                    entry = self._entries.get(path)
+                    if not entry:
+                        continue
+                    if require_conf and not entry['has_conf']:
+                        continue
+                    instances.append(dict(entry['info']))
+            return instances
+
+    def _ensure_watcher(self):
+        if not self._watcher_checked:
+            self._watcher_checked = True
+            self._watcher = InotifyWatcher.create()
+        return self._watcher
+
+    def _drain_events(self):
+        """Traduce eventos inotify pendientes en rutas a revalidar"""
+        force_full = False
+        for watched, mask, name in self._watcher.read_events():
+            if mask & IN_Q_OVERFLOW or watched is None:
+                force_full = True
+                continue
+
+            if watched in self._roots:
+                # Alta/baja de instancias en el directorio raíz
+                self._roots[watched]['mtime'] = None
+                if name:
+                    self._dirty.add(os.path.join(watched, name))
+            else:
+                self._dirty.add(watched)
+        return force_full
+
+    def _refresh(self, roots, parse):
+        watcher = self._ensure_watcher()
+        now = time.monotonic()
+
+        interval = self.full_check_interval if watcher else self.stat_ttl
+        full = now - self._validated_at >= interval
+        if watcher and self._drain_events():
+            full = True
+
+        for root, env_type in roots:
+            self._refresh_root(root, env_type, parse, full)
+
+        if full:
+            self._validated_at = now
+        self._dirty.clear()
+
+    def _refresh_root(self, root, env_type, parse, full):
+        state = self._roots.get(root)
+        root_mtime = _mtime(root)
+
+        if root_mtime is None:
+            for path in (state or {}).get('paths', []):
+                self._drop(path)
+            self._roots.pop(root, None)
+            return
+
+        if state is None or state['mtime'] != root_mtime:
+            try:
+                names = os.listdir(root)
+            except OSError as e:
+                logger.warning(f"No se pudo listar {root}: {e}")
+                names = []
+
+            paths = [os.path.join(root, name) for name in names if os.path.isdir(os.path.join(root, name))]
+            for path in (state or {}).get('paths', []):
+                if path not in paths:
+                    self._drop(path)
+
+            state = {'mtime': root_mtime, 'paths': paths}
+            self._roots[root] = state
+            if self._watcher:
+                self._watcher.add_watch(root, DIR_CHANGES)
+
+        for path in state['paths']:
+            if full or path in self._dirty or path not in self._entries:
+                self._refresh_entry(path, env_type, parse)
+
+    def _refresh_entry(self, path, env_type, parse):
+        key = tuple(_mtime(os.path.join(path, filename)) for filename in DESCRIPTOR_FILES)
+        entry = self._entries.get(path)
+        if entry and entry['key'] == key and entry['env_type'] == env_type:
+            return
+
+        name = os.path.basename(path)
+        self._entries[path] = {
+            'key': key,
+            'env_type': env_type,
+            'has_conf': key[1] is not None,
+            'info': parse(name, path, env_type),
+        }
+        if self._watcher:
+            self._watcher.add_watch(path, DIR_CHANGES | FILE_CHANGES)
+
+    def _drop(self, path):
+        self._entries.pop(path, None)
+        if self._watcher:
+            self._watcher.remove_watch(path)
+
+
+# Instancia global (una por proceso, compartida por todos los InstanceManager)
+instance_inventory = InstanceInventory()
@@ -1,10 +1,13 @@
 import os
 import subprocess
 import re
-import sys
 import logging
 from datetime import datetime
 from flask import current_app
+from services.instance_inventory import instance_inventory
+from services.instance_descriptor import load_descriptor, SPECIAL_DIRS
+from services.systemd_status import systemd_status, unit_key
+from services.job_manager import submit_job, job_summary
 
 logger = logging.getLogger(__name__)
 
@@ -26,123 +29,82 @@ class InstanceManager:
             self.scripts_path = current_app.config['SCRIPTS_PATH']
             self.puertos_file = current_app.config['PUERTOS_FILE']
             self.dev_instances_file = current_app.config['DEV_INSTANCES_FILE']
+        instance_inventory.configure(current_app.config)
+        systemd_status.configure(current_app.config)
+
+    def _submit_job(self, kind, instance_name, command, log_file, started_message, cwd=None, stdin_data=None):
+        """Encola la operación en el job manager (una a la vez por instancia, con límite global)"""
+        job, created = submit_job(
+            kind,
+            command,
+            instance_name=instance_name,
+            log_file=log_file,
+            cwd=cwd,
+            stdin_data=stdin_data,
+        )
+        if not created:
+            return {
+                'success': False,
+                'error': f'Ya hay una operación {kind} en curso para {instance_name} (job #{job.id})',
+                **job_summary(job)
+            }
+
+        return {'success': True, 'message': f'{started_message} (job #{job.id})', 'log_file': log_file, **job_summary(job)}
     
     def list_instances(self):
         """Lista todas las instancias (producción y desarrollo)"""
         self._init_paths()
-        instances = []
-        
-        # Instancias de producción
-        if os.path.exists(self.prod_root):
-            for name in os.listdir(self.prod_root):
-                path = os.path.join(self.prod_root, name)
-                if os.path.isdir(path):
-                    info = self._get_instance_info(name, path, 'production')
-                    instances.append(info)
-        
-        # Instancias de desarrollo
-        if os.path.exists(self.dev_root):
-            for name in os.listdir(self.dev_root):
-                path = os.path.join(self.dev_root, name)
-                if os.path.isdir(path):
-                    info = self._get_instance_info(name, path, 'development')
-                    instances.append(info)
         
+        # Descriptores desde el inventario en memoria; sólo se reparsea lo que cambió
+        descriptors = instance_inventory.list_instances(
+            [(self.prod_root, 'production'), (self.dev_root, 'development')],
+            load_descriptor
+        )
+        instances = [self._instance_info(descriptor) for descriptor in descriptors]
+        self._apply_service_status(instances)
         return instances
     
     def list_production_instances(self):
         """Lista solo las instancias de producción válidas para clonar"""
         self._init_paths()
-        instances = []
-        
-        if os.path.exists(self.prod_root):
-            for name in os.listdir(self.prod_root):
-                path = os.path.join(self.prod_root, name)
-                # Filtrar solo directorios válidos con odoo.conf
-                if os.path.isdir(path) and os.path.exists(os.path.join(path, 'odoo.conf')):
-                    # Excluir directorios especiales
-                    if name not in ['temp', 'backups']:
-                        info = self._get_instance_info(name, path, 'production')
-                        instances.append(info)
         
+        # Filtrar solo directorios válidos con odoo.conf
+        descriptors = instance_inventory.list_instances(
+            [(self.prod_root, 'production')],
+            load_descriptor,
+            require_conf=True
+        )
+        # Excluir directorios especiales
+        instances = [self._instance_info(d) for d in descriptors if d['name'] not in SPECIAL_DIRS]
+        self._apply_service_status(instances)
         return instances
     
-    def _get_instance_info(self, name, path, env_type):
-        """Obtiene información de una instancia"""
-        info = {
-            'name': name,
-            'type': env_type,
-            'path': path,
+    def _apply_service_status(self, instances):
+        """Completa el estado de cada servicio con una sola consulta a systemd"""
+        statuses = systemd_status.get_statuses([info['service'] for info in instances])
+        for info in instances:
+            if info['service']:
+                result = statuses[unit_key(info['service'])]
+                info['status'] = result['status']
+                # Último estado conocido: systemd no respondió dentro del presupuesto
+                info['status_stale'] = result['stale']
+    
+    def _instance_info(self, descriptor):
+        """Información pública de una instancia a partir de su descriptor"""
+        return {
+            'name': descriptor['name'],
+            'type': descriptor['type'],
+            'path': descriptor['path'],
             'status': 'unknown',
-            'port': None,
-            'domain': None,
-            'database': None,
-            'service': None
+            'port': descriptor['port'],
+            'domain': descriptor['domain'],
+            'database': descriptor['database'],
+            'service': descriptor['service']
         }
-        
-        # Leer archivo info-instancia.txt si existe
-        info_file = os.path.join(path, 'info-instancia.txt')
-        if os.path.exists(info_file):
-            try:
-                with open(info_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                    # Extraer información con regex (soporta formato con y sin emojis)
-                    port_match = re.search(r'Puerto(?:\s+HTTP)?:\s*(\d+)', content)
-                    if port_match:
-                        info['port'] = int(port_match.group(1))
-                    
-                    domain_match = re.search(r'Dominio:\s*https?://([^\s]+)', content)
-                    if domain_match:
-                        info['domain'] = domain_match.group(1)
-                    
-                    db_match = re.search(r'Base de datos:\s*([^\s]+)', content)
-                    if db_match:
-                        info['database'] = db_match.group(1)
-                    
-                    # Buscar servicio con varios formatos posibles
-                    service_match = re.search(r'(?:Servicio(?:\s+systemd)?|🧩\s+Servicio):\s*([^\s]+)', content)
-                    if service_match:
-                        info['service'] = service_match.group(1)
-            except Exception as e:
-                print(f"Error leyendo info de {name}: {e}")
-        
-        # Verificar estado del servicio
-        if info['service']:
-            try:
-                info['status'] = self._get_service_status(info['service'])
-                print(f"Service {info['service']} status: {info['status']}", file=sys.stderr, flush=True)
-            except Exception as e:
-                print(f"Error getting status for {info['service']}: {e}", file=sys.stderr, flush=True)
-                info['status'] = 'unknown'
-        
-        return info
     
     def _get_service_status(self, service_name):
         """Obtiene el estado de un servicio systemd"""
-        try:
-            result = subprocess.run(
-                ['/usr/bin/systemctl', 'is-active', service_name],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            status = result.stdout.strip()
-            logger.info(f"Service check: {service_name} -> stdout='{status}', returncode={result.returncode}")
-            
-            # Retornar el estado tal como lo devuelve systemctl
-            if status == 'active':
-                return 'active'
-            elif status == 'inactive':
-                return 'inactive'
-            elif status == 'failed':
-                return 'inactive'
-            else:
-                logger.warning(f"Unknown status '{status}' for service {service_name}")
-                return 'unknown'
-        except Exception as e:
-            logger.error(f"Error checking service status for {service_name}: {e}")
-            return 'unknown'
+        return systemd_status.get_status(service_name)
     
     def get_instance_status(self, instance_name):
         """Obtiene el estado detallado de una instancia"""
@@ -154,6 +116,7 @@ class InstanceManager:
         
         # Información adicional del servicio
         if instance['service']:
+            instance['unit'] = systemd_status.get_states().get(unit_key(instance['service']))
             try:
                 result = subprocess.run(
                     ['/usr/bin/systemctl', 'status', instance['service']],
@@ -167,23 +130,12 @@ class InstanceManager:
         
         return instance
 
-    def _extract_conf_value(self, conf_content: str, key: str):
-        pattern = rf'^\s*{re.escape(key)}\s*=\s*(.+?)\s*$'
-        match = re.search(pattern, conf_content, re.MULTILINE)
-        return match.group(1).strip() if match else None
-
     def _infer_dev_context(self, instance_name: str, instance_path: str):
-        conf_path = os.path.join(instance_path, 'odoo.conf')
-        if not os.path.exists(conf_path):
-            return None
-
-        try:
-            with open(conf_path, 'r', encoding='utf-8') as f:
-                conf_content = f.read()
-        except Exception:
+        descriptor = load_descriptor(instance_name, instance_path, 'development')
+        if not descriptor['has_conf']:
             return None
 
-        dev_db = self._extract_conf_value(conf_content, 'db_name')
+        dev_db = descriptor['conf'].get('db_name')
         if not dev_db:
             return None
 
@@ -475,6 +427,7 @@ echo "✅ Assets regenerados correctamente"
         git_branch: str = '',
         system_username: str = '',
         system_instance_accesses=None,
+        source_database: str = '',
     ):
         """
         Crea una nueva instancia de desarrollo clonando desde producción
@@ -483,6 +436,7 @@ echo "✅ Assets regenerados correctamente"
             source_instance: Instancia de producción a clonar (opcional, usa default del .env si no se especifica)
             neutralize: Si True, neutraliza la base de datos (elimina licencia, desactiva crons/correos)
             git_branch: Rama Git por defecto para esta instancia (opcional)
+            source_database: Base a clonar en lugar de la de producción (p. ej. una restauración PITR)
         """
         self._init_paths()
         script_path = os.path.join(self.scripts_path, 'odoo/create-dev-instance.sh')
@@ -514,30 +468,26 @@ echo "✅ Assets regenerados correctamente"
             script_args.append(system_username if system_username else '')
             system_access_arg = ','.join(system_instance_accesses or [])
             script_args.append(system_access_arg)
+
+            # Base de origen alternativa como octavo argumento (opcional)
+            script_args.append(source_database or '')
             
             # El nombre de la instancia completa incluye el prefijo "dev-"
             instance_name = f'dev-{name}'
             log_file_path = f'/tmp/odoo-create-{instance_name}.log'
             
-            # Ejecutar script en background desacoplado del proceso padre
-            with open(log_file_path, 'w') as log_file:
-                process = subprocess.Popen(
-                    script_args,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    text=True,
-                    bufsize=1
-                )
-            logger.info(f"Process started for dev instance {instance_name} from source {source_instance or 'default'} (neutralize={neutralize}, git_branch={git_branch or 'default'})")
+            result = self._submit_job(
+                'create_dev',
+                instance_name,
+                script_args,
+                log_file_path,
+                f'Creación de instancia {instance_name} iniciada. Ver logs: {log_file_path}'
+            )
+            logger.info(f"Job queued for dev instance {instance_name} from source {source_instance or 'default'} (neutralize={neutralize}, git_branch={git_branch or 'default'})")
             
-            return {
-                'success': True,
-                'message': f'Creación de instancia {instance_name} iniciada. Ver logs: {log_file_path}',
-                'log_file': log_file_path,
-                'instance_name': instance_name,  # Devolver el nombre completo de la instancia
-                'git_branch': git_branch  # Devolver la rama Git configurada
-            }
+            result['instance_name'] = instance_name  # Devolver el nombre completo de la instancia
+            result['git_branch'] = git_branch  # Devolver la rama Git configurada
+            return result
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -587,47 +537,29 @@ echo "✅ Assets regenerados correctamente"
         
         try:
             instance_name = f'prod-{name.lower()}'
-            pid_file = f"/tmp/{instance_name}.pid"
-            status_file = f"/tmp/{instance_name}.status"
             log_file_path = f'/tmp/odoo-create-{instance_name}.log'
             
             # Mapear método SSL a número (1=letsencrypt, 2=cloudflare, 3=http)
             ssl_map = {'letsencrypt': '1', 'cloudflare': '2', 'http': '3'}
             ssl_arg = ssl_map.get(ssl_method, '1')
 
-            # Ejecutar script en background desacoplado del proceso padre
             # Argumentos: nombre, version, edition, ssl_method
-            log_fd = os.open(log_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
-            process = subprocess.Popen(
+            result = self._submit_job(
+                'create_prod',
+                instance_name,
                 ['/bin/bash', script_path, name, version, edition, ssl_arg],
-                stdout=log_fd,
-                stderr=subprocess.STDOUT,
-                start_new_session=True,
-                text=True,
-                bufsize=1
+                log_file_path,
+                f'Creación de instancia de producción {instance_name} iniciada. Dominio: {name}.{domain_root} - Odoo {version} {edition}'
             )
-            os.close(log_fd)
-
-            # Guardar PID y estado inicial
-            with open(pid_file, 'w') as f:
-                f.write(str(process.pid))
-
-            with open(status_file, 'w') as f:
-                f.write("running")
-            
-            logger.info(f"Production instance creation started: {instance_name} (Odoo {version} {edition})")
+            logger.info(f"Production instance creation queued: {instance_name} (Odoo {version} {edition})")
             
-            return {
-                'success': True,
-                'message': f'Creación de instancia de producción {instance_name} iniciada. Dominio: {name}.{domain_root} - Odoo {version} {edition}',
-                'log_file': log_file_path,
+            result.update({
                 'instance_name': instance_name,
                 'domain': f'{name}.{domain_root}',
                 'version': version,
-                'edition': edition,
-                'pid': process.pid,
-                'status_file': status_file
-            }
+                'edition': edition
+            })
+            return result
         except Exception as e:
             logger.error(f"Error creating production instance: {e}")
             return {'success': False, 'error': str(e)}
@@ -661,6 +593,7 @@ echo "✅ Assets regenerados correctamente"
                 process.wait(timeout=300)
             
             if process.returncode == 0:
+                instance_inventory.invalidate()
                 return {'success': True, 'message': f'Instancia {instance_name} eliminada', 'log_file': f'/tmp/odoo-delete-{instance_name}.log'}
             else:
                 # Leer el log para ver qué falló
@@ -703,6 +636,7 @@ echo "✅ Assets regenerados correctamente"
                 process.wait(timeout=300)
             
             if process.returncode == 0:
+                instance_inventory.invalidate()
                 return {'success': True, 'message': f'Instancia de producción {instance_name} eliminada correctamente', 'log_file': log_path}
             else:
                 # Leer el log para ver qué falló
@@ -730,27 +664,19 @@ echo "✅ Assets regenerados correctamente"
         try:
             # Responder automáticamente: s para continuar, s/n para neutralizar
             neutralize_answer = 's' if neutralize else 'n'
-            with open(f'/tmp/odoo-update-db-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación para continuar y para neutralizar
-                process.stdin.write(f's\n{neutralize_answer}\n')
-                process.stdin.close()
-            
+            log_file = f'/tmp/odoo-update-db-{instance_name}.log'
             neutralize_msg = " (con neutralización)" if neutralize else " (sin neutralización)"
-            return {
-                'success': True,
-                'message': f'Actualización de BD iniciada{neutralize_msg}. Ver logs: /tmp/odoo-update-db-{instance_name}.log',
-                'log_file': f'/tmp/odoo-update-db-{instance_name}.log',
-                'neutralize': neutralize
-            }
+            result = self._submit_job(
+                'update_db',
+                instance_name,
+                ['/bin/bash', script_path],
+                log_file,
+                f'Actualización de BD iniciada{neutralize_msg}. Ver logs: {log_file}',
+                cwd=instance_path,
+                stdin_data=f's\n{neutralize_answer}\n'
+            )
+            result['neutralize'] = neutralize
+            return result
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -767,26 +693,17 @@ echo "✅ Assets regenerados correctamente"
             logger.info(f'Scripts regenerados para {instance_name}: {details}')
         
         try:
-            # Ejecutar script en background con log
-            with open(f'/tmp/odoo-update-files-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
-            
-            return {
-                'success': True,
-                'message': f'Actualización de archivos iniciada. Ver logs: /tmp/odoo-update-files-{instance_name}.log',
-                'log_file': f'/tmp/odoo-update-files-{instance_name}.log'
-            }
+            # Se encola con la confirmación como entrada del script
+            log_file = f'/tmp/odoo-update-files-{instance_name}.log'
+            return self._submit_job(
+                'update_files',
+                instance_name,
+                ['/bin/bash', script_path],
+                log_file,
+                f'Actualización de archivos iniciada. Ver logs: {log_file}',
+                cwd=instance_path,
+                stdin_data='s\n'
+            )
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -914,6 +831,7 @@ echo "✅ Assets regenerados correctamente"
                 check=True,
                 timeout=30
             )
+            systemd_status.invalidate()
             return {'success': True, 'message': f'Instancia {instance_name} reiniciada'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -931,26 +849,17 @@ echo "✅ Assets regenerados correctamente"
             logger.info(f'Scripts regenerados para {instance_name}: {details}')
         
         try:
-            # Ejecutar script en background con log
-            with open(f'/tmp/odoo-sync-filestore-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
-            
-            return {
-                'success': True,
-                'message': f'Sincronización de filestore iniciada. Ver logs: /tmp/odoo-sync-filestore-{instance_name}.log',
-                'log_file': f'/tmp/odoo-sync-filestore-{instance_name}.log'
-            }
+            # Se encola con la confirmación como entrada del script
+            log_file = f'/tmp/odoo-sync-filestore-{instance_name}.log'
+            return self._submit_job(
+                'sync_filestore',
+                instance_name,
+                ['/bin/bash', script_path],
+                log_file,
+                f'Sincronización de filestore iniciada. Ver logs: {log_file}',
+                cwd=instance_path,
+                stdin_data='s\n'
+            )
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -967,25 +876,16 @@ echo "✅ Assets regenerados correctamente"
             logger.info(f'Scripts regenerados para {instance_name}: {details}')
         
         try:
-            # Ejecutar script en background con log
-            with open(f'/tmp/odoo-regenerate-assets-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
-            
-            return {
-                'success': True,
-                'message': f'Regeneración de assets iniciada. Ver logs: /tmp/odoo-regenerate-assets-{instance_name}.log',
-                'log_file': f'/tmp/odoo-regenerate-assets-{instance_name}.log'
-            }
+            # Se encola con la confirmación como entrada del script
+            log_file = f'/tmp/odoo-regenerate-assets-{instance_name}.log'
+            return self._submit_job(
+                'regenerate_assets',
+                instance_name,
+                ['/bin/bash', script_path],
+                log_file,
+                f'Regeneración de assets iniciada. Ver logs: {log_file}',
+                cwd=instance_path,
+                stdin_data='s\n'
+            )
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -0,0 +1,326 @@
+import logging
+import os
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+import psutil
+from sqlalchemy import func, select, insert
+
+from models import InstanceMetricsHistory
+from services.metrics_rollup import EPOCH
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_METRIC_FIELDS = ('cpu_percent', 'rss_mb', 'io_read_mb_s', 'io_write_mb_s', 'open_files', 'tcp_connections')
+
+
+def _unit_name(service):
+    return service if service.endswith('.service') else f'{service}.service'
+
+
+def _read_keyed_file(path):
+    """Lee archivos 'clave valor' de cgroup (cpu.stat, memory.stat)"""
+    values = {}
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                values[parts[0]] = int(parts[1])
+    return values
+
+
+def _read_io_stat(path):
+    """Suma rbytes/wbytes de todos los dispositivos en io.stat"""
+    read_bytes = write_bytes = 0
+    with open(path, 'r') as f:
+        for line in f:
+            for field in line.split()[1:]:
+                key, _, value = field.partition('=')
+                if key == 'rbytes':
+                    read_bytes += int(value)
+                elif key == 'wbytes':
+                    write_bytes += int(value)
+    return read_bytes, write_bytes
+
+
+def _count_open_files(pids):
+    """Cantidad de descriptores abiertos; None si no hay permisos para ninguno"""
+    total = 0
+    readable = False
+    for pid in pids:
+        try:
+            total += len(os.listdir(f'/proc/{pid}/fd'))
+            readable = True
+        except (FileNotFoundError, PermissionError, ProcessLookupError):
+            continue
+    return total if readable else None
+
+
+class InstanceMetricsCollector:
+    """
+    Consumo por instancia Odoo (CPU, RSS, IO, archivos abiertos, conexiones TCP).
+    Lee los contadores del cgroup v2 del servicio systemd; si no existe, suma el
+    árbol de procesos del MainPID con psutil. CPU e IO se reportan como tasas
+    respecto de la muestra anterior de la misma instancia.
+    """
+
+    def __init__(self):
+        self.cgroup_root = '/sys/fs/cgroup'
+        self.discovery_interval = 300
+        self._instances = []
+        self._discovered_at = 0.0
+        self._previous = {}
+        self._cpu_count = psutil.cpu_count() or 1
+
+    def configure(self, app):
+        self.cgroup_root = app.config.get('CGROUP_ROOT', '/sys/fs/cgroup')
+        self.discovery_interval = app.config.get('INSTANCE_METRICS_DISCOVERY_SECONDS', 300)
+
+    def discover(self, force=False):
+        """Refresca la lista de servicios a muestrear (requiere app context)"""
+        if not force and self._instances and time.monotonic() - self._discovered_at < self.discovery_interval:
+            return self._instances
+
+        from services.instance_manager import InstanceManager
+
+        instances = []
+        for instance in InstanceManager().list_instances():
+            if instance.get('service'):
+                instances.append((instance['name'], _unit_name(instance['service']), instance.get('port')))
+
+        self._instances = instances
+        self._discovered_at = time.monotonic()
+        names = {name for name, _unit, _port in instances}
+        self._previous = {name: value for name, value in self._previous.items() if name in names}
+        return instances
+
+    def collect(self):
+        """Toma una muestra de todas las instancias descubiertas; devuelve filas para insertar"""
+        if not self._instances:
+            return []
+
+        timestamp = datetime.utcnow()
+        connections = self._tcp_connections_by_port()
+
+        fallback_units = []
+        counters = {}
+        for name, unit, _port in self._instances:
+            cgroup_path = os.path.join(self.cgroup_root, 'system.slice', unit)
+            if os.path.exists(os.path.join(cgroup_path, 'cgroup.procs')):
+                counters[name] = self._read_cgroup(cgroup_path)
+            else:
+                fallback_units.append((name, unit))
+
+        if fallback_units:
+            main_pids = self._main_pids([unit for _name, unit in fallback_units])
+            for name, unit in fallback_units:
+                pid = main_pids.get(unit)
+                if pid:
+                    counters[name] = self._read_process_tree(pid)
+
+        now = time.monotonic()
+        rows = []
+        for name, _unit, port in self._instances:
+            sample = counters.get(name)
+            if sample is None:
+                continue
+
+            row = {
+                'timestamp': timestamp,
+                'instance_name': name,
+                'cpu_percent': None,
+                'rss_mb': round(sample['rss_bytes'] / (1024 ** 2), 2) if sample['rss_bytes'] is not None else None,
+                'io_read_mb_s': None,
+                'io_write_mb_s': None,
+                'open_files': sample['open_files'],
+                'tcp_connections': connections.get(port, 0) if port else None,
+            }
+
+            previous = self._previous.get(name)
+            if previous:
+                elapsed = now - previous['at']
+                if elapsed > 0 and sample['cpu_usec'] >= previous['cpu_usec']:
+                    cpu_seconds = (sample['cpu_usec'] - previous['cpu_usec']) / 1_000_000
+                    row['cpu_percent'] = round(cpu_seconds / (elapsed * self._cpu_count) * 100, 2)
+                if elapsed > 0 and sample['read_bytes'] is not None and previous['read_bytes'] is not None:
+                    # Un reinicio del servicio reinicia los contadores: se descarta ese tramo
+                    if sample['read_bytes'] >= previous['read_bytes'] and sample['write_bytes'] >= previous['write_bytes']:
+                        row['io_read_mb_s'] = round((sample['read_bytes'] - previous['read_bytes']) / elapsed / (1024 ** 2), 3)
+                        row['io_write_mb_s'] = round((sample['write_bytes'] - previous['write_bytes']) / elapsed / (1024 ** 2), 3)
+
+            self._previous[name] = {'at': now, **sample}
+            rows.append(row)
+
+        return rows
+
+    def _read_cgroup(self, cgroup_path):
+        try:
+            cpu_usec = _read_keyed_file(os.path.join(cgroup_path, 'cpu.stat')).get('usage_usec', 0)
+
+            # 'anon' excluye la caché de páginas (memory.current la incluye)
+            memory = _read_keyed_file(os.path.join(cgroup_path, 'memory.stat'))
+            rss_bytes = memory.get('anon')
+            if rss_bytes is None:
+                with open(os.path.join(cgroup_path, 'memory.current'), 'r') as f:
+                    rss_bytes = int(f.read().strip())
+
+            read_bytes = write_bytes = None
+            io_stat = os.path.join(cgroup_path, 'io.stat')
+            if os.path.exists(io_stat):
+                read_bytes, write_bytes = _read_io_stat(io_stat)
+
+            with open(os.path.join(cgroup_path, 'cgroup.procs'), 'r') as f:
+                pids = [int(line) for line in f if line.strip()]
+
+            return {
+                'cpu_usec': cpu_usec,
+                'rss_bytes': rss_bytes,
+                'read_bytes': read_bytes,
+                'write_bytes': write_bytes,
+                'open_files': _count_open_files(pids),
+            }
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer el cgroup {cgroup_path}: {e}")
+            return None
+
+    def _read_process_tree(self, main_pid):
+        try:
+            root = psutil.Process(main_pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+
+        sample = {'cpu_usec': 0, 'rss_bytes': 0, 'read_bytes': 0, 'write_bytes': 0, 'open_files': 0}
+        io_readable = fds_readable = True
+        for process in processes:
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_times()
+                    sample['cpu_usec'] += int((cpu.user + cpu.system) * 1_000_000)
+                    sample['rss_bytes'] += process.memory_info().rss
+                    try:
+                        io = process.io_counters()
+                        sample['read_bytes'] += io.read_bytes
+                        sample['write_bytes'] += io.write_bytes
+                    except (psutil.AccessDenied, AttributeError):
+                        io_readable = False
+                    try:
+                        sample['open_files'] += process.num_fds()
+                    except psutil.AccessDenied:
+                        fds_readable = False
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        if not io_readable:
+            sample['read_bytes'] = sample['write_bytes'] = None
+        if not fds_readable:
+            sample['open_files'] = None
+        return sample
+
+    def _main_pids(self, units):
+        """MainPID de varios servicios con una sola llamada a systemctl show"""
+        try:
+            result = subprocess.run(
+                ['/usr/bin/systemctl', 'show', '-p', 'Id', '-p', 'MainPID', *units],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+        except Exception as e:
+            logger.warning(f"Error obteniendo MainPID de servicios Odoo: {e}")
+            return {}
+
+        pids = {}
+        unit = None
+        for line in result.stdout.splitlines():
+            key, _, value = line.partition('=')
+            if key == 'Id':
+                unit = value
+            elif key == 'MainPID' and unit and value.isdigit() and int(value) > 0:
+                pids[unit] = int(value)
+        return pids
+
+    def _tcp_connections_by_port(self):
+        """Conexiones TCP establecidas por puerto local (una sola lectura para todas las instancias)"""
+        counts = {}
+        try:
+            for connection in psutil.net_connections(kind='tcp'):
+                if connection.status == psutil.CONN_ESTABLISHED and connection.laddr:
+                    port = connection.laddr.port
+                    counts[port] = counts.get(port, 0) + 1
+        except psutil.Error as e:
+            logger.warning(f"No se pudieron listar las conexiones TCP: {e}")
+        return counts
+
+
+def store_instance_samples(session, rows):
+    if rows:
+        session.execute(insert(InstanceMetricsHistory.__table__), rows)
+
+
+def prune_instance_metrics(session, retention_days, now=None):
+    now = now or datetime.utcnow()
+    deleted = InstanceMetricsHistory.query.filter(
+        InstanceMetricsHistory.timestamp < now - timedelta(days=retention_days)
+    ).delete(synchronize_session=False)
+    session.commit()
+    return deleted
+
+
+def query_instance_history(session, instance_name, start_time, end_time, max_points):
+    """Historial de una instancia reducido en PostgreSQL a `max_points` buckets"""
+    table = InstanceMetricsHistory.__table__
+    ts = table.c.timestamp
+
+    start_epoch = (start_time - EPOCH).total_seconds()
+    end_epoch = (end_time - EPOCH).total_seconds() + 1
+    bucket = func.width_bucket(func.extract('epoch', ts), start_epoch, end_epoch, max_points).label('bucket')
+
+    selected = [bucket, func.min(ts).label('timestamp')]
+    selected += [func.avg(table.c[field]).label(field) for field in INSTANCE_METRIC_FIELDS]
+
+    stmt = select(*selected).where(
+        table.c.instance_name == instance_name,
+        ts >= start_time,
+        ts <= end_time
+    ).group_by(bucket).order_by(bucket)
+
+    points = []
+    for row in session.execute(stmt):
+        point = dict(row._mapping)
+        point.pop('bucket')
+        for field in INSTANCE_METRIC_FIELDS:
+            if point[field] is not None:
+                point[field] = float(point[field])
+        points.append(point)
+    return points
+
+
+def top_instances(session, metric, since, limit, allowed_instances=None):
+    """Instancias con mayor promedio de `metric` desde `since`"""
+    table = InstanceMetricsHistory.__table__
+    averages = [func.avg(table.c[field]).label(field) for field in INSTANCE_METRIC_FIELDS]
+
+    stmt = select(table.c.instance_name, func.max(table.c.timestamp).label('last_sample'), *averages).where(
+        table.c.timestamp >= since
+    )
+    if allowed_instances is not None:
+        stmt = stmt.where(table.c.instance_name.in_(allowed_instances))
+
+    order = func.avg(table.c[metric])
+    stmt = stmt.group_by(table.c.instance_name).order_by(order.desc().nulls_last()).limit(limit)
+
+    results = []
+    for row in session.execute(stmt):
+        item = dict(row._mapping)
+        item['last_sample'] = item['last_sample'].isoformat() if item['last_sample'] else None
+        for field in INSTANCE_METRIC_FIELDS:
+            if item[field] is not None:
+                item[field] = round(float(item[field]), 2)
+        results.append(item)
+    return results
+
+
+# Instancia global: la usa el proceso que persiste métricas
+instance_metrics_collector = InstanceMetricsCollector()
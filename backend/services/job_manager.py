@@ -0,0 +1,401 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import re
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services.job_scheduler import admission_controller, priority_value, HEAVY_KINDS
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINAL_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Los scripts pueden informar avance imprimiendo "##PROGRESS <0-100> [mensaje]"
+PROGRESS_REGEX = re.compile(rb'^##PROGRESS\s+(\d{1,3})(?:[ \t]+([^\r\n]*))?', re.M)
+PROGRESS_READ_BYTES = 64 * 1024
+
+# El wrapper deja el exit code en un archivo: si Flask se reinicia, el próximo líder lo recupera
+JOB_WRAPPER = '"${@:2}"; echo $? > "$1"'
+CANCEL_GRACE_SECONDS = 30  # SIGTERM al grupo de procesos y, si sigue vivo, SIGKILL
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def submit_job(kind, command, instance_name=None, resource=None, log_file=None, cwd=None,
+               stdin_data=None, priority_class=None):
+    """
+    Encola un job (desde cualquier worker) y devuelve (job, creado). Si ya hay
+    un job activo del mismo tipo para la instancia se devuelve ése (creado=False)
+    para no pisar su log. Lo arranca el proceso líder del job manager.
+    `priority_class` (high/medium/low) ordena la cola y fija los pesos de CPU/IO.
+    """
+    from models import db, Job
+
+    existing = Job.query.filter(
+        Job.kind == kind,
+        Job.instance_name == instance_name,
+        Job.status.in_(ACTIVE_STATUSES),
+    ).first()
+    if existing:
+        return existing, False
+
+    job = Job(
+        kind=kind,
+        instance_name=instance_name,
+        resource=resource or instance_name or kind,
+        command=json.dumps(command),
+        cwd=cwd,
+        stdin_data=stdin_data,
+        log_file=log_file,
+        priority=priority_value(kind, priority_class),
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    if log_file:
+        # Los endpoints de logs existentes leen este archivo: se crea ya con el estado en cola
+        with open(log_file, 'w') as f:
+            f.write(f'⏳ En cola (job #{job.id})\n')
+
+    job_manager.wake()
+    return job, True
+
+
+def cancel_job(job_id):
+    """Cancela un job: si está en cola no se ejecuta; si está corriendo el líder termina su grupo de procesos"""
+    from models import db, Job
+
+    cancelled = Job.query.filter_by(id=job_id, status='queued').update(
+        {'status': 'cancelled', 'cancel_requested': True, 'finished_at': datetime.utcnow()},
+        synchronize_session=False,
+    )
+    if not cancelled:
+        Job.query.filter_by(id=job_id, status='running').update({'cancel_requested': True}, synchronize_session=False)
+    db.session.commit()
+    job_manager.wake()
+    return Job.query.get(job_id)
+
+
+def latest_job(instance_name, kinds):
+    """Último job de `kinds` para la instancia (o None)"""
+    from models import Job
+
+    return Job.query.filter(Job.instance_name == instance_name, Job.kind.in_(kinds)) \
+        .order_by(Job.id.desc()).first()
+
+
+def job_summary(job):
+    """Resultado para los endpoints que lanzan operaciones"""
+    return {
+        'job_id': job.id,
+        'job_status': job.status,
+        'queued': job.status == 'queued',
+    }
+
+
+class JobManager:
+    """
+    Ejecuta los jobs encolados en la tabla `jobs` con un pool acotado:
+    como máximo `max_concurrent` a la vez y uno por recurso (instancia).
+    Sólo un proceso (el que obtiene el lock de archivo) despacha y vigila
+    los jobs; el resto de los workers sólo encola. Cada job corre en su
+    propia sesión, de modo que un reinicio de Flask no lo interrumpe (bajo
+    systemd, siempre que la unidad use `KillMode=process`: ver deploy.sh): el
+    nuevo líder lo vuelve a vigilar por pid y toma el exit code del archivo
+    que deja el wrapper.
+    """
+
+    def __init__(self):
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._app = None
+        self._lock_fd = None
+        self._processes = {}  # job_id -> Popen de los jobs lanzados por este proceso
+        self._cancel_sent = {}  # job_id -> momento del SIGTERM
+        self._last_prune_at = 0.0
+        self.max_concurrent = 2
+        self.poll_interval = 1
+        self.retention_days = 30
+        self.jobs_dir = tempfile.gettempdir()
+
+    def ensure_started(self, app):
+        """Arranca el hilo del job manager una sola vez por proceso"""
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            self._app = app
+            self.max_concurrent = max(1, app.config.get('JOBS_MAX_CONCURRENT', 2))
+            self.poll_interval = max(0.2, app.config.get('JOBS_POLL_SECONDS', 1))
+            self.retention_days = app.config.get('JOBS_RETENTION_DAYS', 30)
+            admission_controller.configure(app)
+            jobs_dir = app.config.get('JOBS_DIR')
+            try:
+                os.makedirs(jobs_dir, exist_ok=True)
+                self.jobs_dir = jobs_dir
+            except (OSError, TypeError):
+                logger.warning(f"No se pudo usar JOBS_DIR={jobs_dir}; se usa {self.jobs_dir}")
+
+            self._thread = threading.Thread(target=self._run, name='job-manager', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info(f"Job manager iniciado (máximo {self.max_concurrent} jobs en paralelo)")
+
+    def stop(self):
+        """Detiene el hilo; los jobs en curso siguen corriendo y los retoma el próximo líder"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self._acquire_leader_lock():
+                    with self._app.app_context():
+                        self._tick()
+            except Exception as e:
+                logger.error(f"Error en el job manager: {e}")
+                self._rollback()
+
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _rollback(self):
+        try:
+            from models import db
+            with self._app.app_context():
+                db.session.rollback()
+        except Exception:
+            pass
+
+    def _acquire_leader_lock(self):
+        """Intenta obtener el lock exclusivo de despacho entre workers"""
+        if self._lock_fd is not None:
+            return True
+
+        lock_dir = self._app.config.get('DATA_PATH') if self._app else None
+        if not lock_dir or not os.path.isdir(lock_dir):
+            lock_dir = tempfile.gettempdir()
+
+        fd = os.open(os.path.join(lock_dir, 'job-manager.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        logger.info(f"Job manager: este proceso (pid {os.getpid()}) despacha los jobs")
+        return True
+
+    def _tick(self):
+        from models import db, Job
+
+        for job in Job.query.filter_by(status='running').all():
+            self._check_running(job)
+        db.session.commit()
+
+        self._dispatch()
+        db.session.commit()
+
+        if time.monotonic() - self._last_prune_at >= PRUNE_INTERVAL_SECONDS:
+            self._last_prune_at = time.monotonic()
+            self._prune()
+
+    def _dispatch(self):
+        """
+        Arranca jobs en cola por prioridad mientras haya lugar en el pool, el
+        recurso esté libre y (para los pesados) el host admita más carga.
+        """
+        from models import db, Job
+
+        running = Job.query.filter_by(status='running').all()
+        busy = {job.resource for job in running}
+        heavy_running = any(job.kind in HEAVY_KINDS for job in running)
+        slots = self.max_concurrent - len(running)
+        if slots <= 0:
+            return
+
+        queued = Job.query.filter_by(status='queued') \
+            .order_by(Job.priority.desc(), Job.created_at.asc(), Job.id.asc()).limit(200).all()
+        for job in queued:
+            if slots <= 0:
+                break
+            if job.resource in busy:
+                continue
+
+            admitted, reason = admission_controller.check(job, heavy_running)
+            if not admitted:
+                job.progress_message = reason  # Visible en /api/jobs mientras espera
+                continue
+
+            job.progress_message = None
+            if self._start(job):
+                busy.add(job.resource)
+                heavy_running = heavy_running or job.kind in HEAVY_KINDS
+                slots -= 1
+            db.session.commit()  # Pid registrado apenas arranca: si este proceso muere, el próximo líder lo retoma
+
+    def _exit_file(self, job_id):
+        return os.path.join(self.jobs_dir, f'job-{job_id}.exit')
+
+    def _start(self, job):
+        exit_file = self._exit_file(job.id)
+        if os.path.exists(exit_file):
+            os.remove(exit_file)
+
+        log = open(job.log_file, 'a') if job.log_file else open(os.devnull, 'w')
+        try:
+            process = subprocess.Popen(
+                ['/bin/bash', '-c', JOB_WRAPPER, f'job-{job.id}', exit_file]
+                + admission_controller.launcher(job) + json.loads(job.command),
+                stdin=subprocess.PIPE if job.stdin_data else subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                cwd=job.cwd or None,
+                start_new_session=True,  # Grupo propio: sobrevive a Flask y se cancela con killpg
+                text=True,
+            )
+        except Exception as e:
+            job.status = 'failed'
+            job.error = f'No se pudo iniciar: {e}'
+            job.finished_at = datetime.utcnow()
+            logger.error(f"Job #{job.id} ({job.kind}) no se pudo iniciar: {e}")
+            return False
+        finally:
+            log.close()
+
+        if job.stdin_data:
+            try:
+                process.stdin.write(job.stdin_data)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        job.status = 'running'
+        job.pid = process.pid
+        job.started_at = datetime.utcnow()
+        self._processes[job.id] = process
+        logger.info(f"Job #{job.id} ({job.kind} {job.instance_name or ''}) iniciado, pid {process.pid}")
+        return True
+
+    def _is_alive(self, job):
+        """Proceso de un job lanzado por otro líder: se verifica por /proc (y que sea el mismo wrapper)"""
+        if not job.pid:
+            return False
+        try:
+            with open(f'/proc/{job.pid}/cmdline', 'rb') as f:
+                cmdline = f.read()
+        except OSError:
+            return False
+        return self._exit_file(job.id).encode() in cmdline
+
+    def _check_running(self, job):
+        process = self._processes.get(job.id)
+        if process is not None:
+            alive = process.poll() is None
+        else:
+            alive = self._is_alive(job)
+
+        if alive:
+            if job.cancel_requested:
+                self._terminate(job)
+            self._update_progress(job)
+            return
+
+        self._processes.pop(job.id, None)
+        self._cancel_sent.pop(job.id, None)
+        self._finish(job)
+
+    def _terminate(self, job):
+        sent_at = self._cancel_sent.get(job.id)
+        if sent_at is not None and time.monotonic() - sent_at < CANCEL_GRACE_SECONDS:
+            return
+
+        sig = signal.SIGTERM if sent_at is None else signal.SIGKILL
+        try:
+            os.killpg(job.pid, sig)
+        except ProcessLookupError:
+            return
+        except OSError as e:
+            logger.error(f"No se pudo cancelar el job #{job.id}: {e}")
+            return
+        self._cancel_sent[job.id] = time.monotonic()
+        logger.info(f"Job #{job.id} cancelado ({sig.name})")
+
+    def _finish(self, job):
+        exit_code = None
+        exit_file = self._exit_file(job.id)
+        try:
+            with open(exit_file, 'r') as f:
+                exit_code = int(f.read().strip())
+            os.remove(exit_file)
+        except (OSError, ValueError):
+            exit_code = None
+
+        self._update_progress(job)
+        job.exit_code = exit_code
+        job.finished_at = datetime.utcnow()
+        if job.cancel_requested:
+            job.status = 'cancelled'
+        elif exit_code == 0:
+            job.status = 'succeeded'
+            job.progress = 100
+        else:
+            job.status = 'failed'
+            job.error = job.error or (
+                f'El proceso terminó con código {exit_code}' if exit_code is not None
+                else 'El proceso terminó sin código de salida (interrumpido)'
+            )
+        logger.info(f"Job #{job.id} ({job.kind}) {job.status}")
+
+    def _update_progress(self, job):
+        """Último "##PROGRESS" del final del log"""
+        if not job.log_file:
+            return
+        try:
+            with open(job.log_file, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                f.seek(max(0, size - PROGRESS_READ_BYTES))
+                tail = f.read()
+        except OSError:
+            return
+
+        matches = PROGRESS_REGEX.findall(tail)
+        if not matches:
+            return
+        value, message = matches[-1]
+        job.progress = min(100, int(value))
+        job.progress_message = message.decode(errors='replace').strip()[:255] or None
+
+    def _prune(self):
+        from models import db, Job
+
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        try:
+            Job.query.filter(Job.status.in_(FINAL_STATUSES), Job.finished_at < cutoff) \
+                .delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error aplicando retención de jobs: {e}")
+
+
+# Instancia global (una por proceso)
+job_manager = JobManager()
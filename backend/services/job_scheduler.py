@@ -0,0 +1,188 @@
+import logging
+import os
+import shutil
+import subprocess
+import time
+from datetime import datetime
+
+from services.system_monitor import SystemMonitor
+
+logger = logging.getLogger(__name__)
+
+# Clases de prioridad (las mismas que el campo `priority` de la config de backups).
+# `priority` ordena la cola; los pesos de cgroup y nice/ionice reparten CPU e IO
+# entre jobs y frente a los servicios de Odoo (peso por defecto de systemd: 100).
+PRIORITY_CLASSES = {
+    'high': {'priority': 30, 'weight': 100, 'nice': 0, 'ionice': 2},
+    'medium': {'priority': 20, 'weight': 50, 'nice': 5, 'ionice': 4},
+    'low': {'priority': 10, 'weight': 20, 'nice': 10, 'ionice': 7},
+}
+DEFAULT_PRIORITY_CLASS = 'medium'
+
+# Operaciones con un usuario esperando van antes que los backups normales
+KIND_PRIORITY_CLASS = {
+    'restore_backup': 'high',
+    'create_prod': 'high',
+    'create_dev': 'medium',
+    'update_db': 'medium',
+    'update_files': 'medium',
+    'sync_filestore': 'medium',
+    'regenerate_assets': 'medium',
+    'create_backup': 'medium',
+    'export_snapshot': 'medium',
+    'pitr_base': 'medium',
+    'pitr_restore': 'medium',
+    'reconcile_backups': 'low',
+    'collect_blobs': 'low',
+}
+
+# Operaciones pesadas (pg_dump, restore, clonado, copia de filestore): pasan por el control de admisión
+HEAVY_KINDS = ('create_dev', 'create_prod', 'update_db', 'sync_filestore', 'create_backup', 'restore_backup',
+               'export_snapshot', 'pitr_base', 'pitr_restore')
+
+LOAD_REFRESH_SECONDS = 5  # Ventana mínima para medir iowait
+
+
+def priority_class_for(kind, priority_class=None):
+    """Clase explícita (p. ej. la `priority` de la config de backups) o la del tipo de job"""
+    if priority_class in PRIORITY_CLASSES:
+        return priority_class
+    return KIND_PRIORITY_CLASS.get(kind, DEFAULT_PRIORITY_CLASS)
+
+
+def priority_value(kind, priority_class=None):
+    return PRIORITY_CLASSES[priority_class_for(kind, priority_class)]['priority']
+
+
+def class_for_priority(value):
+    """Clase de un job a partir de su prioridad numérica"""
+    for name, settings in sorted(PRIORITY_CLASSES.items(), key=lambda item: -item[1]['priority']):
+        if (value or 0) >= settings['priority']:
+            return name
+    return 'low'
+
+
+class AdmissionController:
+    """
+    Decide si un job pesado puede arrancar según el estado del host: carga
+    por CPU, iowait y espacio libre en el disco donde escribe. Después de
+    admitir uno espera `settle_seconds` antes del siguiente, para que la
+    medición refleje la carga que agregó. Un job que espera más de
+    `max_wait_seconds` arranca igual si no hay otro pesado corriendo (salvo
+    por falta de disco), para que la carga propia de Odoo no lo deje en cola
+    para siempre. También arma el prefijo que corre el job con pesos de
+    cgroup (`systemd-run --scope`) o, si no se puede, con nice/ionice.
+    """
+
+    def __init__(self):
+        self.monitor = SystemMonitor()
+        self.max_load_per_cpu = 1.5
+        self.max_iowait_percent = 20.0
+        self.min_free_disk_gb = 10.0
+        self.settle_seconds = 30
+        self.max_wait_seconds = 1800
+        self.cgroup_weights = True
+        self.paths = {}
+        self._load = None
+        self._load_at = 0.0
+        self._last_admitted_at = 0.0
+        self._launcher = None
+
+    def configure(self, app):
+        self.max_load_per_cpu = app.config.get('JOBS_MAX_LOAD_PER_CPU', 1.5)
+        self.max_iowait_percent = app.config.get('JOBS_MAX_IOWAIT_PERCENT', 20.0)
+        self.min_free_disk_gb = app.config.get('JOBS_MIN_FREE_DISK_GB', 10.0)
+        self.settle_seconds = app.config.get('JOBS_ADMISSION_SETTLE_SECONDS', 30)
+        self.max_wait_seconds = app.config.get('JOBS_ADMISSION_MAX_WAIT_SECONDS', 1800)
+        self.cgroup_weights = app.config.get('JOBS_CGROUP_WEIGHTS', True)
+
+        # Disco donde escribe cada tipo de job
+        backups = app.config.get('BACKUPS_PATH')
+        self.paths = {
+            'create_backup': backups,
+            'restore_backup': backups,
+            'export_snapshot': backups,
+            'pitr_base': app.config.get('BACKUP_PITR_PATH'),
+            'pitr_restore': app.config.get('BACKUP_PITR_RESTORE_DIR'),
+            'create_dev': app.config.get('DEV_ROOT'),
+            'update_db': app.config.get('DEV_ROOT'),
+            'sync_filestore': app.config.get('DEV_ROOT'),
+            'create_prod': app.config.get('PROD_ROOT'),
+        }
+        self.monitor.get_load_info()  # La primera medición de iowait sólo inicializa los contadores
+
+    def _host_load(self):
+        if self._load is None or time.monotonic() - self._load_at >= LOAD_REFRESH_SECONDS:
+            self._load = self.monitor.get_load_info()
+            self._load_at = time.monotonic()
+        return self._load
+
+    def check(self, job, heavy_running):
+        """(admitido, motivo de espera) para un job en cola"""
+        if job.kind not in HEAVY_KINDS:
+            return True, None
+
+        path = self.paths.get(job.kind)
+        if path:
+            free_gb = self.monitor.get_free_disk_gb(path)
+            if free_gb < self.min_free_disk_gb:
+                return False, f'En espera: poco espacio libre ({free_gb} GB en {path})'
+
+        if time.monotonic() - self._last_admitted_at < self.settle_seconds:
+            return False, 'En espera: otra operación pesada acaba de iniciar'
+
+        waited = (datetime.utcnow() - job.created_at).total_seconds() if job.created_at else 0
+        starving = not heavy_running and waited >= self.max_wait_seconds
+
+        load = self._host_load()
+        if not starving:
+            if load['load_per_cpu'] > self.max_load_per_cpu:
+                return False, f"En espera: carga alta ({load['load_1']} con {load['cpu_count']} CPUs)"
+            if load['iowait_percent'] > self.max_iowait_percent:
+                return False, f"En espera: IO saturado (iowait {load['iowait_percent']}%)"
+
+        self._last_admitted_at = time.monotonic()
+        return True, None
+
+    def launcher(self, job):
+        """Prefijo del comando según la clase de prioridad del job"""
+        settings = PRIORITY_CLASSES[class_for_priority(job.priority)]
+        if self._launcher is None:
+            self._launcher = self._detect_launcher()
+
+        if self._launcher == 'systemd-run':
+            command = ['systemd-run', '--scope', '--quiet', '--collect']
+            if os.geteuid() != 0:
+                command.append('--user')
+            return command + [
+                '-p', f"CPUWeight={settings['weight']}",
+                '-p', f"IOWeight={settings['weight']}",
+                '--',
+            ]
+        if self._launcher == 'nice':
+            return ['nice', '-n', str(settings['nice']), 'ionice', '-c', '2', '-n', str(settings['ionice'])]
+        return []
+
+    def _detect_launcher(self):
+        """systemd-run si se pueden crear scopes (se prueba una vez), si no nice/ionice"""
+        if self.cgroup_weights and shutil.which('systemd-run'):
+            probe = ['systemd-run', '--scope', '--quiet', '--collect']
+            if os.geteuid() != 0:
+                probe.append('--user')
+            try:
+                result = subprocess.run(probe + ['-p', 'CPUWeight=100', '--', '/bin/true'],
+                                        capture_output=True, text=True, timeout=10)
+                if result.returncode == 0:
+                    logger.info("Jobs: se ejecutan con pesos de cgroup (systemd-run --scope)")
+                    return 'systemd-run'
+                logger.warning(f"Jobs: systemd-run no disponible ({result.stderr.strip()}); se usa nice/ionice")
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logger.warning(f"Jobs: systemd-run no disponible ({e}); se usa nice/ionice")
+
+        if shutil.which('nice') and shutil.which('ionice'):
+            return 'nice'
+        return 'none'
+
+
+# Instancia global (una por proceso)
+admission_controller = AdmissionController()
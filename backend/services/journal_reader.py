@@ -0,0 +1,368 @@
+import json
+import logging
+import queue
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from services.odoo_log_reader import parse_log_line, LOG_LINE_REGEX
+
+logger = logging.getLogger(__name__)
+
+try:
+    from systemd import journal as systemd_journal
+except ImportError:  # python3-systemd es opcional: sin él se usa `journalctl -o json`
+    systemd_journal = None
+
+JOURNALCTL = '/usr/bin/journalctl'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+FOLLOW_QUEUE_ENTRIES = 5000  # Entradas leídas y no enviadas: con la cola llena journalctl espera
+
+# PRIORITY de syslog -> niveles que usa el visor
+PRIORITY_LEVELS = {0: 'CRITICAL', 1: 'CRITICAL', 2: 'CRITICAL', 3: 'ERROR', 4: 'WARNING', 5: 'INFO', 6: 'INFO', 7: 'DEBUG'}
+
+
+def unit_name(service):
+    return service if service.endswith('.service') else f'{service}.service'
+
+
+def _format_timestamp(usec):
+    moment = datetime.fromtimestamp(usec / 1_000_000)
+    return f"{moment.strftime(TIMESTAMP_FORMAT)},{moment.microsecond // 1000:03d}"
+
+
+def to_log_line(entry):
+    """
+    Entrada del journal -> formato de línea del visor. Si el mensaje es una
+    línea de Odoo (stdout al journal) se usan su nivel, base y logger; si no,
+    el nivel sale de PRIORITY y el logger de SYSLOG_IDENTIFIER.
+    """
+    message = entry['message']
+    if LOG_LINE_REGEX.match(message):
+        parsed = parse_log_line(message)
+    else:
+        parsed = {
+            'timestamp': _format_timestamp(entry['realtime_usec']),
+            'pid': str(entry['pid'] or ''),
+            'level': PRIORITY_LEVELS.get(entry['priority'], 'INFO'),
+            'database': '',
+            'logger': entry['identifier'] or 'systemd',
+            'message': message,
+            'raw': message,
+        }
+    parsed['priority'] = entry['priority']
+    parsed['cursor'] = entry['cursor']
+    return parsed
+
+
+def _decode_message(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, list):  # journalctl -o json: mensajes binarios como lista de bytes
+        return bytes(value).decode('utf-8', errors='replace')
+    return '' if value is None else str(value)
+
+
+def _int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class NativeJournal:
+    """Lectura con python-systemd (sd-journal): seek por cursor y por tiempo sin subprocesos"""
+
+    def __init__(self, unit):
+        self.reader = systemd_journal.Reader()
+        self.reader.add_match(_SYSTEMD_UNIT=unit)
+
+    def close(self):
+        self.reader.close()
+
+    @staticmethod
+    def _normalize(entry):
+        realtime = entry.get('__REALTIME_TIMESTAMP')
+        return {
+            'cursor': entry.get('__CURSOR'),
+            'realtime_usec': int(realtime.timestamp() * 1_000_000) if realtime else 0,
+            'priority': _int(entry.get('PRIORITY'), 6),
+            'pid': entry.get('_PID'),
+            'identifier': entry.get('SYSLOG_IDENTIFIER'),
+            'message': _decode_message(entry.get('MESSAGE')),
+        }
+
+    def iter_backward(self, before=None, until=None):
+        if before:
+            self.reader.seek_cursor(before)
+        elif until:
+            self.reader.seek_realtime(until)
+        else:
+            self.reader.seek_tail()
+
+        while True:
+            entry = self.reader.get_previous()
+            if not entry:
+                return
+            if before and entry.get('__CURSOR') == before:
+                continue  # seek_cursor se posiciona sobre la entrada del cursor
+            yield self._normalize(entry)
+
+    def iter_forward(self, after=None):
+        if after:
+            self.reader.seek_cursor(after)
+        else:
+            self.reader.seek_tail()
+            self.reader.get_previous()
+
+        while True:
+            entry = self.reader.get_next()
+            if not entry:
+                return
+            if after and entry.get('__CURSOR') == after:
+                continue
+            yield self._normalize(entry)
+
+    def wait(self, timeout):
+        self.reader.wait(timeout)
+
+
+class JournalctlJournal:
+    """Respaldo sin python-systemd: `journalctl -o json` leído en streaming (se corta al juntar lo necesario)"""
+
+    def __init__(self, unit, timeout=10):
+        self.unit = unit
+        self.timeout = timeout
+        self._process = None
+
+    def close(self):
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+
+    @staticmethod
+    def _normalize(entry):
+        return {
+            'cursor': entry.get('__CURSOR'),
+            'realtime_usec': _int(entry.get('__REALTIME_TIMESTAMP'), 0),
+            'priority': _int(entry.get('PRIORITY'), 6),
+            'pid': _int(entry.get('_PID')),
+            'identifier': entry.get('SYSLOG_IDENTIFIER'),
+            'message': _decode_message(entry.get('MESSAGE')),
+        }
+
+    def _stream(self, args):
+        self.close()
+        self._process = subprocess.Popen(
+            [JOURNALCTL, '--no-pager', '-o', 'json', f'_SYSTEMD_UNIT={self.unit}'] + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.timeout
+        try:
+            for line in self._process.stdout:
+                if time.monotonic() > deadline:
+                    logger.warning(f"journalctl excedió {self.timeout}s leyendo {self.unit}")
+                    return
+                try:
+                    yield self._normalize(json.loads(line))
+                except ValueError:
+                    continue
+        finally:
+            self.close()
+
+    def iter_backward(self, before=None, until=None):
+        args = ['--reverse']
+        if before:
+            args += ['--cursor', before]
+        elif until:
+            args += ['--until', until.strftime(TIMESTAMP_FORMAT)]
+
+        for entry in self._stream(args):
+            if before and entry['cursor'] == before:
+                continue
+            yield entry
+
+
+
+def open_journal(service, timeout=10):
+    """Lector del journal filtrado por `_SYSTEMD_UNIT` (nativo si python-systemd está instalado)"""
+    unit = unit_name(service)
+    if systemd_journal is not None:
+        try:
+            return NativeJournal(unit)
+        except Exception as e:
+            logger.warning(f"No se pudo abrir el journal nativo, se usa journalctl: {e}")
+    return JournalctlJournal(unit, timeout)
+
+
+def _matches(line, level, search):
+    if level and line['level'] != level:
+        return False
+    if search and search not in line['raw'].lower():
+        return False
+    return True
+
+
+def read_page(service, limit, before=None, since=None, until=None, level=None, search=None,
+              max_scan=50000, timeout=10):
+    """
+    Últimas `limit` entradas que cumplen los filtros, leyendo hacia atrás desde
+    `before` (cursor) o `until`. Se detiene al juntar `limit`, al pasar `since`
+    o al revisar `max_scan` entradas. Devuelve líneas en orden cronológico con
+    'before' (para cargar anteriores) y 'follow' (cursor de la más nueva leída).
+    """
+    search = search.lower() if search else None
+    since_usec = since.timestamp() * 1_000_000 if since else None
+
+    journal = open_journal(service, timeout)
+    lines = []
+    newest_cursor = None
+    oldest_cursor = None
+    scanned = 0
+    more = False
+    try:
+        for entry in journal.iter_backward(before=before, until=until):
+            if since_usec is not None and entry['realtime_usec'] < since_usec:
+                break
+
+            scanned += 1
+            newest_cursor = newest_cursor or entry['cursor']
+            oldest_cursor = entry['cursor']
+
+            line = to_log_line(entry)
+            if _matches(line, level, search):
+                lines.append(line)
+
+            if len(lines) >= limit or scanned >= max_scan:
+                more = True
+                break
+    finally:
+        journal.close()
+
+    lines.reverse()
+    return {
+        'lines': lines,
+        'scanned': scanned,
+        'before': oldest_cursor if more else None,
+        # Sin `before` la página termina en la entrada más nueva: se puede seguir desde ahí
+        'follow': newest_cursor if not before and not until else None,
+    }
+
+
+def read_after(journal, after, limit=500, level=None, search=None):
+    """Entradas posteriores a `after` (modo seguimiento); devuelve (líneas, cursor)"""
+    if not after:
+        # Sin cursor se empieza desde la entrada más nueva
+        newest = next(journal.iter_backward(), None)
+        return [], newest['cursor'] if newest else None
+
+    search = search.lower() if search else None
+    lines = []
+    cursor = after
+    for entry in journal.iter_forward(after=after):
+        cursor = entry['cursor']
+        line = to_log_line(entry)
+        if _matches(line, level, search):
+            lines.append(line)
+        if len(lines) >= limit:
+            break
+    return lines, cursor
+
+
+class NativeFollower:
+    """Seguimiento con python-systemd: lee desde el cursor y espera cambios del journal"""
+
+    def __init__(self, journal, after=None):
+        self.journal = journal
+        self.cursor = after
+        self.ended = False
+
+    def close(self):
+        self.journal.close()
+
+    def poll(self, timeout, limit=500, level=None, search=None):
+        lines, self.cursor = read_after(self.journal, self.cursor, limit, level, search)
+        if not lines:
+            self.journal.wait(timeout)
+        return lines
+
+
+class JournalctlFollower:
+    """
+    Seguimiento sin python-systemd: un solo `journalctl -f -o json` por stream.
+    Un hilo pasa su salida a una cola para poder esperar con timeout.
+    """
+
+    def __init__(self, unit, after=None):
+        self.unit = unit
+        self.cursor = after
+        self.ended = False
+        self._closed = False
+        self._entries = queue.Queue(maxsize=FOLLOW_QUEUE_ENTRIES)
+        args = ['--after-cursor', after] if after else ['-n', '0']
+        self._process = subprocess.Popen(
+            [JOURNALCTL, '--no-pager', '--follow', '-o', 'json', f'_SYSTEMD_UNIT={unit}'] + args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._reader = threading.Thread(target=self._read_output, name=f'journal-follow-{unit}', daemon=True)
+        self._reader.start()
+
+    def _put(self, entry):
+        while not self._closed:
+            try:
+                self._entries.put(entry, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _read_output(self):
+        for line in self._process.stdout:
+            try:
+                self._put(JournalctlJournal._normalize(json.loads(line)))
+            except ValueError:
+                continue
+        self._put(None)  # journalctl terminó
+
+    def close(self):
+        self._closed = True
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._reader.join(timeout=2)
+        if not self._reader.is_alive():
+            self._process.stdout.close()
+
+    def poll(self, timeout, limit=500, level=None, search=None):
+        """Líneas nuevas que cumplen los filtros; espera hasta `timeout` por la primera entrada"""
+        search = search.lower() if search else None
+        lines = []
+        block = True
+        while len(lines) < limit:
+            try:
+                entry = self._entries.get(block, timeout)
+            except queue.Empty:
+                break
+            block = False
+            if entry is None:
+                self.ended = True
+                break
+            self.cursor = entry['cursor']
+            line = to_log_line(entry)
+            if _matches(line, level, search):
+                lines.append(line)
+        return lines
+
+
+def follow_journal(service, after=None):
+    """Seguimiento de la unidad desde el cursor `after` (sin cursor, desde la entrada más nueva)"""
+    unit = unit_name(service)
+    if systemd_journal is not None:
+        try:
+            return NativeFollower(NativeJournal(unit), after)
+        except Exception as e:
+            logger.warning(f"No se pudo abrir el journal nativo, se usa journalctl: {e}")
+    return JournalctlFollower(unit, after)
@@ -0,0 +1,264 @@
+import logging
+import os
+import select
+import threading
+
+from config import Config
+from services.fs_watch import (
+    InotifyWatcher,
+    IN_MODIFY,
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+)
+from services.odoo_log_reader import parse_log_line
+
+logger = logging.getLogger(__name__)
+
+# Se vigila el directorio (no el inode) para seguir el archivo a través de rotaciones
+FOLLOW_DIR_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+MAX_READ_BYTES = 256 * 1024  # Por cliente y por vuelta; el resto sale en la siguiente
+
+
+class FollowedFile:
+    """Archivo seguido por uno o más clientes; `seq` avanza con cada cambio"""
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.seq = 0
+        self.subscribers = 0
+        self.changed = threading.Condition()
+
+    def notify(self):
+        with self.changed:
+            self.seq += 1
+            self.changed.notify_all()
+
+
+class LogFollower:
+    """
+    Un solo watcher inotify por proceso para todos los clientes que siguen
+    logs: se vigila cada directorio una vez (con contador de referencias) y
+    un hilo despierta a los clientes del archivo que cambió. Cada cliente lee
+    sólo los bytes agregados desde su propio cursor (ver LogTail).
+    Sin inotify los clientes revisan por stat cada `poll_interval` segundos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._dirs = {}
+        self._watcher = None
+        self._watcher_checked = False
+        self._thread = None
+        self.poll_interval = Config.LOG_FOLLOW_POLL_SECONDS
+
+    @property
+    def subscriber_count(self):
+        return sum(followed.subscribers for followed in self._files.values())
+
+    def subscribe(self, path, max_subscribers):
+        """Registra un cliente sobre `path`; None si se alcanzó el límite"""
+        path = os.path.realpath(path)
+        with self._lock:
+            if self.subscriber_count >= max_subscribers:
+                return None
+
+            followed = self._files.get(path)
+            if followed is None:
+                followed = FollowedFile(path)
+                self._files[path] = followed
+                self._watch_dir(followed.directory)
+            followed.subscribers += 1
+            return followed
+
+    def unsubscribe(self, followed):
+        with self._lock:
+            followed.subscribers -= 1
+            if followed.subscribers > 0:
+                return
+
+            self._files.pop(followed.path, None)
+            self._dirs[followed.directory] -= 1
+            if self._dirs[followed.directory] == 0:
+                del self._dirs[followed.directory]
+                if self._watcher:
+                    self._watcher.remove_watch(followed.directory)
+
+    def wait_for_change(self, followed, last_seq, timeout):
+        """
+        Espera un cambio posterior a `last_seq` (o `timeout`).
+        Devuelve (seq, cambió). Sin inotify se despierta cada `poll_interval`
+        y el cliente verifica por stat.
+        """
+        if not self._watcher:
+            timeout = min(timeout, self.poll_interval)
+
+        with followed.changed:
+            followed.changed.wait_for(lambda: followed.seq > last_seq, timeout)
+            return followed.seq, followed.seq > last_seq
+
+    def _watch_dir(self, directory):
+        """Llamar con `_lock` tomado"""
+        if not self._watcher_checked:
+            self._watcher_checked = True
+            self._watcher = InotifyWatcher.create()
+            if self._watcher:
+                self._thread = threading.Thread(target=self._run, name='log-follower', daemon=True)
+                self._thread.start()
+
+        self._dirs[directory] = self._dirs.get(directory, 0) + 1
+        if self._watcher and self._watcher.add_watch(directory, FOLLOW_DIR_MASK) is None:
+            logger.warning(f"No se pudo vigilar {directory}; los clientes usarán timeout")
+
+    def _run(self):
+        fd = self._watcher.fileno()
+        while True:
+            try:
+                readable, _, _ = select.select([fd], [], [], 5)
+            except (OSError, ValueError) as e:
+                logger.error(f"Watcher de logs detenido: {e}")
+                return
+            if not readable:
+                continue
+
+            with self._lock:
+                events = self._watcher.read_events()
+                files = dict(self._files)
+
+            changed = set()
+            for watched, mask, name in events:
+                if mask & IN_Q_OVERFLOW or watched is None:
+                    changed.update(files.values())
+                    continue
+                followed = files.get(os.path.join(watched, name) if name else watched)
+                if followed is not None:
+                    changed.add(followed)
+
+            for followed in changed:
+                followed.notify()
+
+
+def format_cursor(inode, offset):
+    return f'{inode}:{offset}'
+
+
+def parse_cursor(cursor):
+    """'<inode>:<offset>' -> (inode, offset) o (None, None) si no es válido"""
+    inode, _, offset = str(cursor or '').partition(':')
+    if not inode.isdigit() or not offset.isdigit():
+        return None, None
+    return int(inode), int(offset)
+
+
+class LogTail:
+    """
+    Lector incremental de un cliente: mantiene el archivo abierto y un cursor
+    (inode, offset). Detecta rotación (cambia el inode: se termina de leer el
+    archivo viejo y se sigue con el nuevo desde 0) y truncado (el tamaño queda
+    por debajo del offset: se vuelve a 0). Sólo se parsean líneas completas.
+    """
+
+    def __init__(self, path, cursor=None):
+        self.path = path
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.carry = b''
+        self.pending_reset = None
+
+        cursor_inode, cursor_offset = parse_cursor(cursor)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+
+        if cursor_inode is None:
+            # Sin cursor: desde el final (el cliente ya tiene la página inicial)
+            self._open(st, st.st_size)
+        elif cursor_inode == st.st_ino and cursor_offset <= st.st_size:
+            self._open(st, cursor_offset)
+        else:
+            # El cursor es de un archivo ya rotado o truncado
+            self._open(st, 0)
+            self.pending_reset = 'rotated' if cursor_inode != st.st_ino else 'truncated'
+
+    @property
+    def cursor(self):
+        """Cursor al inicio de la primera línea aún no entregada"""
+        if self.inode is None:
+            return None
+        return format_cursor(self.inode, self.offset - len(self.carry))
+
+    def _open(self, st, offset):
+        if self.file:
+            self.file.close()
+        self.file = open(self.path, 'rb')
+        # El inode del handle abierto (el archivo pudo rotar entre stat y open)
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.offset = offset
+        self.carry = b''
+        self.file.seek(offset)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def _read(self, limit):
+        data = self.file.read(limit)
+        self.offset += len(data)
+        return data
+
+    def poll(self):
+        """
+        Devuelve (lineas_nuevas, reset, hay_más). `reset` es None, 'rotated'
+        o 'truncated'; tras un reset las líneas ya son del archivo nuevo.
+        """
+        reset, self.pending_reset = self.pending_reset, None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # Durante la rotación el archivo puede no existir un instante
+            return [], reset, False
+
+        data = b''
+        if self.file is None:
+            self._open(st, 0)
+        elif st.st_ino != self.inode:
+            # Rotado: terminar el archivo viejo (el handle sigue abierto) y seguir con el nuevo
+            data = self.carry + self.file.read()
+            self._open(st, 0)
+            reset = 'rotated'
+            if data and not data.endswith(b'\n'):
+                data += b'\n'
+            return self._parse(data), reset, True
+        elif st.st_size < self.offset:
+            self._open(st, 0)
+            reset = 'truncated'
+
+        data = self.carry + self._read(MAX_READ_BYTES)
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            self.carry = data
+            return [], reset, False
+
+        self.carry = data[cut + 1:]
+        return self._parse(data[:cut + 1]), reset, self.offset < st.st_size
+
+    def _parse(self, data):
+        lines = []
+        for raw in data.split(b'\n')[:-1]:
+            line = raw.rstrip(b'\r').decode('utf-8', errors='replace')
+            if line.strip():
+                lines.append(parse_log_line(line))
+        return lines
+
+
+# Instancia global (una por proceso)
+log_follower = LogFollower()
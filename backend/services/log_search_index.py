@@ -0,0 +1,675 @@
+import fcntl
+import glob
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+from services.odoo_log_reader import LOG_LINE_REGEX
+from services.error_fingerprint import fingerprint_record
+
+logger = logging.getLogger(__name__)
+
+# Archivos rotados junto a odoo.log: odoo.log.1, odoo.log.2.gz, odoo.log.2026-01-31[.gz]
+ROTATED_SUFFIX_REGEX = re.compile(r'^\.(\d+|\d{4}-\d{2}-\d{2})(\.gz)?$')
+
+MAX_CONTINUATION_LINES = 200  # Tope de líneas de traceback guardadas por entrada
+INSERT_BATCH = 2000
+QUIET_FLUSH_SECONDS = 60  # odoo.log sin escrituras: se cierra el último registro abierto
+ERROR_LEVELS = ('ERROR', 'CRITICAL')
+ERROR_SAMPLE_MAX_LENGTH = 4000
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_entries (
+    id INTEGER PRIMARY KEY,
+    instance TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    level TEXT NOT NULL,
+    database TEXT,
+    logger TEXT,
+    pid INTEGER,
+    message TEXT NOT NULL,
+    entry_key INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_log_entries_key ON log_entries(instance, entry_key);
+CREATE INDEX IF NOT EXISTS ix_log_entries_level_ts ON log_entries(instance, level, ts);
+CREATE INDEX IF NOT EXISTS ix_log_entries_logger_ts ON log_entries(instance, logger, ts);
+CREATE INDEX IF NOT EXISTS ix_log_entries_ts ON log_entries(ts);
+
+CREATE TABLE IF NOT EXISTS log_sources (
+    instance TEXT NOT NULL,
+    inode INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    mtime INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (instance, inode)
+);
+
+CREATE TABLE IF NOT EXISTS log_index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Errores agrupados por fingerprint (ver services/error_fingerprint.py)
+CREATE TABLE IF NOT EXISTS error_groups (
+    fingerprint TEXT PRIMARY KEY,
+    exception_type TEXT,
+    title TEXT NOT NULL,
+    logger TEXT,
+    level TEXT NOT NULL,
+    sample TEXT,
+    sample_instance TEXT,
+    count INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+
+-- Ocurrencias por grupo, instancia y día (para rangos de fechas e instancias afectadas)
+CREATE TABLE IF NOT EXISTS error_group_days (
+    fingerprint TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, instance, day)
+);
+CREATE INDEX IF NOT EXISTS ix_error_group_days_day ON error_group_days(day);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS log_entries_fts USING fts5(
+    message, content='log_entries', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS log_entries_ai AFTER INSERT ON log_entries BEGIN
+    INSERT INTO log_entries_fts(rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS log_entries_ad AFTER DELETE ON log_entries BEGIN
+    INSERT INTO log_entries_fts(log_entries_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+"""
+
+
+def _db_path():
+    return getattr(Config, 'LOG_SEARCH_DB', None) or os.path.join(Config.DATA_PATH, 'log-search.sqlite3')
+
+
+def connect():
+    """Conexión nueva a la base del índice (una por hilo/consulta)"""
+    path = _db_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def init_schema(conn):
+    """Crea las tablas; devuelve False si SQLite no tiene FTS5 (se busca con LIKE)"""
+    conn.executescript(SCHEMA)
+    try:
+        conn.executescript(FTS_SCHEMA)
+        return True
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 no disponible, la búsqueda de texto usará LIKE: {e}")
+        return False
+
+
+def _has_fts(conn):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'log_entries_fts'").fetchone()
+    return row is not None
+
+
+def _entry_key(raw):
+    """Hash de 64 bits del registro: evita duplicados al reingerir archivos rotados"""
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big', signed=True)
+
+
+class RecordBuilder:
+    """
+    Agrupa líneas en registros: una línea con cabecera de Odoo más sus líneas
+    de continuación (tracebacks). Lleva la cuenta de bytes para saber desde
+    dónde retomar: el último registro queda abierto hasta que aparece la
+    siguiente cabecera o se llama a flush().
+    """
+
+    def __init__(self, offset=0):
+        self.offset = offset
+        self.records = []
+        self._current = None
+        self._current_start = offset
+
+    @property
+    def committed_offset(self):
+        """Offset del primer byte que no pertenece a un registro cerrado"""
+        return self._current_start if self._current is not None else self.offset
+
+    def feed(self, data):
+        """`data` debe terminar en salto de línea"""
+        for raw in data.split(b'\n')[:-1]:
+            line = raw.rstrip(b'\r').decode('utf-8', errors='replace')
+            match = LOG_LINE_REGEX.match(line)
+            if match:
+                self._close()
+                self._current = (match, [], [raw])
+                self._current_start = self.offset
+            elif self._current is not None:
+                if len(self._current[1]) < MAX_CONTINUATION_LINES:
+                    self._current[1].append(line)
+                self._current[2].append(raw)
+            self.offset += len(raw) + 1
+
+    def flush(self):
+        self._close()
+        self._current_start = self.offset
+
+    def take(self):
+        records, self.records = self.records, []
+        return records
+
+    def _close(self):
+        if self._current is None:
+            return
+        match, continuation, raw_lines = self._current
+        self._current = None
+
+        message = match.group(6)
+        if continuation:
+            message = message + '\n' + '\n'.join(continuation)
+        self.records.append({
+            'ts': match.group(1),
+            'pid': int(match.group(2)),
+            'level': match.group(3),
+            'database': match.group(4),
+            'logger': match.group(5),
+            'message': message,
+            'entry_key': _entry_key(b'\n'.join(raw_lines)),
+        })
+
+
+def rotated_files(log_file):
+    """Archivos rotados de `log_file` en su mismo directorio"""
+    files = []
+    for path in glob.glob(glob.escape(log_file) + '.*'):
+        if ROTATED_SUFFIX_REGEX.match(path[len(log_file):]):
+            files.append(path)
+    return sorted(files)
+
+
+class LogSearchIndexer:
+    """
+    Indexador en segundo plano de los logs de Odoo de todas las instancias
+    en una base SQLite local (FTS5 sobre el mensaje + índices por nivel,
+    logger y fecha). Sólo un worker indexa (lock de archivo); el resto sólo
+    consulta. Cada archivo se sigue por inode con el offset ya ingerido, así
+    una rotación renombrada continúa donde quedó y los .gz se leen una vez.
+    """
+
+    def __init__(self):
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock_fd = None
+        self._app = None
+        self._last_prune_at = 0.0
+        self.interval = 30
+        self.batch_bytes = 8 * 1024 * 1024
+        self.retention_days = 30
+
+    def ensure_started(self, app):
+        """Arranca el hilo del indexador una sola vez por proceso"""
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            self._app = app
+            self.interval = max(5, app.config.get('LOG_SEARCH_INTERVAL_SECONDS', 30))
+            self.batch_bytes = app.config.get('LOG_SEARCH_BATCH_BYTES', 8 * 1024 * 1024)
+            self.retention_days = app.config.get('LOG_SEARCH_RETENTION_DAYS', 30)
+
+            self._thread = threading.Thread(target=self._run, name='log-search-indexer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _acquire_lock(self):
+        if self._lock_fd is not None:
+            return True
+
+        lock_dir = Config.DATA_PATH if os.path.isdir(Config.DATA_PATH) else tempfile.gettempdir()
+        fd = os.open(os.path.join(lock_dir, 'log-search-indexer.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        logger.info(f"Indexador de logs: este proceso (pid {os.getpid()}) indexa")
+        return True
+
+    def _run(self):
+        self._stop_event.wait(5)
+        while not self._stop_event.is_set():
+            pending = False
+            try:
+                if self._acquire_lock():
+                    pending = self.run_once()
+            except Exception as e:
+                logger.error(f"Error indexando logs de Odoo: {e}")
+
+            # Si quedó trabajo (indexado inicial de archivos grandes) se sigue enseguida
+            self._stop_event.wait(1 if pending else self.interval)
+
+    def run_once(self):
+        """Una pasada sobre todas las instancias; True si quedó algo por indexar"""
+        from services.instance_descriptor import list_descriptors
+
+        conn = connect()
+        try:
+            init_schema(conn)
+            self._backfill_errors(conn)
+            pending = False
+            for descriptor in list_descriptors(require_conf=True):
+                try:
+                    pending |= self._index_instance(conn, descriptor['name'], descriptor['log_file'])
+                except Exception as e:
+                    conn.rollback()
+                    logger.warning(f"Error indexando logs de {descriptor['name']}: {e}")
+
+            conn.execute(
+                "INSERT OR REPLACE INTO log_index_state(key, value) VALUES ('last_run_at', ?)",
+                (datetime.now().strftime(TIMESTAMP_FORMAT),)
+            )
+            conn.commit()
+
+            if time.monotonic() - self._last_prune_at >= 3600:
+                self._last_prune_at = time.monotonic()
+                self._prune(conn)
+            return pending
+        finally:
+            conn.close()
+
+    def _index_instance(self, conn, instance, log_file):
+        sources = {
+            row['inode']: row
+            for row in conn.execute('SELECT * FROM log_sources WHERE instance = ?', (instance,))
+        }
+        cutoff = time.time() - self.retention_days * 86400
+
+        seen = set()
+        pending = False
+        for path in rotated_files(log_file) + [log_file]:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen.add(st.st_ino)
+
+            # Archivos rotados más viejos que la retención no se ingieren
+            if path != log_file and st.st_mtime < cutoff:
+                continue
+
+            source = sources.get(st.st_ino)
+            if path.endswith('.gz'):
+                if source is None or not source['done'] or source['size'] != st.st_size:
+                    self._index_gzip(conn, instance, path, st)
+            else:
+                final = path != log_file or time.time() - st.st_mtime > QUIET_FLUSH_SECONDS
+                pending |= self._index_plain(conn, instance, path, st, source, final)
+
+        stale = [inode for inode in sources if inode not in seen]
+        if stale:
+            conn.executemany('DELETE FROM log_sources WHERE instance = ? AND inode = ?', [(instance, inode) for inode in stale])
+            conn.commit()
+        return pending
+
+    def _index_plain(self, conn, instance, path, st, source, final):
+        offset = source['offset'] if source is not None else 0
+        if offset > st.st_size:
+            offset = 0  # Truncado
+        if offset >= st.st_size:
+            return False
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(min(self.batch_bytes, st.st_size - offset))
+
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            return False
+        data = data[:cut + 1]
+        reached_end = offset + len(data) >= st.st_size
+
+        builder = RecordBuilder(offset)
+        builder.feed(data)
+        if final and reached_end:
+            builder.flush()
+        elif builder.committed_offset == offset and len(data) >= self.batch_bytes:
+            # Un solo registro más grande que el lote: se cierra igual para no trabarse
+            builder.flush()
+
+        self._store(conn, instance, builder.take())
+        self._save_source(conn, instance, st, path, builder.committed_offset, done=final and reached_end)
+        conn.commit()
+        return not reached_end
+
+    def _index_gzip(self, conn, instance, path, st):
+        builder = RecordBuilder()
+        carry = b''
+        with gzip.open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                data = carry + chunk
+                cut = data.rfind(b'\n')
+                if cut < 0:
+                    carry = data
+                    continue
+                carry = data[cut + 1:]
+                builder.feed(data[:cut + 1])
+                if len(builder.records) >= INSERT_BATCH:
+                    self._store(conn, instance, builder.take())
+
+        if carry:
+            builder.feed(carry + b'\n')
+        builder.flush()
+        self._store(conn, instance, builder.take())
+        self._save_source(conn, instance, st, path, st.st_size, done=True)
+        conn.commit()
+
+    def _store(self, conn, instance, records):
+        if not records:
+            return
+
+        sql = (
+            'INSERT OR IGNORE INTO log_entries (instance, ts, level, database, logger, pid, message, entry_key) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+        )
+
+        def values(r):
+            return (instance, r['ts'], r['level'], r['database'], r['logger'], r['pid'], r['message'], r['entry_key'])
+
+        conn.executemany(sql, [values(r) for r in records if r['level'] not in ERROR_LEVELS])
+
+        # Los errores se insertan uno a uno: sólo los nuevos (no duplicados de
+        # un archivo rotado) suman al agregado, en la misma transacción que el offset
+        new_errors = [r for r in records if r['level'] in ERROR_LEVELS and conn.execute(sql, values(r)).rowcount]
+        aggregate_errors(conn, instance, new_errors)
+
+    def _backfill_errors(self, conn):
+        """Agrupa una sola vez los errores indexados antes de existir el agregado"""
+        if conn.execute("SELECT 1 FROM log_index_state WHERE key = 'errors_backfilled'").fetchone():
+            return
+
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, instance, ts, level, logger, message FROM log_entries "
+                f"WHERE id > ? AND level IN ({','.join('?' * len(ERROR_LEVELS))}) ORDER BY id LIMIT 5000",
+                (last_id,) + ERROR_LEVELS
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+
+            by_instance = {}
+            for row in rows:
+                by_instance.setdefault(row['instance'], []).append(dict(row))
+            for instance, records in by_instance.items():
+                aggregate_errors(conn, instance, records)
+
+        conn.execute("INSERT OR REPLACE INTO log_index_state(key, value) VALUES ('errors_backfilled', '1')")
+        conn.commit()
+
+    def _save_source(self, conn, instance, st, path, offset, done):
+        conn.execute(
+            'INSERT OR REPLACE INTO log_sources (instance, inode, path, offset, size, mtime, done) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (instance, st.st_ino, path, offset, st.st_size, int(st.st_mtime), 1 if done else 0)
+        )
+
+    def _prune(self, conn):
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime(TIMESTAMP_FORMAT)
+        while True:
+            deleted = conn.execute(
+                'DELETE FROM log_entries WHERE id IN (SELECT id FROM log_entries WHERE ts < ? LIMIT 5000)',
+                (cutoff,)
+            ).rowcount
+            conn.commit()
+            if deleted < 5000:
+                break
+
+        conn.execute('DELETE FROM error_group_days WHERE day < ?', (cutoff[:10],))
+        conn.execute('DELETE FROM error_groups WHERE fingerprint NOT IN (SELECT fingerprint FROM error_group_days)')
+        conn.commit()
+
+
+def aggregate_errors(conn, instance, records):
+    """Suma registros ERROR/CRITICAL a los grupos por fingerprint (sin commit)"""
+    for record in records:
+        group = fingerprint_record(record)
+        seen_at = record['ts'][:19]
+
+        conn.execute(
+            'INSERT INTO error_groups (fingerprint, exception_type, title, logger, level, sample, sample_instance, '
+            'count, first_seen, last_seen) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?) '
+            'ON CONFLICT(fingerprint) DO UPDATE SET '
+            'count = count + 1, '
+            'first_seen = MIN(first_seen, excluded.first_seen), '
+            'sample = CASE WHEN excluded.last_seen >= last_seen THEN excluded.sample ELSE sample END, '
+            'sample_instance = CASE WHEN excluded.last_seen >= last_seen THEN excluded.sample_instance ELSE sample_instance END, '
+            'last_seen = MAX(last_seen, excluded.last_seen)',
+            (group['fingerprint'], group['exception_type'], group['title'], record['logger'], record['level'],
+             record['message'][:ERROR_SAMPLE_MAX_LENGTH], instance, seen_at, seen_at)
+        )
+        conn.execute(
+            'INSERT INTO error_group_days (fingerprint, instance, day, count, last_seen) VALUES (?, ?, ?, 1, ?) '
+            'ON CONFLICT(fingerprint, instance, day) DO UPDATE SET '
+            'count = count + 1, last_seen = MAX(last_seen, excluded.last_seen)',
+            (group['fingerprint'], instance, seen_at[:10], seen_at)
+        )
+
+
+def _instance_filter(instances, column):
+    if instances is None:
+        return '', []
+    return f" AND {column} IN ({','.join('?' * len(instances))})", sorted(instances)
+
+
+def top_errors(instances=None, since=None, limit=20):
+    """Errores más frecuentes desde `since` (fecha) en las instancias dadas (None = todas)"""
+    if (instances is not None and not instances) or not os.path.exists(_db_path()):
+        return []
+
+    instance_sql, instance_params = _instance_filter(instances, 'd.instance')
+    conn = connect()
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'error_group_days'").fetchone() is None:
+            return []
+
+        rows = conn.execute(
+            'SELECT d.fingerprint, SUM(d.count) AS count, GROUP_CONCAT(DISTINCT d.instance) AS instances, '
+            'MAX(d.last_seen) AS last_seen_in_range, g.exception_type, g.title, g.logger, g.level, '
+            'g.count AS total_count, g.first_seen, g.last_seen '
+            'FROM error_group_days d JOIN error_groups g ON g.fingerprint = d.fingerprint '
+            f'WHERE d.day >= ?{instance_sql} '
+            'GROUP BY d.fingerprint ORDER BY count DESC, last_seen_in_range DESC LIMIT ?',
+            [since.strftime('%Y-%m-%d') if since else ''] + instance_params + [limit]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    groups = []
+    for row in rows:
+        group = dict(row)
+        group['instances'] = sorted(group['instances'].split(',')) if group['instances'] else []
+        group['instance_count'] = len(group['instances'])
+        groups.append(group)
+    return groups
+
+
+def error_group_detail(fingerprint, instances=None, since=None):
+    """Detalle de un grupo: muestra del traceback, conteo por instancia y por día"""
+    if not os.path.exists(_db_path()):
+        return None
+
+    instance_sql, instance_params = _instance_filter(instances, 'instance')
+    day = since.strftime('%Y-%m-%d') if since else ''
+    conn = connect()
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'error_groups'").fetchone() is None:
+            return None
+
+        group = conn.execute('SELECT * FROM error_groups WHERE fingerprint = ?', (fingerprint,)).fetchone()
+        if group is None:
+            return None
+
+        by_instance = conn.execute(
+            'SELECT instance, SUM(count) AS count, MAX(last_seen) AS last_seen FROM error_group_days '
+            f'WHERE fingerprint = ? AND day >= ?{instance_sql} GROUP BY instance ORDER BY count DESC',
+            [fingerprint, day] + instance_params
+        ).fetchall()
+        by_day = conn.execute(
+            'SELECT day, SUM(count) AS count FROM error_group_days '
+            f'WHERE fingerprint = ? AND day >= ?{instance_sql} GROUP BY day ORDER BY day',
+            [fingerprint, day] + instance_params
+        ).fetchall()
+    finally:
+        conn.close()
+
+    if instances is not None and not by_instance:
+        return None  # El grupo sólo afecta instancias a las que el usuario no tiene acceso
+
+    detail = dict(group)
+    if instances is not None and detail['sample_instance'] not in instances:
+        detail['sample'] = None
+        detail['sample_instance'] = None
+    detail['instances'] = [dict(row) for row in by_instance]
+    detail['days'] = [dict(row) for row in by_day]
+    return detail
+
+
+def _fts_query(text):
+    """Cada palabra como frase literal (sin operadores FTS5 del usuario)"""
+    return ' '.join('"{}"'.format(token.replace('"', '""')) for token in text.split())
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_logs(instances=None, query=None, levels=None, logger_name=None, database=None,
+                since=None, until=None, limit=100, cursor=None):
+    """
+    Busca en el índice. `instances` None = todas; `logger_name` incluye los
+    loggers hijos (odoo.addons.stock -> odoo.addons.stock.models...).
+    Orden: más nuevas primero; `cursor` ('<ts>|<id>') pagina hacia atrás.
+    Devuelve (entradas, siguiente_cursor).
+    """
+    conditions = []
+    params = []
+
+    if instances is not None:
+        if not instances:
+            return [], None
+        conditions.append(f"e.instance IN ({','.join('?' * len(instances))})")
+        params.extend(sorted(instances))
+
+    if levels:
+        conditions.append(f"e.level IN ({','.join('?' * len(levels))})")
+        params.extend(levels)
+
+    if logger_name:
+        conditions.append("(e.logger = ? OR e.logger LIKE ? ESCAPE '\\')")
+        params.extend([logger_name, _escape_like(logger_name) + '.%'])
+
+    if database:
+        conditions.append('e.database = ?')
+        params.append(database)
+
+    if since:
+        conditions.append('e.ts >= ?')
+        params.append(since.strftime(TIMESTAMP_FORMAT))
+
+    if until:
+        conditions.append('e.ts < ?')
+        params.append(until.strftime(TIMESTAMP_FORMAT))
+
+    if cursor:
+        cursor_ts, _, cursor_id = cursor.rpartition('|')
+        if cursor_ts and cursor_id.isdigit():
+            conditions.append('(e.ts < ? OR (e.ts = ? AND e.id < ?))')
+            params.extend([cursor_ts, cursor_ts, int(cursor_id)])
+
+    if not os.path.exists(_db_path()):
+        return [], None
+
+    conn = connect()
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'log_entries'").fetchone() is None:
+            return [], None
+
+        if query:
+            if _has_fts(conn):
+                conditions.append('e.id IN (SELECT rowid FROM log_entries_fts WHERE log_entries_fts MATCH ?)')
+                params.append(_fts_query(query))
+            else:
+                conditions.append("e.message LIKE ? ESCAPE '\\'")
+                params.append(f'%{_escape_like(query)}%')
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = conn.execute(
+            f'SELECT e.id, e.instance, e.ts, e.level, e.database, e.logger, e.pid, e.message '
+            f'FROM log_entries e {where} ORDER BY e.ts DESC, e.id DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    entries = [dict(row) for row in rows[:limit]]
+    next_cursor = f"{entries[-1]['ts']}|{entries[-1]['id']}" if len(rows) > limit else None
+    return entries, next_cursor
+
+
+def index_status():
+    """Última pasada del indexador y archivos seguidos por instancia"""
+    if not os.path.exists(_db_path()):
+        return {'available': False}
+
+    conn = connect()
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'log_sources'").fetchone() is None:
+            return {'available': False}
+        last_run = conn.execute("SELECT value FROM log_index_state WHERE key = 'last_run_at'").fetchone()
+        files = conn.execute(
+            'SELECT instance, COUNT(*) AS files, SUM(done) AS complete FROM log_sources GROUP BY instance'
+        ).fetchall()
+        return {
+            'available': True,
+            'fts': _has_fts(conn),
+            'last_run_at': last_run['value'] if last_run else None,
+            'instances': {row['instance']: {'files': row['files'], 'complete': row['complete']} for row in files},
+        }
+    finally:
+        conn.close()
+
+
+# Instancia global (una por proceso)
+log_search_indexer = LogSearchIndexer()
@@ -0,0 +1,245 @@
+import math
+import struct
+import sys
+from array import array
+
+from sqlalchemy import func, select
+
+from models import MetricsHistory, MetricsRollup
+from services.metrics_rollup import (
+    EPOCH,
+    PERCENT_FIELDS,
+    AVG_FIELDS,
+    LAST_FIELDS,
+    choose_resolution,
+)
+
+# avg: promedio por bucket | minmax: además la envolvente min/max de cada porcentaje
+# lttb: largest-triangle-three-buckets sobre buckets más finos (conserva picos)
+HISTORY_MODES = ('avg', 'minmax', 'lttb')
+# rows: lista de objetos (compatible) | columnar: un array por serie | binary: float32 empaquetado
+HISTORY_FORMATS = ('rows', 'columnar', 'binary')
+BINARY_MAGIC = b'MHC1'
+COLUMNAR_DECIMALS = 2
+LTTB_OVERSAMPLE = 4
+LTTB_MAX_CANDIDATES = 4000
+
+
+def _source_columns(resolution):
+    """Columnas de origen (crudo o rollup) para cada agregado"""
+    if resolution is None:
+        table = MetricsHistory.__table__
+        columns = {
+            'timestamp': table.c.timestamp,
+            'count': None,
+        }
+        for field in PERCENT_FIELDS:
+            columns[field] = (table.c[field], table.c[field], table.c[field])
+        for field in AVG_FIELDS + LAST_FIELDS:
+            columns[field] = table.c[field]
+        return table, columns
+
+    table = MetricsRollup.__table__
+    columns = {
+        'timestamp': table.c.bucket_start,
+        'count': table.c.sample_count,
+    }
+    for field in PERCENT_FIELDS:
+        columns[field] = (table.c[f'{field}_avg'], table.c[f'{field}_min'], table.c[f'{field}_max'])
+    for field in AVG_FIELDS:
+        columns[field] = table.c[f'{field}_avg']
+    for field in LAST_FIELDS:
+        columns[field] = table.c[f'{field}_last']
+    return table, columns
+
+
+def _bucketed_query(resolution, start_time, end_time, buckets, with_envelope):
+    """SELECT agrupado por width_bucket: devuelve como máximo `buckets` filas"""
+    table, columns = _source_columns(resolution)
+    ts = columns['timestamp']
+
+    start_epoch = (start_time - EPOCH).total_seconds()
+    # +1s para que el último registro caiga dentro del rango de width_bucket
+    end_epoch = (end_time - EPOCH).total_seconds() + 1
+    bucket = func.width_bucket(func.extract('epoch', ts), start_epoch, end_epoch, buckets).label('bucket')
+
+    selected = [
+        bucket,
+        func.min(ts).label('timestamp'),
+        (func.sum(columns['count']) if columns['count'] is not None else func.count()).label('samples'),
+    ]
+    for field in PERCENT_FIELDS:
+        avg_column, min_column, max_column = columns[field]
+        selected.append(func.avg(avg_column).label(field))
+        if with_envelope:
+            selected.append(func.min(min_column).label(f'{field}_min'))
+            selected.append(func.max(max_column).label(f'{field}_max'))
+    for field in AVG_FIELDS:
+        selected.append(func.avg(columns[field]).label(field))
+    for field in LAST_FIELDS:
+        # Totales y contadores acumulativos: el máximo del bucket equivale al último
+        selected.append(func.max(columns[field]).label(field))
+
+    stmt = select(*selected).select_from(table).where(ts >= start_time, ts <= end_time)
+    if resolution is not None:
+        stmt = stmt.where(table.c.resolution == resolution)
+
+    return stmt.group_by(bucket).order_by(bucket)
+
+
+def _row_to_point(row):
+    """Fila agrupada -> dict con timestamp datetime y valores float"""
+    data = dict(row._mapping)
+    data.pop('bucket', None)
+    data.pop('samples', None)
+    for key, value in data.items():
+        if key != 'timestamp' and value is not None:
+            data[key] = float(value)
+    return data
+
+
+def lttb(rows, threshold, key):
+    """Largest-Triangle-Three-Buckets sobre una lista de dicts ordenada por timestamp"""
+    total = len(rows)
+    if threshold >= total:
+        return rows
+    if threshold <= 2:
+        return [rows[0], rows[-1]][:max(threshold, 0)]
+
+    xs = [(row['timestamp'] - EPOCH).total_seconds() for row in rows]
+    ys = [row.get(key) or 0.0 for row in rows]
+
+    sampled = [rows[0]]
+    every = (total - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, total)
+        avg_len = max(1, avg_end - avg_start)
+        avg_x = sum(xs[avg_start:avg_end]) / avg_len if avg_end > avg_start else xs[-1]
+        avg_y = sum(ys[avg_start:avg_end]) / avg_len if avg_end > avg_start else ys[-1]
+
+        range_start = int(i * every) + 1
+        range_end = min(int((i + 1) * every) + 1, total - 1)
+
+        max_area = -1.0
+        next_a = range_start
+        for index in range(range_start, range_end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[index] - ys[a])
+                - (xs[a] - xs[index]) * (avg_y - ys[a])
+            )
+            if area > max_area:
+                max_area = area
+                next_a = index
+
+        sampled.append(rows[next_a])
+        a = next_a
+
+    sampled.append(rows[-1])
+    return sampled
+
+
+def query_history(session, start_time, end_time, max_points, mode='avg', range_minutes=None, lttb_key='cpu_percent'):
+    """
+    Historial reducido en PostgreSQL a `max_points` filas (sin instanciar objetos ORM).
+    Usa el rollup más grueso que alcance y cae a los datos crudos si está vacío.
+    Devuelve (puntos, total_de_muestras, resolución); cada punto es un dict con
+    `timestamp` datetime, listo para serializar con points_to_*.
+    """
+    if range_minutes is None:
+        range_minutes = int((end_time - start_time).total_seconds() // 60)
+
+    buckets = max_points
+    if mode == 'lttb':
+        buckets = min(max_points * LTTB_OVERSAMPLE, LTTB_MAX_CANDIDATES)
+
+    chosen = choose_resolution(range_minutes, max_points)
+    candidates = [chosen[0]] if chosen else []
+    candidates.append(None)
+
+    rows = []
+    resolution = None
+    for resolution in candidates:
+        stmt = _bucketed_query(resolution, start_time, end_time, buckets, with_envelope=(mode == 'minmax'))
+        rows = session.execute(stmt).all()
+        if rows:
+            break
+
+    total = int(sum(row.samples or 0 for row in rows))
+    points = [_row_to_point(row) for row in rows]
+
+    if mode == 'lttb':
+        points = lttb(points, max_points, lttb_key)
+
+    return points, total, resolution or 'raw'
+
+
+def _series_names(points):
+    return [key for key in points[0] if key != 'timestamp'] if points else []
+
+
+def _epoch_ms(timestamp):
+    return int((timestamp - EPOCH).total_seconds() * 1000)
+
+
+def points_to_rows(points):
+    """Formato clásico: un objeto por punto (mismas claves que MetricsHistory.to_dict)"""
+    rows = []
+    for point in points:
+        row = dict(point)
+        row['timestamp'] = point['timestamp'].isoformat()
+        rows.append(row)
+    return rows
+
+
+def points_to_columnar(points):
+    """
+    Formato columnar: `t0` (epoch ms UTC), `offsets` con el delta en ms respecto
+    del punto anterior y un array por serie (null donde no hay dato).
+    """
+    if not points:
+        return {'t0': None, 'offsets': [], 'series': {}}
+
+    times = [_epoch_ms(point['timestamp']) for point in points]
+    offsets = [0] + [current - previous for previous, current in zip(times, times[1:])]
+
+    series = {}
+    for name in _series_names(points):
+        series[name] = [
+            round(point[name], COLUMNAR_DECIMALS) if point[name] is not None else None
+            for point in points
+        ]
+
+    return {'t0': times[0], 'offsets': offsets, 'series': series}
+
+
+def points_to_binary(points):
+    """
+    Formato binario little-endian:
+      'MHC1' | uint32 n | uint16 series | float64 t0_ms
+      | n x uint32 offsets (delta ms) | por serie: uint8 len + nombre utf-8 + n x float32 (NaN = null)
+    """
+    names = _series_names(points)
+    times = [_epoch_ms(point['timestamp']) for point in points]
+    offsets = array('I', [0] + [current - previous for previous, current in zip(times, times[1:])]) if times else array('I')
+
+    chunks = [
+        BINARY_MAGIC,
+        struct.pack('<IHd', len(points), len(names), float(times[0]) if times else 0.0),
+    ]
+
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    chunks.append(offsets.tobytes())
+
+    for name in names:
+        encoded = name.encode('utf-8')
+        values = array('f', [point[name] if point[name] is not None else math.nan for point in points])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        chunks.append(struct.pack('<B', len(encoded)) + encoded)
+        chunks.append(values.tobytes())
+
+    return b''.join(chunks)
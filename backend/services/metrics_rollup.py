@@ -0,0 +1,190 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import MetricsHistory, MetricsRollup
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# (resolución, segundos por bucket, días de retención; None = sin límite)
+ROLLUP_RESOLUTIONS = (
+    ('1m', 60, 7),
+    ('5m', 300, 45),
+    ('1h', 3600, 400),
+    ('1d', 86400, None),
+)
+
+# Campos de MetricsHistory -> agregados que se guardan de cada uno
+PERCENT_FIELDS = ('cpu_percent', 'ram_percent', 'disk_percent')
+AVG_FIELDS = ('ram_used_gb', 'disk_used_gb')
+LAST_FIELDS = ('ram_total_gb', 'disk_total_gb', 'network_sent_mb', 'network_recv_mb')
+
+
+def bucket_start(timestamp, seconds):
+    """Inicio del bucket (UTC naive) que contiene al timestamp"""
+    offset = int((timestamp - EPOCH).total_seconds()) // seconds * seconds
+    return EPOCH + timedelta(seconds=offset)
+
+
+def _aggregate_bucket(resolution, start, entries):
+    """Calcula los agregados de un bucket a partir de registros ordenados por tiempo"""
+    row = {'resolution': resolution, 'bucket_start': start, 'sample_count': len(entries)}
+
+    for field in PERCENT_FIELDS + AVG_FIELDS + LAST_FIELDS:
+        values = [getattr(entry, field) for entry in entries if getattr(entry, field) is not None]
+
+        if field in LAST_FIELDS:
+            row[f'{field}_last'] = values[-1] if values else None
+            continue
+
+        row[f'{field}_avg'] = sum(values) / len(values) if values else None
+        if field in PERCENT_FIELDS:
+            row[f'{field}_min'] = min(values) if values else None
+            row[f'{field}_max'] = max(values) if values else None
+            row[f'{field}_last'] = values[-1] if values else None
+
+    return row
+
+
+def _merge_columns(stmt):
+    """Expresiones ON CONFLICT para combinar un bucket existente con el lote nuevo"""
+    table = MetricsRollup.__table__
+    current = table.c
+    new = stmt.excluded
+    total = current.sample_count + new.sample_count
+
+    merged = {'sample_count': total}
+    for field in PERCENT_FIELDS + AVG_FIELDS:
+        column = f'{field}_avg'
+        # Promedio ponderado; si alguno es NULL se conserva el otro
+        weighted = (current[column] * current.sample_count + new[column] * new.sample_count) / total
+        merged[column] = func.coalesce(weighted, new[column], current[column])
+
+    for field in PERCENT_FIELDS:
+        merged[f'{field}_min'] = func.least(current[f'{field}_min'], new[f'{field}_min'])
+        merged[f'{field}_max'] = func.greatest(current[f'{field}_max'], new[f'{field}_max'])
+
+    for field in PERCENT_FIELDS + LAST_FIELDS:
+        column = f'{field}_last'
+        merged[column] = func.coalesce(new[column], current[column])
+
+    return merged
+
+
+def apply_history_entries(session, entries):
+    """Acumula un lote de MetricsHistory en todos los rollups (upsert incremental).
+
+    Los lotes deben llegar en orden cronológico para que `last` sea correcto.
+    """
+    entries = sorted((e for e in entries if e.timestamp is not None), key=lambda e: e.timestamp)
+    if not entries:
+        return
+
+    for resolution, seconds, _retention in ROLLUP_RESOLUTIONS:
+        buckets = {}
+        for entry in entries:
+            buckets.setdefault(bucket_start(entry.timestamp, seconds), []).append(entry)
+
+        rows = [_aggregate_bucket(resolution, start, items) for start, items in buckets.items()]
+        stmt = pg_insert(MetricsRollup.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['resolution', 'bucket_start'],
+            set_=_merge_columns(stmt)
+        )
+        session.execute(stmt)
+
+
+def store_history_entries(session, entries):
+    """Guarda registros crudos y actualiza los rollups en la misma transacción"""
+    session.add_all(entries)
+    session.flush()
+    apply_history_entries(session, entries)
+
+
+def choose_resolution(range_minutes, max_points):
+    """Resolución más gruesa que todavía da al menos `max_points` buckets en el rango.
+
+    Devuelve None cuando ninguna alcanza (rangos cortos: se usan los datos crudos).
+    """
+    range_seconds = range_minutes * 60
+    for resolution, seconds, retention_days in reversed(ROLLUP_RESOLUTIONS):
+        if retention_days is not None and range_minutes > retention_days * 24 * 60:
+            continue
+        if range_seconds / seconds >= max_points:
+            return resolution, seconds
+    return None
+
+
+def _rollup_columns():
+    columns = ['sample_count']
+    for field in PERCENT_FIELDS:
+        columns += [f'{field}_avg', f'{field}_min', f'{field}_max', f'{field}_last']
+    columns += [f'{field}_avg' for field in AVG_FIELDS]
+    columns += [f'{field}_last' for field in LAST_FIELDS]
+    return columns
+
+
+def backfill_rollups(session):
+    """Recalcula todos los rollups desde metrics_history (agregando en PostgreSQL)"""
+    def last(field):
+        return f"(array_agg({field} ORDER BY timestamp DESC) FILTER (WHERE {field} IS NOT NULL))[1]"
+
+    select_parts = ['count(*)']
+    for field in PERCENT_FIELDS:
+        select_parts += [f'avg({field})', f'min({field})', f'max({field})', last(field)]
+    select_parts += [f'avg({field})' for field in AVG_FIELDS]
+    select_parts += [last(field) for field in LAST_FIELDS]
+
+    columns = _rollup_columns()
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns)
+
+    for resolution, seconds, _retention in ROLLUP_RESOLUTIONS:
+        session.execute(text(f"""
+            INSERT INTO metrics_rollups (resolution, bucket_start, {', '.join(columns)})
+            SELECT :resolution,
+                   to_timestamp(floor(extract(epoch FROM timestamp) / :seconds) * :seconds) AT TIME ZONE 'UTC' AS bucket,
+                   {', '.join(select_parts)}
+            FROM metrics_history
+            WHERE timestamp IS NOT NULL
+            GROUP BY bucket
+            ON CONFLICT (resolution, bucket_start) DO UPDATE SET {updates}
+        """), {'resolution': resolution, 'seconds': seconds})
+
+    session.commit()
+
+
+def prune_expired(session, raw_retention_days, now=None):
+    """Elimina datos crudos y rollups fuera de su política de retención"""
+    now = now or datetime.utcnow()
+    deleted = {}
+
+    # Nunca borrar datos crudos que todavía no fueron agregados (p. ej. historial
+    # anterior a la existencia de los rollups)
+    oldest_raw = session.query(func.min(MetricsHistory.timestamp)).scalar()
+    oldest_rollup = session.query(func.min(MetricsRollup.bucket_start)).filter(
+        MetricsRollup.resolution == ROLLUP_RESOLUTIONS[-1][0]
+    ).scalar()
+    if oldest_raw is not None and (oldest_rollup is None or oldest_raw < oldest_rollup):
+        logger.info("Hay historial sin agregar: recalculando rollups antes de aplicar retención")
+        backfill_rollups(session)
+
+    if raw_retention_days:
+        deleted['raw'] = MetricsHistory.query.filter(
+            MetricsHistory.timestamp < now - timedelta(days=raw_retention_days)
+        ).delete(synchronize_session=False)
+
+    for resolution, _seconds, retention_days in ROLLUP_RESOLUTIONS:
+        if retention_days is None:
+            continue
+        deleted[resolution] = MetricsRollup.query.filter(
+            MetricsRollup.resolution == resolution,
+            MetricsRollup.bucket_start < now - timedelta(days=retention_days)
+        ).delete(synchronize_session=False)
+
+    session.commit()
+    logger.info(f"Retención de métricas aplicada: {deleted}")
+    return deleted
@@ -0,0 +1,287 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from services.system_monitor import SystemMonitor
+
+logger = logging.getLogger(__name__)
+
+
+def build_history_entry(metrics, timestamp=None):
+    """Construye un registro de MetricsHistory a partir de un snapshot de métricas"""
+    from models import MetricsHistory
+
+    return MetricsHistory(
+        timestamp=timestamp or datetime.utcnow(),
+        cpu_percent=metrics['cpu']['percent'],
+        ram_percent=metrics['memory']['percent'],
+        ram_used_gb=metrics['memory']['used_gb'],
+        ram_total_gb=metrics['memory']['total_gb'],
+        disk_percent=metrics['disk'][0]['percent'] if metrics['disk'] else None,
+        disk_used_gb=metrics['disk'][0]['used_gb'] if metrics['disk'] else None,
+        disk_total_gb=metrics['disk'][0]['total_gb'] if metrics['disk'] else None,
+        network_sent_mb=metrics['network']['mb_sent'],
+        network_recv_mb=metrics['network']['mb_recv']
+    )
+
+
+class MetricsSampler:
+    """
+    Muestreador de métricas en segundo plano.
+    Toma una muestra cada `sample_interval` segundos y la guarda en un buffer
+    circular acotado, de modo que /current responda sin bloquear al worker.
+    Sólo un proceso (el que obtiene el lock de archivo) persiste el historial
+    en la base de datos, en lotes, junto con los rollups y la retención.
+    El mismo proceso muestrea el consumo por instancia Odoo cada
+    `instance_interval` segundos.
+    Además reparte cada muestra a los clientes suscritos al stream: la muestra
+    se serializa una sola vez y un cliente lento sólo recibe la más reciente.
+    """
+
+    def __init__(self):
+        self.monitor = SystemMonitor()
+        self._buffer = deque(maxlen=720)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._first_sample = threading.Event()
+        self._new_sample = threading.Condition()
+        self._seq = 0
+        self._latest_payload = None
+        self._subscribers = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._app = None
+        self._lock_fd = None
+        self._last_stored_at = 0.0
+        self._last_flush_at = 0.0
+        self._last_prune_at = 0.0
+        self._last_instances_at = 0.0
+        self.instance_metrics_enabled = False
+        self.instance_interval = 30
+        self.sample_interval = 5
+        self.store_interval = 15
+        self.flush_interval = 60
+        self.prune_interval = 3600
+
+    def ensure_started(self, app):
+        """Arranca el hilo de muestreo una sola vez por proceso"""
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is not None:
+                return
+
+            self._app = app
+            self.sample_interval = max(1, app.config.get('METRICS_SAMPLE_INTERVAL_SECONDS', 5))
+            self.store_interval = max(self.sample_interval, app.config.get('METRICS_STORE_INTERVAL_SECONDS', 15))
+            self.flush_interval = max(self.store_interval, app.config.get('METRICS_FLUSH_INTERVAL_SECONDS', 60))
+            self.prune_interval = app.config.get('METRICS_PRUNE_INTERVAL_SECONDS', 3600)
+            self._buffer = deque(maxlen=max(1, app.config.get('METRICS_BUFFER_SIZE', 720)))
+            self.instance_metrics_enabled = app.config.get('INSTANCE_METRICS_ENABLED', True)
+            self.instance_interval = max(self.sample_interval, app.config.get('INSTANCE_METRICS_INTERVAL_SECONDS', 30))
+
+            self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+            logger.info(f"Metrics sampler iniciado (cada {self.sample_interval}s, buffer={self._buffer.maxlen})")
+
+    def stop(self):
+        """Detiene el hilo y persiste las muestras pendientes"""
+        self._stop_event.set()
+        with self._new_sample:
+            self._new_sample.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.sample_interval + 1)
+        self._flush()
+
+    def latest(self, wait_timeout=0):
+        """Devuelve la última muestra disponible (o None si aún no hay ninguna)"""
+        if not self._buffer and wait_timeout and self._thread is not None:
+            self._first_sample.wait(wait_timeout)
+
+        with self._lock:
+            if not self._buffer:
+                return None
+            return self._buffer[-1][1]
+
+    def subscribe(self, max_subscribers):
+        """Registra un cliente del stream; False si se alcanzó el límite"""
+        with self._new_sample:
+            if self._subscribers >= max_subscribers:
+                return False
+            self._subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._new_sample:
+            self._subscribers = max(0, self._subscribers - 1)
+
+    @property
+    def subscriber_count(self):
+        return self._subscribers
+
+    def wait_for_sample(self, last_seq, timeout):
+        """
+        Espera una muestra más nueva que `last_seq`.
+        Devuelve (seq, payload_json). Si el cliente se atrasó varios ticks sólo
+        recibe la última muestra (los intermedios se descartan); si vence el
+        timeout devuelve (last_seq, None).
+        """
+        with self._new_sample:
+            self._new_sample.wait_for(lambda: self._seq > last_seq or self._stop_event.is_set(), timeout)
+            if self._seq <= last_seq:
+                return last_seq, None
+            return self._seq, self._latest_payload
+
+    def recent(self, since=None):
+        """Devuelve las muestras del buffer como lista de (timestamp_utc, métricas)"""
+        with self._lock:
+            samples = list(self._buffer)
+
+        if since is None:
+            return samples
+        return [sample for sample in samples if sample[0] > since]
+
+    def _run(self):
+        # cpu_percent(interval=None) mide contra la llamada anterior: la primera
+        # llamada sólo inicializa el contador, por eso se descarta.
+        self.monitor.get_cpu_info(interval=None)
+        self._stop_event.wait(1)
+
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self._take_sample()
+            except Exception as e:
+                logger.error(f"Error tomando muestra de métricas: {e}")
+
+            if time.monotonic() - self._last_flush_at >= self.flush_interval:
+                self._flush()
+
+            if self.instance_metrics_enabled and time.monotonic() - self._last_instances_at >= self.instance_interval:
+                self._collect_instances()
+
+            elapsed = time.monotonic() - started
+            self._stop_event.wait(max(0.1, self.sample_interval - elapsed))
+
+    def _take_sample(self):
+        metrics = self.monitor.get_all_metrics(cpu_interval=None)
+        sampled_at = datetime.utcnow()
+
+        with self._lock:
+            self._buffer.append((sampled_at, metrics))
+
+            now = time.monotonic()
+            if now - self._last_stored_at >= self.store_interval:
+                self._pending.append((sampled_at, metrics))
+                self._last_stored_at = now
+
+        self._first_sample.set()
+
+        payload = json.dumps(metrics, separators=(',', ':'))
+        with self._new_sample:
+            self._seq += 1
+            self._latest_payload = payload
+            self._new_sample.notify_all()
+
+        return metrics
+
+    def _acquire_persist_lock(self):
+        """Intenta obtener el lock exclusivo de persistencia entre workers"""
+        if self._lock_fd is not None:
+            return True
+
+        lock_dir = self._app.config.get('DATA_PATH') if self._app else None
+        if not lock_dir or not os.path.isdir(lock_dir):
+            lock_dir = tempfile.gettempdir()
+
+        fd = os.open(os.path.join(lock_dir, 'metrics-sampler.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        logger.info(f"Metrics sampler: este proceso (pid {os.getpid()}) persiste el historial")
+        return True
+
+    def _flush(self):
+        """Persiste en lote las muestras pendientes (sólo el proceso con el lock)"""
+        self._last_flush_at = time.monotonic()
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+
+        if not pending or self._app is None:
+            return
+
+        try:
+            if not self._acquire_persist_lock():
+                return
+        except Exception as e:
+            logger.error(f"Error obteniendo lock de persistencia de métricas: {e}")
+            return
+
+        from models import db
+        from services.metrics_rollup import store_history_entries, prune_expired
+        from services.instance_metrics import prune_instance_metrics
+
+        with self._app.app_context():
+            # La retención va antes de guardar: si hay historial sin agregar,
+            # prune_expired recalcula los rollups antes de borrar nada
+            if time.monotonic() - self._last_prune_at >= self.prune_interval:
+                self._last_prune_at = time.monotonic()
+                try:
+                    prune_expired(db.session, self._app.config.get('METRICS_RAW_RETENTION_DAYS', 3))
+                    prune_instance_metrics(db.session, self._app.config.get('INSTANCE_METRICS_RETENTION_DAYS', 14))
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error aplicando retención de métricas: {e}")
+
+            try:
+                entries = [build_history_entry(metrics, sampled_at) for sampled_at, metrics in pending]
+                store_history_entries(db.session, entries)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error persistiendo {len(pending)} muestras de métricas: {e}")
+
+    def _collect_instances(self):
+        """Muestrea el consumo por instancia y lo persiste (sólo el proceso con el lock)"""
+        self._last_instances_at = time.monotonic()
+        if self._app is None:
+            return
+
+        try:
+            if not self._acquire_persist_lock():
+                return
+        except Exception as e:
+            logger.error(f"Error obteniendo lock de persistencia de métricas: {e}")
+            return
+
+        from models import db
+        from services.instance_metrics import instance_metrics_collector, store_instance_samples
+
+        with self._app.app_context():
+            try:
+                instance_metrics_collector.configure(self._app)
+                instance_metrics_collector.discover()
+                store_instance_samples(db.session, instance_metrics_collector.collect())
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error muestreando métricas por instancia: {e}")
+
+
+# Instancia global (una por proceso)
+metrics_sampler = MetricsSampler()
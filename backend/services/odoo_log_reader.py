@@ -0,0 +1,386 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from bisect import bisect_left
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Regex para parsear líneas de log de Odoo
+# Formato: 2026-02-08 15:03:42,089 1200 WARNING dev-mtg-production odoo.http: mensaje
+LOG_LINE_REGEX = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2},\d+)\s+'  # timestamp
+    r'(\d+)\s+'                                              # pid
+    r'(DEBUG|INFO|WARNING|ERROR|CRITICAL)\s+'                # level
+    r'(\S+)\s+'                                              # database
+    r'(\S+):\s*'                                             # logger
+    r'(.*)'                                                  # message
+)
+
+# Prefijo 'YYYY-MM-DD HH:MM:SS': se compara como string (orden cronológico)
+TIMESTAMP_PREFIX = re.compile(rb'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+
+INDEX_VERSION = 1
+INDEX_STRIDE = 1000  # Un checkpoint (offset + timestamp) cada N líneas
+READ_CHUNK = 1024 * 1024
+REVERSE_BLOCK = 64 * 1024
+STAT_LEVELS = ('INFO', 'WARNING', 'ERROR', 'CRITICAL', 'DEBUG')
+
+
+def parse_log_line(line):
+    """Parsea una línea de log de Odoo y extrae sus componentes"""
+    match = LOG_LINE_REGEX.match(line)
+    if match:
+        return {
+            'timestamp': match.group(1),
+            'pid': match.group(2),
+            'level': match.group(3),
+            'database': match.group(4),
+            'logger': match.group(5),
+            'message': match.group(6),
+            'raw': line
+        }
+    # Línea de continuación (traceback, etc.)
+    return {
+        'timestamp': '',
+        'pid': '',
+        'level': 'CONTINUATION',
+        'database': '',
+        'logger': '',
+        'message': line,
+        'raw': line
+    }
+
+
+def new_stats():
+    stats = {'total': 0}
+    stats.update({level.lower(): 0 for level in STAT_LEVELS})
+    return stats
+
+
+def count_line(stats, parsed):
+    """Suma una línea parseada a las estadísticas (una sola pasada)"""
+    stats['total'] += 1
+    key = parsed['level'].lower()
+    if key in stats:
+        stats[key] += 1
+
+
+def _line_timestamp(raw):
+    match = TIMESTAMP_PREFIX.match(raw)
+    return match.group(0).decode('ascii') if match else None
+
+
+def _decode(raw):
+    return raw.rstrip(b'\r\n').decode('utf-8', errors='replace')
+
+
+class LogIndex:
+    """
+    Índice disperso de un archivo de log: cada INDEX_STRIDE líneas guarda el
+    offset en bytes y el último timestamp visto. Se actualiza leyendo sólo lo
+    agregado desde la última vez y se reinicia si cambia el inode (rotación)
+    o el archivo se achica (truncado). Se persiste como JSON junto a los
+    demás datos de la app para no reindexar tras un reinicio.
+    """
+
+    def __init__(self, path, sidecar_path):
+        self.path = path
+        self.sidecar_path = sidecar_path
+        self.lock = threading.Lock()
+        self._reset(None)
+        self._load()
+
+    def _reset(self, st):
+        self.inode = st.st_ino if st else None
+        self.device = st.st_dev if st else None
+        self.indexed_size = 0
+        self.line_count = 0
+        self.last_timestamp = None
+        self.checkpoints = []  # [offset, timestamp] de las líneas 0, STRIDE, 2*STRIDE...
+
+    def _load(self):
+        try:
+            with open(self.sidecar_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != INDEX_VERSION or data.get('path') != self.path:
+            return
+
+        self.inode = data['inode']
+        self.device = data['device']
+        self.indexed_size = data['indexed_size']
+        self.line_count = data['line_count']
+        self.last_timestamp = data.get('last_timestamp')
+        self.checkpoints = data['checkpoints']
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.sidecar_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.sidecar_path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'version': INDEX_VERSION,
+                    'path': self.path,
+                    'inode': self.inode,
+                    'device': self.device,
+                    'indexed_size': self.indexed_size,
+                    'line_count': self.line_count,
+                    'last_timestamp': self.last_timestamp,
+                    'checkpoints': self.checkpoints,
+                }, f)
+            os.replace(tmp_path, self.sidecar_path)
+        except OSError as e:
+            logger.debug(f"No se pudo guardar el índice de {self.path}: {e}")
+
+    def update(self):
+        """Indexa lo agregado desde la última actualización (llamar con `lock` tomado)"""
+        st = os.stat(self.path)
+        if (st.st_ino, st.st_dev) != (self.inode, self.device) or st.st_size < self.indexed_size:
+            logger.info(f"Log rotado o truncado, reindexando: {self.path}")
+            self._reset(st)
+
+        if st.st_size > self.indexed_size:
+            self._index_range(self.indexed_size, st.st_size)
+            self._save()
+        return st
+
+    def _index_range(self, start, end):
+        offset = start
+        carry = b''
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            while offset + len(carry) < end:
+                chunk = f.read(min(READ_CHUNK, end - offset - len(carry)))
+                if not chunk:
+                    break
+
+                data = carry + chunk
+                cut = data.rfind(b'\n')
+                if cut < 0:
+                    carry = data
+                    continue
+
+                # Sólo se indexan líneas completas; el resto queda para la próxima
+                carry = data[cut + 1:]
+                for raw in data[:cut + 1].split(b'\n')[:-1]:
+                    timestamp = _line_timestamp(raw)
+                    if timestamp:
+                        self.last_timestamp = timestamp
+                    if self.line_count % INDEX_STRIDE == 0:
+                        self.checkpoints.append([offset, self.last_timestamp])
+                    self.line_count += 1
+                    offset += len(raw) + 1
+
+        self.indexed_size = offset
+
+    def iter_lines(self, start_line, end_line=None):
+        """Genera (número_de_línea, bytes) desde `start_line` saltando al checkpoint más cercano"""
+        end_line = self.line_count if end_line is None else min(end_line, self.line_count)
+        if start_line >= end_line:
+            return
+
+        checkpoint = start_line // INDEX_STRIDE
+        line_no = checkpoint * INDEX_STRIDE
+        with open(self.path, 'rb') as f:
+            f.seek(self.checkpoints[checkpoint][0])
+            for raw in f:
+                if line_no >= end_line:
+                    break
+                if line_no >= start_line:
+                    yield line_no, raw
+                line_no += 1
+
+    def line_for_time(self, since):
+        """Primera línea con timestamp >= `since` ('YYYY-MM-DD HH:MM:SS')"""
+        timestamps = [timestamp or '' for _offset, timestamp in self.checkpoints]
+        checkpoint = max(0, bisect_left(timestamps, since) - 1)
+
+        for line_no, raw in self.iter_lines(checkpoint * INDEX_STRIDE):
+            timestamp = _line_timestamp(raw)
+            if timestamp and timestamp >= since:
+                return line_no
+        return self.line_count
+
+
+class OdooLogReader:
+    """Lectura paginada de logs de Odoo sobre índices por archivo (uno por proceso)"""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index_dir(self):
+        return getattr(Config, 'LOG_INDEX_DIR', None) or os.path.join(Config.DATA_PATH, 'log-index')
+
+    def get_index(self, path):
+        path = os.path.realpath(path)
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is None:
+                digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+                sidecar = os.path.join(self._index_dir(), f'{digest}.json')
+                index = LogIndex(path, sidecar)
+                self._indexes[path] = index
+            return index
+
+    def read_page(self, path, limit, before=None, since=None):
+        """
+        Página de hasta `limit` líneas:
+          - sin cursor: las últimas líneas del archivo
+          - before='<inode>:<línea>': las anteriores a esa línea ("cargar anteriores")
+          - since='YYYY-MM-DD HH:MM:SS': desde la primera línea con ese timestamp
+        Un cursor de otro inode (log rotado) se ignora y se vuelve al final.
+        """
+        index = self.get_index(path)
+        with index.lock:
+            st = index.update()
+
+            end = index.line_count
+            start = None
+            cursor_inode, cursor_line = _parse_cursor(before)
+            if cursor_inode == index.inode and cursor_line is not None:
+                end = min(cursor_line, index.line_count)
+            elif since:
+                start = index.line_for_time(since)
+                end = min(start + limit, index.line_count)
+
+            if start is None:
+                start = max(0, end - limit)
+
+            lines = [(line_no, _decode(raw)) for line_no, raw in index.iter_lines(start, end)]
+
+            return {
+                'lines': lines,
+                'start': start,
+                'end': end,
+                'total_lines': index.line_count,
+                'size': st.st_size,
+                'before': f'{index.inode}:{start}' if start > 0 else None,
+                'after': f'{index.inode}:{end}',
+                # Cursor en bytes para seguir el archivo desde el final de esta página
+                'follow': f'{index.inode}:{index.indexed_size}' if end == index.line_count else None,
+            }
+
+
+def iter_lines_reverse(f, end, block_size=REVERSE_BLOCK):
+    """Genera (offset, bytes) de cada línea desde `end` hacia el inicio del archivo"""
+    pos = end
+    tail = b''
+    while pos > 0:
+        read_size = min(block_size, pos)
+        pos -= read_size
+        f.seek(pos)
+        block = f.read(read_size) + tail
+
+        lines = block.split(b'\n')
+        tail = lines[0]  # Puede estar cortada: se completa con el bloque anterior
+        line_end = pos + len(block)
+        for raw in reversed(lines[1:]):
+            line_start = line_end - len(raw)
+            yield line_start, raw
+            line_end = line_start - 1
+
+    if tail:
+        yield 0, tail
+
+
+def scan_reverse(path, limit, level=None, search=None, logger_name=None,
+                 since=None, until=None, before=None, byte_budget=64 * 1024 * 1024):
+    """
+    Lee el archivo de atrás hacia adelante aplicando los filtros mientras lee.
+    Cada registro (cabecera + líneas de continuación del traceback) se evalúa
+    completo: el nivel, el logger y la fecha salen de la cabecera y la
+    búsqueda se aplica a todo el texto. Se detiene al juntar `limit` líneas,
+    al pasar `since` (las fechas decrecen) o al agotar `byte_budget`.
+    Las estadísticas se calculan en la misma pasada.
+    `before` ('<inode>:@<offset>') continúa un escaneo anterior.
+    """
+    search = search.lower() if search else None
+    st = os.stat(path)
+
+    end = st.st_size
+    cursor_inode, _, cursor_offset = str(before or '').partition(':@')
+    if cursor_inode.isdigit() and cursor_offset.isdigit() and int(cursor_inode) == st.st_ino:
+        end = min(int(cursor_offset), st.st_size)
+
+    matched = []
+    matched_lines = 0
+    stats = new_stats()
+    continuation = []
+    stop_offset = 0
+    more = False
+    budget_exhausted = False
+
+    with open(path, 'rb') as f:
+        for offset, raw in iter_lines_reverse(f, end):
+            line = raw.rstrip(b'\r').decode('utf-8', errors='replace')
+            parsed = parse_log_line(line)
+            if parsed['level'] == 'CONTINUATION':
+                if line.strip():
+                    continuation.append(parsed)
+                continue
+
+            record = [parsed] + continuation[::-1]
+            continuation = []
+            timestamp = parsed['timestamp'][:19]
+
+            if since and timestamp < since:
+                # Lo que sigue es más viejo que `since`: no hay más páginas
+                stop_offset = offset
+                break
+
+            if _record_matches(record, level, search, logger_name, until, timestamp):
+                matched.append(record)
+                matched_lines += len(record)
+                for item in record:
+                    count_line(stats, item)
+
+            budget_exhausted = end - offset >= byte_budget
+            if matched_lines >= limit or budget_exhausted:
+                stop_offset = offset
+                more = offset > 0
+                break
+
+    lines = [item for record in reversed(matched) for item in record]
+    return {
+        'lines': lines,
+        'stats': stats,
+        'scanned_bytes': end - stop_offset,
+        'budget_exhausted': budget_exhausted,
+        'before': f'{st.st_ino}:@{stop_offset}' if more else None,
+        'size': st.st_size,
+    }
+
+
+def _record_matches(record, level, search, logger_name, until, timestamp):
+    header = record[0]
+    if level and header['level'] != level:
+        return False
+    if logger_name and header['logger'] != logger_name and not header['logger'].startswith(logger_name + '.'):
+        return False
+    if until and timestamp >= until:
+        return False
+    if search and not any(search in item['raw'].lower() for item in record):
+        return False
+    return True
+
+
+def _parse_cursor(cursor):
+    if not cursor:
+        return None, None
+    inode, _, line = str(cursor).partition(':')
+    if not inode.isdigit() or not line.isdigit():
+        return None, None
+    return int(inode), int(line)
+
+
+# Instancia global (una por proceso)
+odoo_log_reader = OdooLogReader()
@@ -0,0 +1,102 @@
+import os
+
+# Logs de operaciones largas (creación, actualización, sincronización) que escriben los scripts en /tmp
+CREATION_LOG_TAIL_BYTES = 5000  # Respuesta sin offset (compatibilidad)
+MAX_CHUNK_BYTES = 256 * 1024  # Por respuesta; el resto sale en la siguiente
+
+UPDATE_LOG_ACTIONS = ('update-db', 'update-files', 'sync-filestore', 'regenerate-assets')
+FINAL_STATUSES = ('success', 'error')
+
+
+def creation_log_path(instance_name):
+    return f'/tmp/odoo-create-{instance_name}.log'
+
+
+def update_log_path(instance_name, action):
+    if action not in UPDATE_LOG_ACTIONS:
+        return None
+    return f'/tmp/odoo-{action}-{instance_name}.log'
+
+
+def _complete_utf8_length(data):
+    """Largo de `data` sin una secuencia UTF-8 incompleta al final (el script está escribiendo)"""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # Byte de continuación: seguir buscando el inicio
+        if byte < 0x80:
+            need = 1
+        elif byte >= 0xF0:
+            need = 4
+        elif byte >= 0xE0:
+            need = 3
+        else:
+            need = 2
+        return len(data) if back >= need else len(data) - back
+    return len(data)
+
+
+def read_increment(path, offset, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Bytes agregados a `path` desde `offset`. Si el archivo quedó más chico
+    que el offset (se recreó para una nueva operación) se vuelve a 0 con
+    'reset'. `max_bytes=None` lee hasta el final.
+    Devuelve {'exists', 'log', 'offset', 'next_offset', 'size', 'reset'}.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            reset = offset > size
+            start = 0 if reset else offset
+            f.seek(start)
+            data = f.read(size - start if max_bytes is None else min(max_bytes, size - start))
+    except FileNotFoundError:
+        return {'exists': False, 'log': '', 'offset': offset, 'next_offset': 0, 'size': 0, 'reset': offset > 0}
+
+    if start + len(data) < size and b'\n' in data:
+        data = data[:data.rindex(b'\n') + 1]  # Cortado por `max_bytes`: hasta la última línea completa
+    data = data[:_complete_utf8_length(data)]
+
+    return {
+        'exists': True,
+        'log': data.decode(errors='replace'),
+        'offset': start,
+        'next_offset': start + len(data),
+        'size': size,
+        'reset': reset,
+    }
+
+
+def read_tail(path, tail_bytes):
+    """Últimos `tail_bytes` del archivo (lectura sin offset) con el offset para seguir"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return read_increment(path, 0)
+    return read_increment(path, max(size - tail_bytes, 0), max_bytes=tail_bytes)
+
+
+def read_operation_status(instance_name):
+    """PID y estado de `/tmp/<instancia>.pid|.status` (los escribe el script de creación)"""
+    pid = None
+    try:
+        with open(f'/tmp/{instance_name}.pid', 'r') as f:
+            pid = f.read().strip()
+    except OSError:
+        pid = None
+
+    status = 'running'
+    status_file = f'/tmp/{instance_name}.status'
+    if os.path.exists(status_file):
+        try:
+            with open(status_file, 'r') as f:
+                status = f.read().strip()
+        except OSError:
+            status = 'unknown'
+
+    return {
+        'pid': pid,
+        'status': status,
+        'finished': status == 'success',
+        'error': status == 'error',
+    }
@@ -0,0 +1,54 @@
+import threading
+
+from flask import Response
+
+
+class StreamSlots:
+    """
+    Streams SSE abiertos en este worker. Con gunicorn gthread cada stream
+    ocupa un hilo hasta que termina: el total se limita por debajo de
+    `--threads` para que siempre queden hilos para el resto de la API.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = 0
+
+    def acquire(self, limit):
+        """Toma un lugar sin bloquear; False si el worker ya tiene `limit` streams"""
+        with self._lock:
+            if self._open >= limit:
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._open = max(0, self._open - 1)
+
+    @property
+    def open_streams(self):
+        return self._open
+
+
+stream_slots = StreamSlots()
+
+
+def event_stream(generator, on_close=None):
+    """
+    Response SSE para un lugar ya tomado con `stream_slots.acquire`. El lugar
+    (y `on_close`) se libera cuando el servidor cierra la respuesta, aunque el
+    generador no haya llegado a arrancar.
+    """
+    response = Response(
+        generator,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx: no bufferear el stream
+        }
+    )
+    response.call_on_close(stream_slots.release)
+    if on_close:
+        response.call_on_close(on_close)
+    return response
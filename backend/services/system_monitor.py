@@ -1,3 +1,4 @@
+import os
 import psutil
 import time
 from datetime import datetime
@@ -12,15 +13,21 @@ class SystemMonitor:
     def __init__(self):
         self._last_net_io = None
         self._last_net_time = None
+        self._last_cpu_times = None
     
-    def get_cpu_info(self):
-        """Obtiene información de CPU"""
+    def get_cpu_info(self, interval=1):
+        """Obtiene información de CPU
+        
+        interval=None no bloquea: mide el uso desde la llamada anterior
+        (pensado para el muestreador en segundo plano).
+        """
+        freq = psutil.cpu_freq()
         return {
-            'percent': round(psutil.cpu_percent(interval=1), 2),
+            'percent': round(psutil.cpu_percent(interval=interval), 2),
             'count': psutil.cpu_count(),
             'count_logical': psutil.cpu_count(logical=True),
-            'freq': psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None,
-            'per_cpu': [round(x, 2) for x in psutil.cpu_percent(interval=1, percpu=True)]
+            'freq': freq._asdict() if freq else None,
+            'per_cpu': [round(x, 2) for x in psutil.cpu_percent(interval=interval, percpu=True)]
         }
     
     def get_memory_info(self):
@@ -89,6 +96,34 @@ class SystemMonitor:
         
         return result
     
+    def get_load_info(self):
+        """Carga promedio e iowait (medido desde la llamada anterior)"""
+        times = psutil.cpu_times()
+        iowait = 0.0
+        if self._last_cpu_times is not None:
+            total = sum(times) - sum(self._last_cpu_times)
+            if total > 0:
+                iowait_delta = getattr(times, 'iowait', 0) - getattr(self._last_cpu_times, 'iowait', 0)
+                iowait = round(100 * iowait_delta / total, 2)
+        self._last_cpu_times = times
+
+        load_1, load_5, load_15 = os.getloadavg()
+        cpu_count = psutil.cpu_count() or 1
+        return {
+            'load_1': round(load_1, 2),
+            'load_5': round(load_5, 2),
+            'load_15': round(load_15, 2),
+            'load_per_cpu': round(load_1 / cpu_count, 2),
+            'iowait_percent': iowait,
+            'cpu_count': cpu_count
+        }
+    
+    def get_free_disk_gb(self, path):
+        """Espacio libre (GB) del sistema de archivos que contiene `path` (o su primer ancestro existente)"""
+        while path and not os.path.exists(path):
+            path = os.path.dirname(path)
+        return round(psutil.disk_usage(path or '/').free / (1024**3), 2)
+    
     def get_system_info(self):
         """Obtiene información general del sistema"""
         import platform
@@ -126,12 +161,12 @@ class SystemMonitor:
         
         return " ".join(parts) if parts else "< 1m"
     
-    def get_all_metrics(self):
+    def get_all_metrics(self, cpu_interval=1):
         """Obtiene todas las métricas del sistema"""
         current_time = datetime.now(ARGENTINA_TZ)
         return {
             'timestamp': current_time.isoformat(),
-            'cpu': self.get_cpu_info(),
+            'cpu': self.get_cpu_info(interval=cpu_interval),
             'memory': self.get_memory_info(),
             'disk': self.get_disk_info(),
             'network': self.get_network_info(),
@@ -0,0 +1,181 @@
+import logging
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+UNIT_PATTERN = 'odoo*'
+
+
+def unit_key(service):
+    """Nombre del servicio sin el sufijo .service (como figura en info-instancia.txt)"""
+    return service[:-len('.service')] if service.endswith('.service') else service
+
+
+def map_active_state(active_state):
+    """Traduce ActiveState de systemd al estado que muestra el panel"""
+    if active_state == 'active':
+        return 'active'
+    if active_state in ('inactive', 'failed'):
+        return 'inactive'
+    return 'unknown'
+
+
+class SystemdStatusProvider:
+    """
+    Estado de todos los servicios odoo* con una sola llamada a systemctl.
+    El resultado se cachea `ttl` segundos y las llamadas concurrentes
+    esperan la consulta en curso en lugar de lanzar otra.
+
+    Si la consulta global falla, se consulta unit por unit en paralelo
+    (pool acotado, timeout por consulta y presupuesto total). Lo que no
+    responde a tiempo se devuelve con el último estado conocido marcado
+    como `stale`, o como 'unknown' si nunca se conoció.
+    """
+
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self.probe_timeout = 2
+        self.budget = 3
+        self.max_workers = 8
+        self._lock = threading.Lock()
+        self._states = {}
+        self._fetched_at = 0.0
+        self._ok = False
+        self._executor = None
+        self._last_known = {}
+        self._probed = {}
+
+    def configure(self, config):
+        self.ttl = config.get('INSTANCE_STATUS_TTL_SECONDS', 10)
+        self.probe_timeout = config.get('SYSTEMD_PROBE_TIMEOUT_SECONDS', 2)
+        self.budget = config.get('SYSTEMD_STATUS_BUDGET_SECONDS', 3)
+        self.max_workers = config.get('SYSTEMD_PROBE_WORKERS', 8)
+
+    def get_states(self, max_age=None):
+        """Dict {servicio: {'load', 'active', 'sub', 'description'}} de los units odoo* cargados"""
+        max_age = self.ttl if max_age is None else max_age
+        if time.monotonic() - self._fetched_at < max_age:
+            return self._states
+
+        # Si otra consulta lleva más que el presupuesto, responder con lo último conocido
+        if not self._lock.acquire(timeout=self.budget):
+            return self._states
+
+        try:
+            if time.monotonic() - self._fetched_at < max_age:
+                return self._states
+
+            states, ok = self._fetch()
+            if ok:
+                self._states = states
+                for key, state in states.items():
+                    self._last_known[key] = map_active_state(state['active'])
+            self._ok = ok
+            self._fetched_at = time.monotonic()
+            return self._states
+        finally:
+            self._lock.release()
+
+    def get_statuses(self, services):
+        """{servicio: {'status': ..., 'stale': bool}} para varios servicios a la vez"""
+        keys = {unit_key(service) for service in services if service}
+        states = self.get_states()
+
+        if self._ok:
+            # Un unit no cargado está inactivo (igual que `systemctl is-active`)
+            return {
+                key: {'status': map_active_state(states[key]['active']) if key in states else 'inactive', 'stale': False}
+                for key in keys
+            }
+
+        return self._probe_units(keys)
+
+    def get_status(self, service):
+        """active / inactive / unknown para un servicio"""
+        return self.get_statuses([service])[unit_key(service)]['status']
+
+    def invalidate(self):
+        self._fetched_at = 0.0
+
+    def _probe_units(self, keys):
+        """Fallback: `systemctl is-active` por unit en paralelo dentro del presupuesto"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='systemd-probe')
+
+        results = {}
+        now = time.monotonic()
+        for key in keys:
+            probed = self._probed.get(key)
+            if probed and now - probed[1] < self.ttl:
+                results[key] = {'status': probed[0], 'stale': False}
+
+        futures = {self._executor.submit(self._probe, key): key for key in keys if key not in results}
+        done, pending = wait(futures, timeout=self.budget) if futures else (set(), set())
+        for future in pending:
+            future.cancel()
+
+        for future, key in futures.items():
+            status = future.result() if future in done else None
+            if status is None:
+                last = self._last_known.get(key)
+                results[key] = {'status': last or 'unknown', 'stale': last is not None}
+            else:
+                self._last_known[key] = status
+                self._probed[key] = (status, time.monotonic())
+                results[key] = {'status': status, 'stale': False}
+
+        if pending:
+            logger.warning(f"{len(pending)} consultas de estado systemd excedieron el presupuesto de {self.budget}s")
+        return results
+
+    def _probe(self, key):
+        try:
+            result = subprocess.run(
+                ['/usr/bin/systemctl', 'is-active', key],
+                capture_output=True,
+                text=True,
+                timeout=self.probe_timeout
+            )
+            return map_active_state(result.stdout.strip())
+        except Exception as e:
+            logger.warning(f"Error consultando estado de {key}: {e}")
+            return None
+
+    def _fetch(self):
+        try:
+            result = subprocess.run(
+                ['/usr/bin/systemctl', 'list-units', '--all', '--type=service',
+                 '--plain', '--no-legend', '--no-pager', UNIT_PATTERN],
+                capture_output=True,
+                text=True,
+                timeout=self.probe_timeout
+            )
+        except Exception as e:
+            logger.error(f"Error consultando estado de servicios systemd: {e}")
+            return {}, False
+
+        if result.returncode != 0:
+            logger.error(f"systemctl list-units falló ({result.returncode}): {result.stderr.strip()}")
+            return {}, False
+
+        states = {}
+        for line in result.stdout.splitlines():
+            # Algunas versiones marcan los units fallidos con '●' aun con --plain
+            parts = line.lstrip('●* ').split(None, 4)
+            if len(parts) < 4:
+                continue
+            unit, load, active, sub = parts[:4]
+            states[unit_key(unit)] = {
+                'load': load,
+                'active': active,
+                'sub': sub,
+                'description': parts[4] if len(parts) > 4 else ''
+            }
+        return states, True
+
+
+# Instancia global (una por proceso)
+systemd_status = SystemdStatusProvider()
@@ -1,9 +1,14 @@
-from app import create_app, init_db
+from app import create_app, init_db, start_background_services
 
 app = create_app()
 
 # Inicializar BD al arrancar
 init_db(app)
 
+# Cada worker de gunicorn importa este módulo (sin --preload): el job manager
+# arranca sin esperar una petición HTTP, así los backups que encola el cron
+# se ejecutan aunque nadie use el panel después de un reinicio
+start_background_services(app)
+
 if __name__ == '__main__':
     app.run()
@@ -213,14 +213,18 @@ Environment="PATH=$BACKEND_DIR/venv/bin"
 
 # Configuración de Gunicorn para archivos grandes y operaciones largas
 # -w 4: 4 workers (ajustar según CPU)
+# --threads 8: hilos por worker (gthread); los streams SSE ocupan un hilo cada uno y se
+#   limitan con SSE_MAX_STREAMS_PER_WORKER (6) para dejar hilos libres al resto de la API
 # -b 127.0.0.1:5000: bind a localhost
 # --timeout 600: timeout de 10 minutos para operaciones largas (backups)
 # --max-requests 1000: reiniciar workers después de 1000 requests
 # --max-requests-jitter 50: jitter para evitar reinicio simultáneo
+# (sin --preload: cada worker importa wsgi.py, que inicia el job manager al arrancar)
 # --limit-request-line 8190: límite de línea de request
 # --limit-request-field_size 8190: límite de campo de header
 ExecStart=$BACKEND_DIR/venv/bin/gunicorn \\
     -w 4 \\
+    --threads 8 \\
     -b 127.0.0.1:5000 \\
     --timeout 600 \\
     --max-requests 1000 \\
@@ -234,6 +238,10 @@ ExecStart=$BACKEND_DIR/venv/bin/gunicorn \\
 
 Restart=always
 RestartSec=10
+# Al detener o reiniciar, systemd sólo termina a gunicorn (que cierra sus workers):
+# los jobs del job manager (backups, restores, clonados) siguen en el cgroup y el
+# nuevo proceso los retoma. Con el valor por defecto (control-group) se matarían
+KillMode=process
 
 # Límites de recursos
 LimitNOFILE=65536
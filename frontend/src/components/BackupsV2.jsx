@@ -1,7 +1,8 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { backupV2 } from '../lib/api';
-import { Server, Settings, Download, Trash2, RefreshCw, AlertCircle, Clock, HardDrive, Play, Pause, Database, Upload, Pencil } from 'lucide-react';
+import { formatBytes } from '../lib/utils';
+import { Server, Settings, Download, Trash2, RefreshCw, AlertCircle, Clock, HardDrive, Play, Pause, Database, Upload, Pencil, Package, History } from 'lucide-react';
 import Toast from './Toast';
 
 // Cliente axios local (api.js está gitignored, pero necesitamos enviar payloads nuevos)
@@ -42,7 +43,7 @@ export default function BackupsV2() {
   });
   const [toast, setToast] = useState({ show: false, message: '', type: 'success' });
   const [configModal, setConfigModal] = useState({ show: false, instance: null, config: null });
-  const [backupListModal, setBackupListModal] = useState({ show: false, instance: null, backups: [] });
+  const [backupListModal, setBackupListModal] = useState({ show: false, instance: null, backups: [], snapshots: [], pitr: null });
   const [restoreModal, setRestoreModal] = useState({ show: false, instance: null, backup: null });
   const [backupProgress, setBackupProgress] = useState({});
   const [restoreProgress, setRestoreProgress] = useState({});
@@ -159,7 +160,7 @@ export default function BackupsV2() {
   const handleViewBackups = async (instanceName) => {
     try {
       const response = await backupV2.listBackups(instanceName);
-      setBackupListModal({ show: true, instance: instanceName, backups: response.data.backups || [] });
+      setBackupListModal({ show: true, instance: instanceName, backups: response.data.backups || [], snapshots: response.data.snapshots || [], pitr: response.data.pitr || null });
     } catch (error) {
       setToast({ show: true, message: 'Error al cargar backups', type: 'error' });
     }
@@ -192,6 +193,47 @@ export default function BackupsV2() {
     }
   };
 
+  const handleExportSnapshot = async (instanceName, name) => {
+    try {
+      const response = await backupV2.exportSnapshot(instanceName, name);
+      setToast({ show: true, message: response.data.message || 'Exportación encolada', type: 'success' });
+    } catch (error) {
+      setToast({ show: true, message: error.response?.data?.error || 'Error al exportar snapshot', type: 'error' });
+    }
+  };
+
+  const handleDeleteSnapshot = async (instanceName, name) => {
+    if (!confirm(`¿Eliminar el snapshot ${name}?`)) return;
+    try {
+      await backupV2.deleteSnapshot(instanceName, name);
+      setToast({ show: true, message: 'Snapshot eliminado', type: 'success' });
+      handleViewBackups(instanceName);
+    } catch (error) {
+      setToast({ show: true, message: error.response?.data?.error || 'Error al eliminar snapshot', type: 'error' });
+    }
+  };
+
+  const handleRestorePointInTime = async (instanceName, targetTime) => {
+    if (!confirm(`¿Restaurar ${instanceName} al ${targetTime} en una base nueva?`)) return;
+    try {
+      const response = await backupV2.restorePointInTime(instanceName, targetTime);
+      setToast({ show: true, message: response.data.message || 'Restauración encolada', type: 'success' });
+    } catch (error) {
+      setToast({ show: true, message: error.response?.data?.error || 'Error al restaurar al punto en el tiempo', type: 'error' });
+    }
+  };
+
+  const handleDeletePitrDatabase = async (instanceName, name) => {
+    if (!confirm(`¿Eliminar la base ${name}?`)) return;
+    try {
+      await backupV2.deletePitrDatabase(instanceName, name);
+      setToast({ show: true, message: 'Base eliminada', type: 'success' });
+      handleViewBackups(instanceName);
+    } catch (error) {
+      setToast({ show: true, message: error.response?.data?.error || 'Error al eliminar la base', type: 'error' });
+    }
+  };
+
   const handleRestoreBackup = (instanceName, backup) => {
     setRestoreModal({ show: true, instance: instanceName, backup: backup });
   };
@@ -203,7 +245,7 @@ export default function BackupsV2() {
       await backupV2.restoreBackup(instance, backup.filename);
       setToast({ show: true, message: `Restauración de ${instance} iniciada`, type: 'success' });
       setRestoreModal({ show: false, instance: null, backup: null });
-      setBackupListModal({ show: false, instance: null, backups: [] });
+      setBackupListModal({ show: false, instance: null, backups: [], snapshots: [], pitr: null });
       setTimeout(() => {
         fetchInstances();
         setRestoreProgress({ ...restoreProgress, [instance]: false });
@@ -276,7 +318,7 @@ export default function BackupsV2() {
       )}
 
       {configModal.show && <ConfigModal instance={configModal.instance} config={configModal.config} onClose={() => setConfigModal({ show: false, instance: null, config: null })} onSave={handleSaveConfig} onChange={(field, value) => setConfigModal({ ...configModal, config: { ...configModal.config, [field]: value } })} />}
-      {backupListModal.show && <BackupListModal instance={backupListModal.instance} backups={backupListModal.backups} onClose={() => setBackupListModal({ show: false, instance: null, backups: [] })} onDownload={handleDownloadBackup} onRestore={handleRestoreBackup} onDelete={handleDeleteBackup} onUpload={() => setShowUploadModal({ show: true, instance: backupListModal.instance })} onRename={handleRenameBackup} />}
+      {backupListModal.show && <BackupListModal instance={backupListModal.instance} backups={backupListModal.backups} snapshots={backupListModal.snapshots} pitr={backupListModal.pitr} onRestorePointInTime={handleRestorePointInTime} onDeletePitrDatabase={handleDeletePitrDatabase} onClose={() => setBackupListModal({ show: false, instance: null, backups: [], snapshots: [], pitr: null })} onExportSnapshot={handleExportSnapshot} onDeleteSnapshot={handleDeleteSnapshot} onDownload={handleDownloadBackup} onRestore={handleRestoreBackup} onDelete={handleDeleteBackup} onUpload={() => setShowUploadModal({ show: true, instance: backupListModal.instance })} onRename={handleRenameBackup} />}
       {restoreModal.show && <RestoreConfirmModal instance={restoreModal.instance} backup={restoreModal.backup} onClose={() => setRestoreModal({ show: false, instance: null, backup: null })} onConfirm={handleConfirmRestore} />}
       {showUploadModal.show && <UploadModal instance={showUploadModal.instance} onClose={() => setShowUploadModal({ show: false, instance: null })} onUpload={handleUploadBackup} />}
       {toast.show && <Toast message={toast.message} type={toast.type} onClose={() => setToast({ show: false, message: '', type: 'success' })} />}
@@ -411,6 +453,14 @@ function ConfigModal({ instance, config, onClose, onSave, onChange }) {
           <input type="number" value={config.retention_days} onChange={(e) => onChange('retention_days', parseInt(e.target.value))} min="1" max="365" className="w-full px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-lg focus:ring-2 focus:ring-blue-500 bg-white dark:bg-gray-700 text-gray-900 dark:text-white" />
         </div>
 
+        <div className="mb-4">
+          <label className="block text-sm font-medium text-gray-700 dark:text-gray-300 mb-2">Modo</label>
+          <select value={config.backup_mode || 'full'} onChange={(e) => onChange('backup_mode', e.target.value)} className="w-full px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-lg focus:ring-2 focus:ring-blue-500 bg-white dark:bg-gray-700 text-gray-900 dark:text-white">
+            <option value="full">Completo (.tar.gz por backup)</option>
+            <option value="incremental">Incremental (filestore deduplicado)</option>
+          </select>
+        </div>
+
         <div className="mb-6">
           <label className="block text-sm font-medium text-gray-700 dark:text-gray-300 mb-2">Prioridad</label>
           <select value={config.priority} onChange={(e) => onChange('priority', e.target.value)} className="w-full px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-lg focus:ring-2 focus:ring-blue-500 bg-white dark:bg-gray-700 text-gray-900 dark:text-white">
@@ -430,7 +480,9 @@ function ConfigModal({ instance, config, onClose, onSave, onChange }) {
   );
 }
 
-function BackupListModal({ instance, backups, onClose, onDownload, onRestore, onDelete, onUpload, onRename }) {
+function BackupListModal({ instance, backups, snapshots = [], pitr = null, onClose, onDownload, onRestore, onDelete, onUpload, onRename, onExportSnapshot, onDeleteSnapshot, onRestorePointInTime, onDeletePitrDatabase }) {
+  const [targetTime, setTargetTime] = useState('');
+
   return (
     <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center z-50">
       <div className="bg-white dark:bg-gray-800 rounded-lg p-6 w-full max-w-4xl max-h-[90vh] overflow-y-auto">
@@ -451,6 +503,11 @@ function BackupListModal({ instance, backups, onClose, onDownload, onRestore, on
                 <div className="flex-1">
                   <div className="font-medium text-gray-900 dark:text-white">{backup.filename}</div>
                   <div className="text-sm text-gray-600 dark:text-gray-400 mt-1">{backup.date} • {backup.size_human}</div>
+                  {backup.manifest && (
+                    <div className="text-xs text-gray-500 dark:text-gray-400 mt-1" title={backup.checksum ? `SHA-256: ${backup.checksum}` : undefined}>
+                      {backup.manifest.has_dump ? `BD ${formatBytes(backup.manifest.dump_size)}` : 'Sin dump.sql'} • {backup.manifest.filestore_files} archivos de filestore ({formatBytes(backup.manifest.filestore_size)}) • {formatBytes(backup.manifest.uncompressed_size)} sin comprimir
+                    </div>
+                  )}
                 </div>
                 <div className="flex gap-2">
                   <button onClick={() => onDownload(instance, backup.filename)} className="p-2 text-blue-600 dark:text-blue-400 hover:bg-blue-50 dark:hover:bg-blue-900/20 rounded-lg transition-colors" title="Descargar">
@@ -471,6 +528,81 @@ function BackupListModal({ instance, backups, onClose, onDownload, onRestore, on
           </div>
         )}
 
+        {snapshots.length > 0 && (
+          <div className="mt-6">
+            <h4 className="text-sm font-semibold text-gray-700 dark:text-gray-300 mb-2">Snapshots incrementales</h4>
+            <div className="space-y-2">
+              {snapshots.map(snapshot => (
+                <div key={snapshot.name} className="flex items-center justify-between p-4 bg-gray-50 dark:bg-gray-700 rounded-lg">
+                  <div className="flex-1">
+                    <div className="font-medium text-gray-900 dark:text-white">{snapshot.name}</div>
+                    <div className="text-sm text-gray-600 dark:text-gray-400 mt-1">
+                      {snapshot.date} • {snapshot.file_count} archivos ({snapshot.filestore_size_human}) • BD {snapshot.dump_size_human} • nuevo: {snapshot.stored_size_human}
+                    </div>
+                  </div>
+                  <div className="flex gap-2">
+                    <button onClick={() => onExportSnapshot(instance, snapshot.name)} className="p-2 text-blue-600 dark:text-blue-400 hover:bg-blue-50 dark:hover:bg-blue-900/20 rounded-lg transition-colors" title="Exportar a .tar.gz">
+                      <Package className="w-4 h-4" />
+                    </button>
+                    <button onClick={() => onDeleteSnapshot(instance, snapshot.name)} className="p-2 text-red-600 dark:text-red-400 hover:bg-red-50 dark:hover:bg-red-900/20 rounded-lg transition-colors" title="Eliminar">
+                      <Trash2 className="w-4 h-4" />
+                    </button>
+                  </div>
+                </div>
+              ))}
+            </div>
+          </div>
+        )}
+
+        {pitr && (
+          <div className="mt-6">
+            <h4 className="text-sm font-semibold text-gray-700 dark:text-gray-300 mb-2">Recuperación a un punto en el tiempo</h4>
+            {pitr.error ? (
+              <p className="text-sm text-red-600 dark:text-red-400">{pitr.error}</p>
+            ) : (
+              <div className="p-4 bg-gray-50 dark:bg-gray-700 rounded-lg space-y-3">
+                <div className="text-sm text-gray-600 dark:text-gray-400">
+                  {pitr.recovery_window
+                    ? `Ventana: ${pitr.recovery_window.from} → ${pitr.recovery_window.to} • ${pitr.base_backup_count} backups base`
+                    : 'Sin backups base todavía'}
+                  {pitr.restart_required && ' • Reiniciar PostgreSQL para activar archive_mode'}
+                  {pitr.failed_count > 0 && ` • ${pitr.failed_count} WAL con error de archivo`}
+                </div>
+                {pitr.recovery_window && (
+                  <div className="flex gap-2">
+                    <input
+                      type="datetime-local"
+                      step="1"
+                      value={targetTime}
+                      onChange={(e) => setTargetTime(e.target.value)}
+                      className="flex-1 px-3 py-2 border border-gray-300 dark:border-gray-600 rounded-lg bg-white dark:bg-gray-800 text-gray-900 dark:text-white"
+                    />
+                    <button
+                      onClick={() => onRestorePointInTime(instance, targetTime.replace('T', ' '))}
+                      disabled={!targetTime}
+                      className="px-4 py-2 bg-green-600 hover:bg-green-700 text-white rounded-lg transition-colors flex items-center gap-2 disabled:opacity-50"
+                    >
+                      <History className="w-4 h-4" />
+                      Restaurar en base nueva
+                    </button>
+                  </div>
+                )}
+                {pitr.restored_databases.map(database => (
+                  <div key={database.name} className="flex items-center justify-between">
+                    <div className="text-sm">
+                      <span className="font-medium text-gray-900 dark:text-white">{database.name}</span>
+                      <span className="text-gray-600 dark:text-gray-400"> • estado al {database.target_time}</span>
+                    </div>
+                    <button onClick={() => onDeletePitrDatabase(instance, database.name)} className="p-2 text-red-600 dark:text-red-400 hover:bg-red-50 dark:hover:bg-red-900/20 rounded-lg transition-colors" title="Eliminar">
+                      <Trash2 className="w-4 h-4" />
+                    </button>
+                  </div>
+                ))}
+              </div>
+            )}
+          </div>
+        )}
+
         <div className="mt-6 flex gap-3">
           <button onClick={onUpload} className="flex-1 px-4 py-2 bg-purple-600 hover:bg-purple-700 text-white rounded-lg transition-colors flex items-center justify-center gap-2">
             <Upload className="w-4 h-4" />
@@ -1,5 +1,7 @@
 import { useEffect, useMemo, useState } from 'react';
 import { metrics } from '../lib/api';
+import InstanceUsage from './InstanceUsage';
+import TopErrors from './TopErrors';
 import { Cpu, HardDrive, Activity, Network, Clock } from 'lucide-react';
 import { Area, AreaChart, CartesianGrid, Line, LineChart, ReferenceLine, ResponsiveContainer, Tooltip, XAxis, YAxis } from 'recharts';
 
@@ -89,24 +91,68 @@ export default function Dashboard() {
     }
   }, [rangeMinutes]);
 
+  // Métricas actuales por stream (una muestra compartida en el servidor);
+  // si el stream falla se vuelve a polling hasta poder reconectar
   useEffect(() => {
-    fetchMetrics();
-    const interval = setInterval(fetchMetrics, 15000);
+    const controller = new AbortController();
+    let pollingInterval = null;
+    let reconnectTimeout = null;
+
+    const fetchCurrent = async () => {
+      try {
+        const current = await metrics.getCurrent();
+        setCurrentMetrics(current.data);
+      } catch (error) {
+        console.error('Error fetching metrics:', error);
+      } finally {
+        setLoading(false);
+      }
+    };
+
+    const connect = async () => {
+      try {
+        await metrics.stream((data) => {
+          if (pollingInterval) {
+            clearInterval(pollingInterval);
+            pollingInterval = null;
+          }
+          setCurrentMetrics(data);
+          setLoading(false);
+        }, controller.signal);
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Error en stream de métricas:', error);
+        if (!pollingInterval) {
+          fetchCurrent();
+          pollingInterval = setInterval(fetchCurrent, 15000);
+        }
+      }
+
+      if (!controller.signal.aborted) {
+        reconnectTimeout = setTimeout(connect, 3000);
+      }
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      if (pollingInterval) clearInterval(pollingInterval);
+      if (reconnectTimeout) clearTimeout(reconnectTimeout);
+    };
+  }, []);
+
+  useEffect(() => {
+    fetchHistory();
+    const interval = setInterval(fetchHistory, 15000);
     return () => clearInterval(interval);
   }, [rangeMinutes]);
 
-  const fetchMetrics = async () => {
+  const fetchHistory = async () => {
     try {
-      const [current, hist] = await Promise.all([
-        metrics.getCurrent(),
-        metrics.getHistory(rangeMinutes)
-      ]);
-      setCurrentMetrics(current.data);
+      const hist = await metrics.getHistory(rangeMinutes);
       setHistory(hist.data.metrics || []);
-      setLoading(false);
     } catch (error) {
-      console.error('Error fetching metrics:', error);
-      setLoading(false);
+      console.error('Error fetching metrics history:', error);
     }
   };
 
@@ -474,6 +520,10 @@ export default function Dashboard() {
         </div>
       </div>
 
+      <InstanceUsage rangeMinutes={rangeMinutes} />
+
+      <TopErrors />
+
       {/* Discos */}
       {disk.length > 0 && (
         <div className="bg-white dark:bg-gray-800 rounded-lg shadow p-6">
@@ -0,0 +1,160 @@
+import { useEffect, useState } from 'react';
+import { metrics } from '../lib/api';
+import { Server } from 'lucide-react';
+import { CartesianGrid, Line, LineChart, ResponsiveContainer, Tooltip, XAxis, YAxis } from 'recharts';
+
+const TOP_METRICS = [
+  { key: 'cpu_percent', label: 'CPU' },
+  { key: 'rss_mb', label: 'RAM' },
+  { key: 'io_write_mb_s', label: 'IO' },
+  { key: 'tcp_connections', label: 'Conexiones' },
+];
+
+const formatTime = (value, rangeMinutes) => {
+  if (!value) return '';
+  const date = new Date(value);
+  if (rangeMinutes <= 1440) {
+    return date.toLocaleTimeString('es-AR', { hour: '2-digit', minute: '2-digit' });
+  }
+  return date.toLocaleDateString('es-AR', { day: '2-digit', month: '2-digit' });
+};
+
+const formatValue = (value, digits = 1) => (value === null || value === undefined ? '-' : Number(value).toFixed(digits));
+
+export default function InstanceUsage({ rangeMinutes }) {
+  const [topMetric, setTopMetric] = useState('cpu_percent');
+  const [topInstances, setTopInstances] = useState([]);
+  const [selected, setSelected] = useState(null);
+  const [history, setHistory] = useState([]);
+
+  useEffect(() => {
+    const fetchTop = async () => {
+      try {
+        const response = await metrics.getTopInstances(topMetric);
+        const items = response.data.instances || [];
+        setTopInstances(items);
+        setSelected((current) => current || items[0]?.instance_name || null);
+      } catch (error) {
+        console.error('Error fetching top instances:', error);
+      }
+    };
+
+    fetchTop();
+    const interval = setInterval(fetchTop, 30000);
+    return () => clearInterval(interval);
+  }, [topMetric]);
+
+  useEffect(() => {
+    if (!selected) return undefined;
+
+    const fetchHistory = async () => {
+      try {
+        const response = await metrics.getInstanceHistory(selected, rangeMinutes);
+        setHistory(response.data.metrics || []);
+      } catch (error) {
+        console.error('Error fetching instance metrics history:', error);
+      }
+    };
+
+    fetchHistory();
+    const interval = setInterval(fetchHistory, 30000);
+    return () => clearInterval(interval);
+  }, [selected, rangeMinutes]);
+
+  if (topInstances.length === 0) {
+    return null;
+  }
+
+  return (
+    <div className="bg-white dark:bg-gray-800 rounded-lg shadow p-6">
+      <div className="flex flex-wrap items-center justify-between gap-2 mb-4">
+        <div className="flex items-center gap-2">
+          <Server className="w-5 h-5 text-gray-600 dark:text-gray-300" />
+          <h3 className="text-lg font-semibold text-gray-900 dark:text-white">Consumo por instancia (últimos 5 min)</h3>
+        </div>
+        <div className="flex gap-2">
+          {TOP_METRICS.map((option) => (
+            <button
+              key={option.key}
+              type="button"
+              onClick={() => setTopMetric(option.key)}
+              className={`px-3 py-1 text-xs rounded-md border transition-colors ${
+                topMetric === option.key
+                  ? 'bg-blue-600 text-white border-blue-600'
+                  : 'bg-white dark:bg-gray-900 text-gray-700 dark:text-gray-200 border-gray-300 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-800'
+              }`}
+            >
+              {option.label}
+            </button>
+          ))}
+        </div>
+      </div>
+
+      <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
+        <table className="w-full text-sm">
+          <thead>
+            <tr className="text-left text-gray-500 dark:text-gray-400">
+              <th className="py-1">Instancia</th>
+              <th className="py-1 text-right">CPU %</th>
+              <th className="py-1 text-right">RAM MB</th>
+              <th className="py-1 text-right">IO MB/s (r/w)</th>
+              <th className="py-1 text-right">Archivos</th>
+              <th className="py-1 text-right">Conexiones</th>
+            </tr>
+          </thead>
+          <tbody>
+            {topInstances.map((item) => (
+              <tr
+                key={item.instance_name}
+                onClick={() => setSelected(item.instance_name)}
+                className={`cursor-pointer border-t border-gray-200 dark:border-gray-700 ${
+                  selected === item.instance_name ? 'bg-blue-50 dark:bg-gray-700' : 'hover:bg-gray-50 dark:hover:bg-gray-900'
+                }`}
+              >
+                <td className="py-1 font-medium text-gray-900 dark:text-white">{item.instance_name}</td>
+                <td className="py-1 text-right text-gray-700 dark:text-gray-200">{formatValue(item.cpu_percent)}</td>
+                <td className="py-1 text-right text-gray-700 dark:text-gray-200">{formatValue(item.rss_mb, 0)}</td>
+                <td className="py-1 text-right text-gray-700 dark:text-gray-200">
+                  {formatValue(item.io_read_mb_s, 2)} / {formatValue(item.io_write_mb_s, 2)}
+                </td>
+                <td className="py-1 text-right text-gray-700 dark:text-gray-200">{formatValue(item.open_files, 0)}</td>
+                <td className="py-1 text-right text-gray-700 dark:text-gray-200">{formatValue(item.tcp_connections, 0)}</td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+
+        {selected && (
+          <div className="bg-zinc-900 border border-zinc-700 rounded-lg p-4">
+            <h4 className="text-sm font-semibold text-zinc-100 mb-3">{selected} · CPU % y RAM MB</h4>
+            <ResponsiveContainer width="100%" height={200}>
+              <LineChart data={history}>
+                <CartesianGrid stroke="#3f3f46" strokeDasharray="2 2" />
+                <XAxis
+                  dataKey="timestamp"
+                  tickFormatter={(value) => formatTime(value, rangeMinutes)}
+                  tick={{ fill: '#d4d4d8', fontSize: 11 }}
+                  axisLine={{ stroke: '#52525b' }}
+                  tickLine={{ stroke: '#52525b' }}
+                />
+                <YAxis yAxisId="cpu" tick={{ fill: '#d4d4d8', fontSize: 11 }} axisLine={{ stroke: '#52525b' }} tickLine={{ stroke: '#52525b' }} />
+                <YAxis yAxisId="ram" orientation="right" tick={{ fill: '#d4d4d8', fontSize: 11 }} axisLine={{ stroke: '#52525b' }} tickLine={{ stroke: '#52525b' }} />
+                <Tooltip
+                  labelFormatter={(value) => new Date(value).toLocaleString('es-AR')}
+                  formatter={(value, name) => [
+                    formatValue(value, name === 'cpu_percent' ? 2 : 0),
+                    name === 'cpu_percent' ? 'CPU %' : 'RAM MB'
+                  ]}
+                  contentStyle={{ backgroundColor: '#18181b', borderColor: '#3f3f46', borderRadius: '8px' }}
+                  labelStyle={{ color: '#fafafa' }}
+                />
+                <Line yAxisId="cpu" type="monotone" dataKey="cpu_percent" stroke="#22c55e" strokeWidth={2} dot={false} name="cpu_percent" />
+                <Line yAxisId="ram" type="monotone" dataKey="rss_mb" stroke="#38bdf8" strokeWidth={2} dot={false} name="rss_mb" />
+              </LineChart>
+            </ResponsiveContainer>
+          </div>
+        )}
+      </div>
+    </div>
+  );
+}
@@ -39,6 +39,7 @@ export default function Instances() {
   const [selectedSourceInstance, setSelectedSourceInstance] = useState('');
   const [neutralizeDatabase, setNeutralizeDatabase] = useState(true);
   const [gitBranch, setGitBranch] = useState('');
+  const [sourceDatabase, setSourceDatabase] = useState('');
   const [selectedInstance, setSelectedInstance] = useState(null);
   const [logs, setLogs] = useState('');
   const [activeLogTab, setActiveLogTab] = useState('systemd');
@@ -197,7 +198,7 @@ export default function Instances() {
 
     setActionLoading({ create: true });
     try {
-      const response = await instances.create(newInstanceName, selectedSourceInstance, neutralizeDatabase, gitBranch);
+      const response = await instances.create(newInstanceName, selectedSourceInstance, neutralizeDatabase, gitBranch, sourceDatabase);
       setShowCreateModal(false);
       
       // Usar el nombre completo de la instancia que devuelve el backend
@@ -208,6 +209,7 @@ export default function Instances() {
       
       setNewInstanceName('');
       setGitBranch('');
+      setSourceDatabase('');
     } catch (error) {
       setToast({ show: true, message: error.response?.data?.error || 'Error al crear la instancia', type: 'error' });
     } finally {
@@ -477,6 +479,8 @@ export default function Instances() {
         setNeutralizeDatabase={setNeutralizeDatabase}
         gitBranch={gitBranch}
         setGitBranch={setGitBranch}
+        sourceDatabase={sourceDatabase}
+        setSourceDatabase={setSourceDatabase}
         productionInstances={productionInstances}
         actionLoading={actionLoading}
       />
@@ -2,8 +2,9 @@ import { useState, useEffect, useRef, useCallback } from 'react';
 import { 
   Terminal, RefreshCw, Search, Filter, Download, 
   ChevronDown, AlertTriangle, AlertCircle, Info,
-  Bug, X, ArrowDown, Pause, Play, FileText
+  Bug, X, ArrowDown, ArrowUp, Pause, Play, FileText
 } from 'lucide-react';
+import { odooLogs } from '../lib/api';
 
 const LEVEL_COLORS = {
   DEBUG: { bg: 'bg-gray-800', text: 'text-gray-400', badge: 'bg-gray-600 text-gray-200' },
@@ -23,6 +24,18 @@ const LEVEL_ICONS = {
 };
 
 const LOG_VIEWER_STORAGE_KEY_PREFIX = 'api-dev.log-viewer';
+const MAX_FOLLOW_LINES = 20000;
+const FOLLOW_RECONNECT_MS = 3000;
+
+// Suma a las estadísticas los niveles de las líneas recibidas en vivo
+const addLineStats = (stats, lines) => {
+  const next = { ...stats, total: (stats.total || 0) + lines.length };
+  lines.forEach((line) => {
+    const key = line.level?.toLowerCase();
+    if (key && key !== 'continuation') next[key] = (next[key] || 0) + 1;
+  });
+  return next;
+};
 
 const getLogViewerStorageKey = (instanceName) => `${LOG_VIEWER_STORAGE_KEY_PREFIX}.${instanceName || 'global'}`;
 
@@ -40,9 +53,11 @@ export default function LogViewer({ instanceName, onClose }) {
   const [autoRefresh, setAutoRefresh] = useState(false);
   const [autoScroll, setAutoScroll] = useState(true);
   const [linesCount, setLinesCount] = useState(500);
+  const [cursor, setCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   
   const logContainerRef = useRef(null);
-  const autoRefreshRef = useRef(null);
+  const followCursorRef = useRef(null);
 
   useEffect(() => {
     try {
@@ -122,6 +137,8 @@ export default function LogViewer({ instanceName, onClose }) {
         setLogs(data.lines);
         setStats(data.stats);
         setFileInfo(data.file_info);
+        setCursor(data.cursor || null);
+        followCursorRef.current = data.cursor?.follow || null;
       } else {
         setError(data.error || 'Error al cargar logs');
       }
@@ -132,6 +149,42 @@ export default function LogViewer({ instanceName, onClose }) {
     }
   }, [instanceName, selectedLogType, linesCount, levelFilter, searchQuery]);
 
+  const loadOlder = async () => {
+    if (!cursor?.before) return;
+    setLoadingOlder(true);
+    try {
+      const params = new URLSearchParams({
+        type: selectedLogType,
+        lines: linesCount.toString(),
+        before: cursor.before,
+      });
+      if (levelFilter) params.append('level', levelFilter);
+      if (searchQuery) params.append('search', searchQuery);
+
+      const response = await fetch(`/api/odoo-logs/view/${instanceName}?${params}`, {
+        headers: { 'Authorization': `Bearer ${getToken()}` }
+      });
+      const data = await response.json();
+
+      if (data.success) {
+        setAutoScroll(false);
+        setLogs(prev => [...data.lines, ...prev]);
+        setStats(prev => addLineStats(prev, data.lines));
+        setCursor(prev => ({
+          ...prev,
+          before: data.cursor?.before || null,
+          budget_exhausted: data.cursor?.budget_exhausted,
+        }));
+      } else {
+        setError(data.error || 'Error al cargar logs anteriores');
+      }
+    } catch (err) {
+      setError('Error de conexión al cargar logs anteriores');
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   useEffect(() => {
     fetchAvailableLogs();
   }, [fetchAvailableLogs]);
@@ -147,15 +200,44 @@ export default function LogViewer({ instanceName, onClose }) {
   }, [logs, autoScroll]);
 
   useEffect(() => {
-    if (autoRefresh) {
-      autoRefreshRef.current = setInterval(fetchLogs, 5000);
-    } else {
-      if (autoRefreshRef.current) clearInterval(autoRefreshRef.current);
-    }
-    return () => {
-      if (autoRefreshRef.current) clearInterval(autoRefreshRef.current);
+    if (!autoRefresh) return undefined;
+
+    // Stream con sólo las líneas nuevas desde el último cursor recibido (archivo o journal)
+    const controller = new AbortController();
+    const onEvent = (event, data) => {
+      if (data.cursor) followCursorRef.current = data.cursor;
+
+      if (event === 'reset') {
+        // Log rotado o truncado: el stream sigue desde el inicio del archivo nuevo
+        setLogs([]);
+        setStats({});
+        setCursor(null);
+      } else if (event === 'lines') {
+        setLogs(prev => [...prev, ...data.lines].slice(-MAX_FOLLOW_LINES));
+        setStats(prev => addLineStats(prev, data.lines));
+      }
     };
-  }, [autoRefresh, fetchLogs]);
+
+    const follow = async () => {
+      while (!controller.signal.aborted) {
+        const params = { type: selectedLogType };
+        if (followCursorRef.current) params.cursor = followCursorRef.current;
+        if (levelFilter) params.level = levelFilter;
+        if (searchQuery) params.search = searchQuery;
+
+        try {
+          await odooLogs.follow(instanceName, params, onEvent, controller.signal);
+        } catch (err) {
+          if (controller.signal.aborted) return;
+          console.error('Error siguiendo logs:', err);
+        }
+        await new Promise(resolve => setTimeout(resolve, FOLLOW_RECONNECT_MS));
+      }
+    };
+    follow();
+
+    return () => controller.abort();
+  }, [autoRefresh, instanceName, selectedLogType, levelFilter, searchQuery]);
 
   const handleSearch = (e) => {
     e.preventDefault();
@@ -321,7 +403,7 @@ export default function LogViewer({ instanceName, onClose }) {
                   ? 'bg-green-600/30 text-green-400 hover:bg-green-600/50' 
                   : 'text-gray-400 hover:text-white hover:bg-gray-700'
               }`}
-              title={autoRefresh ? 'Detener auto-refresh (5s)' : 'Activar auto-refresh (5s)'}
+              title={autoRefresh ? 'Detener seguimiento en vivo' : 'Seguir en vivo'}
             >
               {autoRefresh ? <Pause className="w-4 h-4" /> : <Play className="w-4 h-4" />}
             </button>
@@ -378,7 +460,16 @@ export default function LogViewer({ instanceName, onClose }) {
             {stats.error > 0 && <span className="text-red-400">● {stats.error} ERROR</span>}
             {stats.critical > 0 && <span className="text-red-300">● {stats.critical} CRITICAL</span>}
             {stats.debug > 0 && <span className="text-gray-400">● {stats.debug} DEBUG</span>}
-            {autoRefresh && <span className="text-green-400 ml-auto">⟳ Auto-refresh cada 5s</span>}
+            {cursor?.budget_exhausted && (
+              <span className="text-yellow-500" title="Se alcanzó el límite de lectura; cargá anteriores para seguir buscando">
+                búsqueda parcial
+              </span>
+            )}
+            {autoRefresh && (
+              <span className="text-green-400 ml-auto">
+                ● En vivo
+              </span>
+            )}
           </div>
         )}
 
@@ -401,8 +492,28 @@ export default function LogViewer({ instanceName, onClose }) {
               No se encontraron logs
               {levelFilter && ` con nivel ${levelFilter}`}
               {searchQuery && ` que contengan "${searchQuery}"`}
+              {cursor?.before && (
+                <button
+                  onClick={loadOlder}
+                  disabled={loadingOlder}
+                  className="ml-2 text-blue-400 hover:text-blue-300 underline disabled:opacity-50"
+                >
+                  {loadingOlder ? 'Buscando...' : 'seguir buscando en líneas anteriores'}
+                </button>
+              )}
             </div>
           ) : (
+            <>
+            {cursor?.before && (
+              <button
+                onClick={loadOlder}
+                disabled={loadingOlder}
+                className="w-full py-1.5 text-xs text-gray-400 hover:text-white hover:bg-gray-800 border-b border-gray-800 flex items-center justify-center gap-1 disabled:opacity-50"
+              >
+                <ArrowUp className="w-3 h-3" />
+                {loadingOlder ? 'Cargando...' : `Cargar ${linesCount} líneas anteriores`}
+              </button>
+            )}
             <table className="w-full">
               <tbody>
                 {logs.map((line, idx) => {
@@ -411,12 +522,12 @@ export default function LogViewer({ instanceName, onClose }) {
                   
                   return (
                     <tr
-                      key={idx}
+                      key={line.line_no ?? idx}
                       className={`${colors.bg} hover:bg-gray-800/50 border-b border-gray-800/30`}
                     >
                       {/* Número de línea */}
                       <td className="text-gray-600 text-right pr-3 pl-3 py-0.5 select-none w-12 align-top">
-                        {idx + 1}
+                        {line.line_no ?? idx + 1}
                       </td>
                       
                       {/* Timestamp */}
@@ -450,6 +561,7 @@ export default function LogViewer({ instanceName, onClose }) {
                 })}
               </tbody>
             </table>
+            </>
           )}
         </div>
 
@@ -461,6 +573,7 @@ export default function LogViewer({ instanceName, onClose }) {
           </span>
           <span>
             {loading ? 'Actualizando...' : `${logs.length} líneas cargadas`}
+            {cursor?.total_lines > 0 && ` de ${cursor.total_lines}`}
           </span>
         </div>
       </div>
@@ -0,0 +1,119 @@
+import { useEffect, useState } from 'react';
+import { odooLogs } from '../lib/api';
+import { AlertCircle } from 'lucide-react';
+
+const ENV_OPTIONS = [
+  { key: 'production', label: 'Producción' },
+  { key: 'development', label: 'Desarrollo' },
+  { key: '', label: 'Todas' },
+];
+
+export default function TopErrors({ days = 7 }) {
+  const [env, setEnv] = useState('production');
+  const [errors, setErrors] = useState([]);
+  const [selected, setSelected] = useState(null);
+  const [detail, setDetail] = useState(null);
+
+  useEffect(() => {
+    const fetchTop = async () => {
+      try {
+        const params = { days, limit: 10 };
+        if (env) params.env = env;
+        const response = await odooLogs.getTopErrors(params);
+        setErrors(response.data.errors || []);
+      } catch (error) {
+        console.error('Error fetching top errors:', error);
+      }
+    };
+
+    fetchTop();
+    const interval = setInterval(fetchTop, 60000);
+    return () => clearInterval(interval);
+  }, [env, days]);
+
+  useEffect(() => {
+    if (!selected) {
+      setDetail(null);
+      return;
+    }
+
+    odooLogs.getErrorGroup(selected, days)
+      .then((response) => setDetail(response.data.error))
+      .catch((error) => console.error('Error fetching error group:', error));
+  }, [selected, days]);
+
+  if (errors.length === 0) {
+    return null;
+  }
+
+  return (
+    <div className="bg-white dark:bg-gray-800 rounded-lg shadow p-6">
+      <div className="flex flex-wrap items-center justify-between gap-2 mb-4">
+        <div className="flex items-center gap-2">
+          <AlertCircle className="w-5 h-5 text-red-500" />
+          <h3 className="text-lg font-semibold text-gray-900 dark:text-white">Errores más frecuentes (últimos {days} días)</h3>
+        </div>
+        <div className="flex gap-2">
+          {ENV_OPTIONS.map((option) => (
+            <button
+              key={option.key}
+              type="button"
+              onClick={() => setEnv(option.key)}
+              className={`px-3 py-1 text-xs rounded-md border transition-colors ${
+                env === option.key
+                  ? 'bg-blue-600 text-white border-blue-600'
+                  : 'bg-white dark:bg-gray-900 text-gray-700 dark:text-gray-200 border-gray-300 dark:border-gray-700 hover:bg-gray-50 dark:hover:bg-gray-800'
+              }`}
+            >
+              {option.label}
+            </button>
+          ))}
+        </div>
+      </div>
+
+      <table className="w-full text-sm">
+        <thead>
+          <tr className="text-left text-gray-500 dark:text-gray-400">
+            <th className="py-1">Error</th>
+            <th className="py-1 text-right">Ocurrencias</th>
+            <th className="py-1 text-right">Instancias</th>
+            <th className="py-1 text-right">Última vez</th>
+          </tr>
+        </thead>
+        <tbody>
+          {errors.map((item) => (
+            <tr
+              key={item.fingerprint}
+              onClick={() => setSelected(selected === item.fingerprint ? null : item.fingerprint)}
+              className={`cursor-pointer border-t border-gray-200 dark:border-gray-700 ${
+                selected === item.fingerprint ? 'bg-blue-50 dark:bg-gray-700' : 'hover:bg-gray-50 dark:hover:bg-gray-900'
+              }`}
+            >
+              <td className="py-1 pr-3">
+                <div className="font-medium text-gray-900 dark:text-white truncate max-w-xl" title={item.title}>{item.title}</div>
+                <div className="text-xs text-gray-500 dark:text-gray-400">{item.logger}</div>
+              </td>
+              <td className="py-1 text-right text-gray-700 dark:text-gray-200">{item.count}</td>
+              <td className="py-1 text-right text-gray-700 dark:text-gray-200" title={item.instances.join(', ')}>
+                {item.instance_count}
+              </td>
+              <td className="py-1 text-right text-gray-700 dark:text-gray-200 whitespace-nowrap">{item.last_seen_in_range}</td>
+            </tr>
+          ))}
+        </tbody>
+      </table>
+
+      {detail && (
+        <div className="mt-4 bg-zinc-900 border border-zinc-700 rounded-lg p-4 text-xs">
+          <div className="text-zinc-300 mb-2">
+            Primera vez: {detail.first_seen} · Última vez: {detail.last_seen} ·{' '}
+            {detail.instances.map((row) => `${row.instance} (${row.count})`).join(', ')}
+          </div>
+          {detail.sample && (
+            <pre className="text-red-300 whitespace-pre-wrap break-all max-h-64 overflow-auto">{detail.sample}</pre>
+          )}
+        </div>
+      )}
+    </div>
+  );
+}
@@ -72,8 +72,11 @@ export default function InstanceCard({
         <div className="flex-1 min-w-0">
           <div className="flex items-center gap-2 flex-wrap">
             <h4 className="font-semibold text-gray-900 dark:text-white">{instance.name}</h4>
-            <span className={`px-2 py-1 text-xs rounded-full ${statusBg} ${statusColor}`}>
-              {instance.status}
+            <span
+              className={`px-2 py-1 text-xs rounded-full ${statusBg} ${statusColor}`}
+              title={instance.status_stale ? 'systemd no respondió a tiempo: último estado conocido' : undefined}
+            >
+              {instance.status}{instance.status_stale ? ' (?)' : ''}
             </span>
           </div>
           <div className="mt-2 space-y-1 text-sm text-gray-600 dark:text-gray-300">
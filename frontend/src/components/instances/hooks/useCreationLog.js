@@ -1,12 +1,22 @@
 import { useState, useEffect, useRef } from 'react';
 import { instances } from '../../../lib/api';
 
+const RECONNECT_MS = 3000;
+
+// La creación de desarrollo no escribe archivo de estado: se detecta el final por el log
+const FINISH_MESSAGES = [
+  '✅ Instancia de desarrollo creada con éxito',
+  '✅ ¡INSTANCIA CREADA EXITOSAMENTE!',
+  'Instancia creada con éxito'
+];
+
 /**
- * Hook para manejar el log de creación de instancias con polling
+ * Hook para manejar el log de creación de instancias (stream con sólo los bytes nuevos)
  */
 export function useCreationLog() {
   const [creationLog, setCreationLog] = useState({ show: false, instanceName: '', log: '' });
   const creationLogRef = useRef(null);
+  const streamRef = useRef(null);
 
   // Auto-scroll cuando el log cambia
   useEffect(() => {
@@ -15,12 +25,12 @@ export function useCreationLog() {
     }
   }, [creationLog.log]);
 
-  // Cleanup polling interval cuando el componente se desmonta
+  // Cortar el stream cuando el componente se desmonta
   useEffect(() => {
     return () => {
-      if (window._pollingInterval) {
-        clearInterval(window._pollingInterval);
-        window._pollingInterval = null;
+      if (streamRef.current) {
+        streamRef.current.abort();
+        streamRef.current = null;
       }
     };
   }, []);
@@ -32,46 +42,53 @@ export function useCreationLog() {
       log: isProduction ? 'Iniciando creación de instancia de producción...\n' : 'Iniciando creación...\n' 
     });
 
-    // Limpiar polling anterior si existe
-    if (window._pollingInterval) clearInterval(window._pollingInterval);
+    // Cortar stream anterior si existe
+    if (streamRef.current) streamRef.current.abort();
+    const controller = new AbortController();
+    streamRef.current = controller;
 
-    // Intervalo de polling (3s para producción, 2s para dev)
-    const interval = isProduction ? 3000 : 2000;
-    
-    window._pollingInterval = setInterval(async () => {
-      try {
-        const logResponse = await instances.getCreationLog(instanceName);
-        const newLog = logResponse.data.log;
+    let offset = 0;
+    let received = false;
+    let done = false;
 
+    const onEvent = (event, data) => {
+      if (event === 'log') {
+        offset = data.next_offset;
         setCreationLog(prev => ({
           ...prev,
-          log:
-            (newLog === null || newLog === undefined)
-              ? prev.log || "Log no disponible aún..."
-              : (newLog === "" ? prev.log : newLog)
+          // El primer bloque reemplaza el mensaje inicial; `reset`: el log se recreó
+          log: (!received || data.reset) ? data.log : prev.log + data.log
         }));
+        received = true;
 
-        // Detectar finalización
-        const finishMessages = [
-          '✅ Instancia de desarrollo creada con éxito',
-          '✅ ¡INSTANCIA CREADA EXITOSAMENTE!',
-          'Instancia creada con éxito'
-        ];
+        if (FINISH_MESSAGES.some(msg => data.log.includes(msg))) {
+          done = true;
+          controller.abort();
+        }
+      } else if (event === 'status' && (data.finished || data.error)) {
+        done = true;
+      }
+    };
 
-        if (logResponse.data.log && finishMessages.some(msg => logResponse.data.log.includes(msg))) {
-          clearInterval(window._pollingInterval);
-          window._pollingInterval = null;
+    const follow = async () => {
+      while (!controller.signal.aborted && !done) {
+        try {
+          // El stream termina solo cuando el estado es success/error
+          await instances.followCreationLog(instanceName, offset, onEvent, controller.signal);
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error('Error fetching creation log:', error);
         }
-      } catch (error) {
-        console.error('Error fetching creation log:', error);
+        if (!done) await new Promise(resolve => setTimeout(resolve, RECONNECT_MS));
       }
-    }, interval);
+    };
+    follow();
   };
 
   const closeLog = () => {
-    if (window._pollingInterval) {
-      clearInterval(window._pollingInterval);
-      window._pollingInterval = null;
+    if (streamRef.current) {
+      streamRef.current.abort();
+      streamRef.current = null;
     }
     setCreationLog({ show: false, instanceName: '', log: '' });
   };
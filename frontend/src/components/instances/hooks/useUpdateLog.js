@@ -1,8 +1,10 @@
 import { useState, useEffect, useRef } from 'react';
 import { instances } from '../../../lib/api';
 
+const RECONNECT_MS = 3000;
+
 /**
- * Hook para manejar el log de actualización de instancias con polling
+ * Hook para manejar el log de actualización de instancias (stream con sólo los bytes nuevos)
  */
 export function useUpdateLog() {
   const [updateLog, setUpdateLog] = useState({ 
@@ -13,6 +15,7 @@ export function useUpdateLog() {
     completed: false 
   });
   const updateLogRef = useRef(null);
+  const streamRef = useRef(null);
 
   // Auto-scroll cuando el log cambia
   useEffect(() => {
@@ -21,45 +24,58 @@ export function useUpdateLog() {
     }
   }, [updateLog.log]);
 
+  // Cortar el stream cuando el componente se desmonta
+  useEffect(() => {
+    return () => {
+      if (streamRef.current) streamRef.current.abort();
+    };
+  }, []);
+
   const startPolling = (instanceName, action) => {
     setUpdateLog({ show: true, instanceName, action, log: '', completed: false });
 
-    const pollLog = async () => {
-      try {
-        const logResponse = await instances.getUpdateLog(instanceName, action);
-        
-        if (logResponse.data.exists) {
-          setUpdateLog(prev => ({
-            ...prev,
-            log: logResponse.data.log,
-            completed: logResponse.data.completed
-          }));
+    if (streamRef.current) streamRef.current.abort();
+    const controller = new AbortController();
+    streamRef.current = controller;
 
-          if (logResponse.data.completed) {
-            // Detener polling cuando se complete
-            return true;
-          }
-        }
-        return false;
-      } catch (error) {
-        console.error('Error fetching update log:', error);
-        return false;
+    let offset = 0;
+    let done = false;
+    const onEvent = (event, data) => {
+      if (event === 'log') {
+        offset = data.next_offset;
+        setUpdateLog(prev => ({
+          ...prev,
+          log: data.reset ? data.log : prev.log + data.log
+        }));
+      } else if (event === 'status' && (data.finished || data.error)) {
+        // El job terminó: el stream se cierra después de enviar el resto del log
+        done = true;
+        setUpdateLog(prev => ({ ...prev, completed: true }));
       }
     };
 
-    // Polling cada 2 segundos
-    const interval = setInterval(async () => {
-      const completed = await pollLog();
-      if (completed) {
-        clearInterval(interval);
+    const follow = async () => {
+      while (!controller.signal.aborted && !done) {
+        try {
+          await instances.followUpdateLog(instanceName, action, offset, onEvent, controller.signal);
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error('Error fetching update log:', error);
+        }
+        if (!done) await new Promise(resolve => setTimeout(resolve, RECONNECT_MS));
       }
-    }, 2000);
+    };
+    follow();
 
     // Cleanup
-    return () => clearInterval(interval);
+    return () => controller.abort();
   };
 
   const closeLog = () => {
+    if (streamRef.current) {
+      streamRef.current.abort();
+      streamRef.current = null;
+    }
     setUpdateLog({ show: false, instanceName: '', action: '', log: '', completed: false });
   };
 
@@ -18,6 +18,8 @@ export default function CreateDevModal({
   setNeutralizeDatabase,
   gitBranch,
   setGitBranch,
+  sourceDatabase,
+  setSourceDatabase,
   productionInstances,
   actionLoading
 }) {
@@ -149,6 +151,23 @@ export default function CreateDevModal({
           </p>
         </div>
         
+        {/* Base restaurada a un punto en el tiempo */}
+        <div className="mb-4">
+          <label className="block text-sm font-medium text-gray-700 dark:text-gray-300 mb-2">
+            Base de origen (opcional)
+          </label>
+          <input
+            type="text"
+            value={sourceDatabase}
+            onChange={(e) => setSourceDatabase(e.target.value)}
+            placeholder={`pitr-${selectedSourceInstance || 'instancia'}-AAAAMMDDHHMMSS`}
+            className="w-full px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent bg-white dark:bg-gray-700 text-gray-900 dark:text-white placeholder-gray-500 dark:placeholder-gray-400"
+          />
+          <p className="text-xs text-gray-500 dark:text-gray-400 mt-1">
+            Base restaurada desde Backups (PITR). Vacío clona la base actual de producción
+          </p>
+        </div>
+        
         {/* Checkbox de neutralización */}
         <div className="mb-4">
           <label className="flex items-center gap-2 cursor-pointer">
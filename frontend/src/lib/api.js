@@ -53,12 +53,86 @@ export const auth = {
     api.get('/api/auth/me'),
 };
 
+// Lee un stream SSE con fetch (EventSource no permite enviar el header Authorization)
+const readEventStream = async (url, onEvent, signal) => {
+  const token = localStorage.getItem('access_token');
+  const response = await fetch(`${API_URL}${url}`, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Stream no disponible (HTTP ${response.status})`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    let separator;
+    while ((separator = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, separator);
+      buffer = buffer.slice(separator + 2);
+
+      let event = 'message';
+      const dataLines = [];
+      rawEvent.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+      });
+
+      if (dataLines.length > 0) {
+        onEvent(event, dataLines.join('\n'));
+      }
+    }
+  }
+};
+
+// Historial columnar (t0 + offsets delta en ms + un array por serie) -> lista de puntos
+const columnarToRows = ({ t0, offsets = [], series = {} }) => {
+  const names = Object.keys(series);
+  let time = t0;
+  return offsets.map((offset, index) => {
+    time += offset;
+    const point = { timestamp: new Date(time).toISOString() };
+    names.forEach((name) => {
+      point[name] = series[name][index];
+    });
+    return point;
+  });
+};
+
 export const metrics = {
   getCurrent: () => 
     api.get('/api/metrics/current'),
   
+  // Stream de métricas en vivo; resuelve cuando el servidor cierra el stream
+  stream: (onMetrics, signal) =>
+    readEventStream('/api/metrics/stream', (event, data) => {
+      if (event === 'metrics') onMetrics(JSON.parse(data));
+    }, signal),
+  
+  // Se pide en formato columnar (payload más chico) y se expande a puntos
   getHistory: (minutes = 60) => 
-    api.get(`/api/metrics/history?minutes=${minutes}`),
+    api.get(`/api/metrics/history?minutes=${minutes}&format=columnar`).then((response) => ({
+      ...response,
+      data: { ...response.data, metrics: columnarToRows(response.data) },
+    })),
+
+  // Consumo por instancia Odoo
+  getInstanceHistory: (instanceName, minutes = 60) =>
+    api.get(`/api/metrics/instances/${encodeURIComponent(instanceName)}/history?minutes=${minutes}&format=columnar`).then((response) => ({
+      ...response,
+      data: { ...response.data, metrics: columnarToRows(response.data) },
+    })),
+
+  getTopInstances: (metric = 'cpu_percent', minutes = 5, limit = 10) =>
+    api.get(`/api/metrics/instances/top?metric=${metric}&minutes=${minutes}&limit=${limit}`),
 };
 
 export const instances = {
@@ -69,8 +143,8 @@ export const instances = {
     api.get(`/api/instances/${encodeURIComponent(name)}`),
   
   // Método actualizado: ahora acepta sourceInstance
-  create: (name, sourceInstance = null, neutralize = true, gitBranch = '') => 
-    api.post('/api/instances/create', { name, sourceInstance, neutralize, gitBranch }),
+  create: (name, sourceInstance = null, neutralize = true, gitBranch = '', sourceDatabase = '') => 
+    api.post('/api/instances/create', { name, sourceInstance, neutralize, gitBranch, sourceDatabase }),
   
   // Nuevo método: obtener instancias de producción disponibles
   getProductionInstances: () => 
@@ -103,11 +177,18 @@ export const instances = {
   restart: (name) => 
     api.post(`/api/instances/${encodeURIComponent(name)}/restart`),
   
-  getCreationLog: (name) => 
-    api.get(`/api/instances/creation-log/${encodeURIComponent(name)}`),
+  getCreationLog: (name, offset) => 
+    api.get(`/api/instances/creation-log/${encodeURIComponent(name)}`, { params: offset === undefined ? {} : { offset } }),
   
-  getUpdateLog: (name, action) => 
-    api.get(`/api/instances/update-log/${encodeURIComponent(name)}/${encodeURIComponent(action)}`),
+  getUpdateLog: (name, action, offset) => 
+    api.get(`/api/instances/update-log/${encodeURIComponent(name)}/${encodeURIComponent(action)}`, { params: offset === undefined ? {} : { offset } }),
+
+  // Streams SSE con sólo los bytes nuevos desde `offset` (eventos `log` y, en creación, `status`)
+  followCreationLog: (name, offset, onEvent, signal) =>
+    readEventStream(`/api/instances/creation-log/${encodeURIComponent(name)}/stream?offset=${offset}`, (event, data) => onEvent(event, JSON.parse(data)), signal),
+
+  followUpdateLog: (name, action, offset, onEvent, signal) =>
+    readEventStream(`/api/instances/update-log/${encodeURIComponent(name)}/${encodeURIComponent(action)}/stream?offset=${offset}`, (event, data) => onEvent(event, JSON.parse(data)), signal),
 };
 
 export const logs = {
@@ -120,6 +201,33 @@ export const logs = {
     api.get(`/api/logs/stats?hours=${hours}`),
 };
 
+export const odooLogs = {
+  // Sigue un log en vivo desde un cursor de bytes ('<inode>:<offset>', devuelto por /view)
+  follow: (instanceName, params, onEvent, signal) => {
+    const query = new URLSearchParams(params).toString();
+    return readEventStream(
+      `/api/odoo-logs/follow/${encodeURIComponent(instanceName)}?${query}`,
+      (event, data) => onEvent(event, JSON.parse(data)),
+      signal
+    );
+  },
+
+  // Búsqueda en el índice de logs: { instance, q, level, logger, days, limit, cursor }
+  search: (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    return api.get(`/api/odoo-logs/search?${query}`);
+  },
+
+  // Errores agrupados por fingerprint: { days, env, instance, limit }
+  getTopErrors: (params = {}) => {
+    const query = new URLSearchParams(params).toString();
+    return api.get(`/api/odoo-logs/errors/top?${query}`);
+  },
+
+  getErrorGroup: (fingerprint, days = 7) =>
+    api.get(`/api/odoo-logs/errors/${encodeURIComponent(fingerprint)}?days=${days}`),
+};
+
 export const backup = {
   list: () => 
     api.get('/api/backup/list'),
@@ -271,6 +379,29 @@ export const backupV2 = {
       onUploadProgress: onProgress
     }),
   
+  // Snapshots incrementales
+  exportSnapshot: (instanceName, name) => 
+    api.post(`/api/backup/v2/instances/${encodeURIComponent(instanceName)}/snapshots/${encodeURIComponent(name)}/export`),
+  
+  deleteSnapshot: (instanceName, name) => 
+    api.delete(`/api/backup/v2/instances/${encodeURIComponent(instanceName)}/snapshots/${encodeURIComponent(name)}`),
+  
+  // Recuperación a un punto en el tiempo (PITR)
+  getPitrStatus: () => 
+    api.get('/api/backup/v2/pitr'),
+  
+  updatePitrConfig: (config) => 
+    api.put('/api/backup/v2/pitr/config', config),
+  
+  createBaseBackup: () => 
+    api.post('/api/backup/v2/pitr/base'),
+  
+  restorePointInTime: (instanceName, targetTime) => 
+    api.post(`/api/backup/v2/instances/${encodeURIComponent(instanceName)}/pitr-restore`, { target_time: targetTime }),
+  
+  deletePitrDatabase: (instanceName, name) => 
+    api.delete(`/api/backup/v2/instances/${encodeURIComponent(instanceName)}/pitr/databases/${encodeURIComponent(name)}`),
+  
   // Logs
   getBackupLog: (instanceName) => 
     api.get(`/api/backup/v2/instances/${encodeURIComponent(instanceName)}/backup-log`),
@@ -75,6 +75,9 @@ AUTO_CONFIRM="${4:-${AUTO_CONFIRM:-false}}"
 APIDEV_SYSTEM_USER="${6:-}"
 APIDEV_ALLOWED_INSTANCES_CSV="${7:-}"
 
+# Base de origen alternativa (octavo argumento opcional), p. ej. una restauración PITR "pitr-<instancia>-<fecha>"
+SOURCE_DB_OVERRIDE="${8:-}"
+
 if [[ -z "$PROD_INSTANCE" ]]; then
     # Si no se pasó como argumento, listar y preguntar
     echo ""
@@ -126,9 +129,14 @@ if [[ -f "$PROD_ROOT/$PROD_INSTANCE/odoo.conf" ]]; then
     fi
 fi
 
+SOURCE_DB="${SOURCE_DB_OVERRIDE:-$PROD_DB}"
+
 echo ""
 echo "✅ Instancia de producción seleccionada: $PROD_INSTANCE"
 echo "   Base de datos: $PROD_DB"
+if [[ "$SOURCE_DB" != "$PROD_DB" ]]; then
+    echo "   Base de origen: $SOURCE_DB"
+fi
 
 # Crear directorio de desarrollo si no existe
 mkdir -p "$DEV_ROOT"
@@ -268,8 +276,8 @@ pip install phonenumbers gevent greenlet
 echo "🗄️  Clonando base de datos desde producción..."
 echo "   Eliminando BD anterior si existe..."
 sudo -u postgres dropdb "$DB_NAME" 2>/dev/null || true
-echo "   Creando dump de $PROD_DB..."
-sudo -u postgres pg_dump "$PROD_DB" > "/tmp/${DB_NAME}_dump.sql"
+echo "   Creando dump de $SOURCE_DB..."
+sudo -u postgres pg_dump "$SOURCE_DB" > "/tmp/${DB_NAME}_dump.sql"
 echo "   Creando base de datos $DB_NAME..."
 sudo -u postgres createdb "$DB_NAME" -O "$DB_USER" --encoding='UTF8'
 echo "   Instalando extensión vector..."